@@ -1,6 +1,8 @@
 from .validation import (
-    validate_request, validate_user
+    validate_request, validate_user, user_cache
 )
 from .token import (
-    authorize_app_access
+    authorize_app_access, authorize_internal_access, token_cache
 )
+from .transaction import atomic_request
+from .rate_limit import rate_limit
@@ -0,0 +1,34 @@
+import math
+
+from functools import wraps
+from flask import g
+
+from ..helper import pin_errors, rate_limiter
+
+
+def rate_limit(name):
+    """ This method limits the requests of the current user to a route with
+        the RATE_LIMITS[name] token bucket of the app config. It must come
+        after authorize_app_access, which sets the current user.
+    Args
+        name(str): route name of the limit in RATE_LIMITS
+    Returns
+      f(*args, **kwargs)
+    """
+
+    def real_rate_limit(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            wait = rate_limiter.take(name, g.current_user_id)
+
+            if wait:
+                return pin_errors(
+                    'Too many requests, please try again shortly', 429,
+                    headers={'Retry-After': str(math.ceil(wait))}
+                )
+
+            return f(*args, **kwargs)
+
+        return decorated
+
+    return real_rate_limit
@@ -1,8 +1,51 @@
+import os
+import hmac
+import time
+
 from functools import wraps
 
-from flask import request, jsonify, g
+from flask import request, jsonify, g, current_app
 from flask_jwt import jwt
 
+from ..helper import TTLCache
+
+# verified token -> payload, each entry living until the token expires.
+# Sized by TOKEN_CACHE_SIZE in the app config
+token_cache = TTLCache(maxsize=10000, ttl=3600)
+
+
+def auth_error(message):
+    """ Builds a 401 response, only once a request has failed """
+    response = jsonify({
+        "status": "fail",
+        "data": {
+            "message": message
+        }
+    })
+    response.status_code = 401
+    return response
+
+
+def decode_token(user_token):
+    """ Verifies an HS256 token against TOKEN_KEY and returns its payload.
+        Payloads are cached until the token expires, so a token is only
+        verified once.
+    Raises
+        jwt.ExpiredSignatureError, jwt.InvalidTokenError
+    """
+    payload = token_cache.get(user_token)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(user_token, os.getenv('TOKEN_KEY'),
+                         algorithms=['HS256'])
+
+    expires_in = payload.get('exp', 0) - time.time()
+    if expires_in > 0:
+        token_cache.set(user_token, payload, ttl=expires_in)
+
+    return payload
+
 
 def authorize_app_access(f):
     """ This method authorizes user with authorization token.
@@ -18,48 +61,53 @@ def authorize_app_access(f):
         user_token = request.headers.get('authorization')
 
         if not user_token:
-            response = jsonify({
-                "status": "fail",
-                "data": {
-                    "message": "Bad request. Header does not contain"
-                               " Authorization token"
-                }
-            })
-            response.status_code = 401
-            return response
-
-        unauthorized_response = jsonify({
-            "status": "fail",
-            "data": {
-                "message": "Unauthorized. The authorization token supplied"
-                        " is invalid"
-            }
-        })
-        unauthorized_response.status_code = 401
-        expired_response = jsonify({
-            "status": "fail",
-            "data": {
-                "message": "The authorization token supplied is expired"
-            }
-        })
-        expired_response.status_code = 401
+            return auth_error("Bad request. Header does not contain"
+                              " Authorization token")
 
         try:
             # decode token
-            payload = jwt.decode(user_token, 'secret',
-                                 options={"verify_signature": False})
+            payload = decode_token(user_token)
         except jwt.ExpiredSignatureError:
-            return expired_response
+            return auth_error("The authorization token supplied is expired")
         except jwt.InvalidTokenError:
-            return unauthorized_response
+            return auth_error("Unauthorized. The authorization token supplied"
+                              " is invalid")
 
         # confirm that payload has required keys
-        if ("id") not in payload.keys():
-            return unauthorized_response
-        else:
-            # set current user in flask global variable, g
-            g.current_user_id = payload["id"]
-            g.token_info = payload
+        if "id" not in payload:
+            return auth_error("Unauthorized. The authorization token supplied"
+                              " is invalid")
+
+        # set current user in flask global variable, g
+        g.current_user_id = payload["id"]
+        g.token_info = payload
+
+        return f(*args, **kwargs)
+
+    return decorated
+
+
+def authorize_internal_access(f):
+    """ This method authorizes access to internal endpoints with the
+        INTERNAL_TOKEN of the app config.
+    Returns
+      f(*args, **kwargs)
+    """
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        internal_token = current_app.config.get('INTERNAL_TOKEN')
+        user_token = request.headers.get('authorization') or ''
+
+        # scrapers send the token as a bearer token
+        if user_token.startswith('Bearer '):
+            user_token = user_token[len('Bearer '):]
+
+        if not internal_token or not hmac.compare_digest(
+            user_token.encode('utf-8'), internal_token.encode('utf-8')
+        ):
+            return auth_error("Unauthorized. The authorization token supplied"
+                              " is invalid")
 
         return f(*args, **kwargs)
 
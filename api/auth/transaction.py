@@ -0,0 +1,43 @@
+from functools import wraps
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..models import unit_of_work
+from ..helper import pin_errors
+
+
+def _status_code(response):
+    # flask-restful handlers return a response or a (data, status, ...) tuple
+    if isinstance(response, tuple):
+        return response[1] if len(response) > 1 else 200
+    return getattr(response, 'status_code', 200)
+
+
+def atomic_request():
+    """ This method runs a handler in a unit of work, so all of its writes
+        are committed once when it returns. They are rolled back instead when
+        it raises, returns an error status or a write fails.
+    Returns
+      f(*args, **kwargs)
+    """
+
+    def real_atomic_request(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            try:
+                with unit_of_work() as unit:
+                    response = f(*args, **kwargs)
+
+                    if _status_code(response) >= 400:
+                        unit.fail()
+                    elif unit.failed:
+                        # a write failed and was rolled back
+                        response = pin_errors('Something went wrong', 500)
+            except SQLAlchemyError:
+                return pin_errors('Something went wrong', 500)
+
+            return response
+
+        return decorated
+
+    return real_atomic_request
@@ -1,9 +1,16 @@
 from api import models
 from functools import wraps
 from flask import request, jsonify, g
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.local import LocalProxy
 
-from ..models import Users
-from ..helper import pin_errors
+from ..models import Users, after_commit, current_unit_of_work
+from ..helper import pin_errors, TTLCache
+
+# user id -> (exists, is_active, username), sized by USER_CACHE_SIZE and
+# USER_CACHE_TTL in the app config
+user_cache = TTLCache(maxsize=10000, ttl=30)
 
 def validate_request():
     """ This method validates the Request payload.
@@ -42,20 +49,90 @@ def validate_user():
         @wraps(f)
         def decorated(*args,**kwargs):
             user_id = g.current_user_id
-           
+
             # validate user already exists
-            _user = Users.get_by_id(user_id)
+            _user_info = user_cache.get(user_id)
+
+            if _user_info is None:
+                _user = Users.get_by_id(user_id)
+                _user_info = (
+                    (True, _user.is_active, _user.username) if _user
+                    else (False, False, None)
+                )
+                user_cache.set(user_id, _user_info)
 
-            if not _user:
+                g.user = _user
+            else:
+                # only load the user if the handler asks for it
+                g.user = LocalProxy(lambda: Users.get_by_id(user_id))
+
+            exists, is_active, username = _user_info
+
+            if not exists:
                 return pin_errors('User does not exist', 400)
 
-            if not _user.is_active:
+            if not is_active:
                 return pin_errors('This account is not active, please activate.', 400)
 
-            g.user = _user
-
             return f(*args, **kwargs)
 
         return decorated
 
     return real_validate_user
+
+
+# user ids staged in session.info until the session commits, ALL_USERS
+# for the whole cache
+EVICTED_USERS = 'evicted_users'
+ALL_USERS = object()
+
+
+def evict_users(user_ids):
+    """ Drop users from the cache, or all of them for ALL_USERS """
+    if ALL_USERS in user_ids:
+        user_cache.clear()
+    else:
+        user_cache.delete_many(user_ids)
+
+
+def evict_after_commit(session, *user_ids):
+    """ Drop users from the cache once their writes are committed, so a
+        request in between can't cache the rows about to change. In a unit
+        of work that is when the unit commits, outside of one ModelMixin
+        commits the session right after the flush
+    """
+    if current_unit_of_work() is not None:
+        after_commit(evict_users, user_ids)
+    else:
+        session.info.setdefault(EVICTED_USERS, set()).update(user_ids)
+
+
+def evict_cached_user(mapper, connection, target):
+    """ Evict a user when their row is inserted, updated or deleted through
+        the ORM, e.g. by ModelMixin.save, update or delete
+    """
+    evict_after_commit(Session.object_session(target), target.id)
+
+
+def clear_cached_users(context):
+    """ Clear the cache when users are updated or deleted in bulk """
+    if context.mapper.class_ is Users:
+        evict_after_commit(context.session, ALL_USERS)
+
+
+def evict_committed_users(session):
+    evict_users(session.info.pop(EVICTED_USERS, ()))
+
+
+def discard_evicted_users(session):
+    # nothing was committed, the cached rows are still current
+    session.info.pop(EVICTED_USERS, None)
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Users, _event, evict_cached_user)
+
+event.listen(Session, 'after_bulk_update', clear_cached_users)
+event.listen(Session, 'after_bulk_delete', clear_cached_users)
+event.listen(Session, 'after_commit', evict_committed_users)
+event.listen(Session, 'after_rollback', discard_evicted_users)
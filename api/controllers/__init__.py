@@ -1,8 +1,11 @@
 from .sample_resource import SampleResource
+from .internal_resource import PoolStatsResource, MetricsResource
 from .user_resource import (
     UserSignUpResource, UserLoginResource, UserResource,
-    UserListResource
+    UserListResource, UserPinListResource, UserExportResource,
+    user_info_cache
 )
 from .pin_resource import (
-    PinListResource, PinResource, SharePinResource
+    PinListResource, PinBatchResource, PinImportResource, PinResource,
+    SharePinResource, PinWithinResource, PinNearestResource
 )
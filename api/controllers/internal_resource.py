@@ -0,0 +1,38 @@
+from flask import Response
+from flask_restful import Resource
+
+from ..models import db, pool_metrics
+from ..auth import authorize_internal_access
+from ..helper import pin_success, metrics
+
+
+class PoolStatsResource(Resource):
+    """ PoolStats Resource
+        GET /internal/pool - Get the database connection pool statistics of
+        this process
+    """
+
+    @authorize_internal_access
+    def get(self):
+        """ Get pool stats """
+        return pin_success(
+            message='Pool stats fetched successfully',
+            response_data={
+                "pool": pool_metrics.stats(db.engine.pool)
+            },
+            status_code=200
+        )
+
+
+class MetricsResource(Resource):
+    """ Metrics Resource
+        GET /metrics - Get the request, db and cache metrics of all the
+        worker processes in the Prometheus text format
+    """
+
+    @authorize_internal_access
+    def get(self):
+        """ Get metrics """
+        return Response(
+            metrics.render(), mimetype='text/plain; version=0.0.4'
+        )
@@ -3,23 +3,28 @@ from api.schema import user_schema
 import os
 import datetime
 
-from flask import g, request, jsonify, url_for
+from itertools import islice
+from flask import current_app, g, request, jsonify, url_for
 from marshmallow import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
 from flask_restful import Resource
 
 from ..models import (
-    Pins, PinShares, Users
+    Pins, PinShares, Users, geo, after_commit, unit_of_work
 )
 from ..schema import (
-    PinSchema, PinInfoSchema, SharePinSchema
+    PinSchema, PinInfoSchema, PinImportSchema, SharePinSchema,
+    PinWithinSchema, PinNearestSchema, PinBatchSchema, pin_serializer
 )
 from ..auth import (
-    authorize_app_access,
-    validate_request, validate_user
+    authorize_app_access, rate_limit,
+    validate_request, validate_user, atomic_request
 )
 from ..helper import (
-    pin_success, pin_errors, generate_authorization_token
+    pin_success, pin_success_ndjson, pin_errors, generate_authorization_token,
+    ImportFormatError, read_csv_pins, read_geojson_pins
 )
+from .user_resource import user_info_cache
 
 
 class PinListResource(Resource):
@@ -30,6 +35,7 @@ class PinListResource(Resource):
     @authorize_app_access
     @validate_user()
     @validate_request()
+    @atomic_request()
     def post(self):
         """ Add new Pin """
         # get data from request body
@@ -52,21 +58,208 @@ class PinListResource(Resource):
             latLng=_validated_data['latLng']
         )
 
-        try:
-            _pin = new_pin.save()
-        except:
+        # save returns the error instead of the instance when it fails
+        _pin = new_pin.save()
+        if _pin is not new_pin:
             return pin_errors('Something went wrong', 500)
 
+        # the owner's user info now holds the new pin
+        after_commit(user_info_cache.invalidate, g.current_user_id)
+
         # return success message
         return pin_success(
             message='Pin added successfully',
             response_data={
-                "pin": PinSchema().dump(_pin)
+                "pin": pin_serializer.dump(_pin)
+            },
+            status_code=201
+        )
+
+
+class PinBatchResource(Resource):
+    """ PinBatch Resource
+        POST /pins/batch - Add many pins at once
+    """
+
+    @authorize_app_access
+    @validate_user()
+    @validate_request()
+    @atomic_request()
+    def post(self):
+        """ Add new Pins """
+        # get data from request body
+        _data = request.get_json()
+
+        # validate batch data
+        batch_schema = PinBatchSchema()
+        _validated_data = None
+
+        try:
+            _validated_data = batch_schema.load(_data)
+        except ValidationError as err:
+            return pin_errors(err.messages, 400)
+
+        _pins = [
+            {**pin, 'user_id': g.current_user_id}
+            if isinstance(pin, dict) else pin
+            for pin in _validated_data['pins']
+        ]
+
+        # validate all the pins in one pass, errors are keyed by pin index
+        pin_schema = PinSchema(many=True)
+        errors = {}
+
+        try:
+            _valid_pins = pin_schema.load(_pins)
+        except ValidationError as err:
+            errors = err.messages
+            _valid_pins = err.valid_data
+
+        indexes = [index for index in range(len(_pins)) if index not in errors]
+        if not indexes:
+            return pin_errors(errors, 400)
+
+        # add all the valid pins with one statement
+        ids = Pins.insert_batch(
+            g.current_user_id, [_valid_pins[index] for index in indexes]
+        )
+        if ids is False:
+            return pin_errors('Something went wrong', 500)
+
+        # the owner's user info now holds the new pins
+        after_commit(user_info_cache.invalidate, g.current_user_id)
+
+        # return success message
+        return pin_success(
+            message='Pins added successfully',
+            response_data={
+                "pins": [
+                    {"index": index, "id": pin_id}
+                    for index, pin_id in zip(indexes, ids)
+                ],
+                "errors": errors
             },
             status_code=201
         )
 
 
+class PinImportResource(Resource):
+    """ PinImport Resource
+        POST /pins/import - Add the pins of a GeoJSON FeatureCollection or
+        a CSV of name, lat and lng sent as the request body
+    """
+
+    # request content type -> reader of its pins
+    readers = {
+        'application/geo+json': read_geojson_pins,
+        'application/json': read_geojson_pins,
+        'text/csv': read_csv_pins
+    }
+
+    @authorize_app_access
+    @validate_user()
+    def post(self):
+        """ Import Pins """
+        reader = self.readers.get(request.mimetype)
+        if reader is None:
+            return pin_errors(
+                'Request must be a GeoJSON FeatureCollection '
+                '(application/geo+json) or a CSV (text/csv)',
+                400
+            )
+
+        # check the start of the body before answering, the rest is read
+        # as the pins are imported
+        try:
+            rows = reader(request.stream)
+        except ImportFormatError as err:
+            return pin_errors(str(err), 400)
+
+        return pin_success_ndjson(
+            items=import_pins(
+                g.current_user_id, rows,
+                current_app.config.get('PIN_IMPORT_CHUNK_SIZE', 1000)
+            ),
+            status_code=200,
+            chunk_size=1
+        )
+
+
+def import_pins(user_id, rows, chunk_size):
+    """ Validates and inserts the pins read from an import, one chunk at a
+        time, each in its own transaction, yielding a progress line with
+        the errors of its rows after each chunk and a summary at the end.
+        Errors are keyed by the index of their row among the pins read.
+    """
+    import_schema = PinImportSchema(many=True)
+    read = imported = failed = 0
+
+    def progress(status, message=None, errors=None):
+        data = {'rows': read, 'imported': imported, 'failed': failed}
+        if message is not None:
+            data['message'] = message
+        if errors is not None:
+            data['errors'] = errors
+        return {'status': status, 'data': data}
+
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+
+            errors = {}
+            candidates = []
+            for index, (pin, row_errors) in enumerate(chunk, read):
+                if row_errors:
+                    errors[index] = row_errors
+                else:
+                    candidates.append((index, pin))
+
+            # validate the readable rows of the chunk in one pass
+            try:
+                valid_pins = import_schema.load(
+                    [pin for index, pin in candidates]
+                )
+            except ValidationError as err:
+                valid_pins = err.valid_data
+                for position, messages in err.messages.items():
+                    errors[candidates[position][0]] = messages
+
+            valid = [
+                valid_pins[position]
+                for position, (index, pin) in enumerate(candidates)
+                if index not in errors
+            ]
+
+            # add the chunk's pins with one statement and commit them
+            if valid:
+                try:
+                    with unit_of_work() as unit:
+                        if Pins.insert_batch(user_id, valid) is False:
+                            unit.fail()
+                        else:
+                            after_commit(user_info_cache.invalidate, user_id)
+                except SQLAlchemyError:
+                    # the commit failed, the unit rolled back and is failed
+                    pass
+
+                if unit.failed:
+                    yield progress('fail', message='Something went wrong')
+                    return
+
+            read += len(chunk)
+            imported += len(valid)
+            failed += len(errors)
+
+            yield progress('progress', errors=errors)
+    except ImportFormatError as err:
+        yield progress('fail', message=str(err))
+        return
+
+    yield progress('success', message='Pins imported successfully')
+
+
 class PinResource(Resource):
     """ PinList Resource
         PUT /pin/:pin_id
@@ -75,6 +268,7 @@ class PinResource(Resource):
     @authorize_app_access
     @validate_user()
     @validate_request()
+    @atomic_request()
     def put(self, pin_id):
         """ Update Pin """
         # get data from request body
@@ -103,11 +297,17 @@ class PinResource(Resource):
         updated_pin = Pins.get_by_id(pin_id)
 
         if is_pin_updated:
+            # the pin is in the user info of its owner and recipients
+            after_commit(
+                user_info_cache.invalidate,
+                pin.user_id, *PinShares.recipients_of(pin_id)
+            )
+
             # return success message
             return pin_success(
                 message='Pin updated successfully',
                 response_data={
-                    "pin": PinSchema().dump(updated_pin)
+                    "pin": pin_serializer.dump(updated_pin)
                 },
                 status_code=200
             )
@@ -122,8 +322,10 @@ class SharePinResource(Resource):
     """
 
     @authorize_app_access
+    @rate_limit('share_pin')
     @validate_user()
     @validate_request()
+    @atomic_request()
     def post(self, pin_id):
         """ Share Pin """
         # get data from request body
@@ -147,37 +349,128 @@ class SharePinResource(Resource):
         if pin.user_id != g.current_user_id:
             return pin_errors('Unauthorized access', 401)
 
-        # loop through all the users to share with
-        for user_id in _validated_data["user_ids"]:
-            # get user to check if user is valid
-            user = Users.get_by_id(user_id)
-
-            if user:
-                # check if pin has been previously shared
-                shared_pin = PinShares.find_first(
-                    **{
-                       "pin_id": pin_id,
-                       "shared_by": g.current_user_id,
-                       "shared_to": user_id
-                    }
-                )
+        # share with all the users at once
+        _result = PinShares.share_with(
+            pin_id, g.current_user_id, _validated_data["user_ids"]
+        )
 
-                if not shared_pin:
-                    # add new pin
-                    new_pin_share = PinShares(
-                        pin_id=pin_id,
-                        shared_by=g.current_user_id,
-                        shared_to=user_id
-                    )
+        if _result is False:
+            return pin_errors('Something went wrong', 500)
+
+        shared, skipped, invalid = _result
 
-                    try:
-                        new_pin_share.save()
-                    except:
-                        # I can keep track of pins that do not get shared successfully
-                        pass
+        # the pin is now in the user info of the new recipients
+        after_commit(user_info_cache.invalidate, *shared)
 
         return pin_success(
             message='Pin shared successfully',
-            response_data={},
+            response_data={
+                "shared": shared,
+                "skipped": skipped,
+                "invalid": invalid
+            },
+            status_code=200
+        )
+
+
+class PinWithinResource(Resource):
+    """ PinWithin Resource
+        GET /pins/within?bbox=minLat,minLng,maxLat,maxLng - Get the user's
+        pins (shared and created) inside a bounding box
+    """
+
+    @authorize_app_access
+    @validate_user()
+    def get(self):
+        """ Get pins within bounding box """
+        # validate query params
+        within_schema = PinWithinSchema()
+        _validated_data = None
+
+        try:
+            _validated_data = within_schema.load(request.args)
+        except ValidationError as err:
+            return pin_errors(err.messages, 400)
+
+        bbox = _validated_data['bbox']
+        limit = _validated_data['limit']
+
+        # pin and share ids are both time ordered PushIDs, so the oldest
+        # limit of each kind merge into the oldest limit of both
+        _rows = [
+            *Pins.within_for_user(g.current_user_id, *bbox, limit=limit),
+            *PinShares.within_to_user(g.current_user_id, *bbox, limit=limit)
+        ]
+        _rows.sort(key=lambda row: row.id)
+
+        # return success message
+        return pin_success(
+            message='Pins fetched successfully',
+            response_data={
+                "pins": pin_serializer.dump(_rows[:limit], many=True)
+            },
+            status_code=200
+        )
+
+
+class PinNearestResource(Resource):
+    """ PinNearest Resource
+        GET /pins/nearest?lat=..&lng=..&k=N - Get the user's k pins (shared
+        and created) nearest to a coordinate
+    """
+
+    @authorize_app_access
+    @validate_user()
+    def get(self):
+        """ Get nearest pins """
+        # validate query params
+        nearest_schema = PinNearestSchema()
+        _validated_data = None
+
+        try:
+            _validated_data = nearest_schema.load(request.args)
+        except ValidationError as err:
+            return pin_errors(err.messages, 400)
+
+        user_id = g.current_user_id
+
+        def candidates(*bbox):
+            # coordinates of own pins and shares, keyed by pin or share id
+            return [
+                *Pins.coordinates_within(user_id, *bbox),
+                *PinShares.coordinates_within(user_id, *bbox)
+            ]
+
+        nearest = geo.nearest(
+            _validated_data['lat'],
+            _validated_data['lng'],
+            _validated_data['k'],
+            candidates
+        )
+
+        # load only the k nearest pins and shares
+        ids = [key for key, distance in nearest]
+        _rows = {
+            row.id: row for row in [
+                *Pins.find_for_user(user_id, ids),
+                *PinShares.find_for_user(user_id, ids)
+            ]
+        }
+
+        # dumped pins are shared through the fragment cache, so the
+        # distance goes on a copy
+        _pins = [
+            dict(pin, distance=distance) for pin, (key, distance) in zip(
+                pin_serializer.dump([_rows[key] for key in ids], many=True),
+                nearest
+            )
+        ]
+
+        # return success message
+        return pin_success(
+            message='Pins fetched successfully',
+            response_data={
+                "pins": _pins
+            },
             status_code=200
         )
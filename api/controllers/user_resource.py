@@ -8,19 +8,26 @@ from marshmallow import ValidationError
 from flask_restful import Resource
 
 from ..models import (
-    Users
+    Users, Pins, PinShares, PasswordHasherBusy
 )
 from ..schema import (
-    UserSchema, PinUserInfoSchema
+    UserSchema, PinUserInfoSchema, PinSchema, PinFeedSchema, UserFeedSchema,
+    pin_serializer, pin_user_info_serializer, user_serializer,
+    pin_export_serializer
 )
 from ..auth import (
-    authorize_app_access,
-    validate_request, validate_user
+    authorize_app_access, rate_limit,
+    validate_request, validate_user, atomic_request
 )
 from ..helper import (
-    pin_success, pin_errors, generate_authorization_token
+    pin_success, pin_success_stream, pin_success_ndjson, pin_errors,
+    generate_authorization_token, make_etag, pin_not_modified, ResponseCache
 )
 
+# user id -> (etag, serialized user) of /user_info, dropped by the pin
+# writes that change it. Configured by the USER_INFO_CACHE_* app config
+user_info_cache = ResponseCache()
+
 
 class UserSignUpResource(Resource):
     """ User SignUp Resource
@@ -28,6 +35,7 @@ class UserSignUpResource(Resource):
     """
 
     @validate_request()
+    @atomic_request()
     def post(self):
         """ Signs up users """
         # get data from request body
@@ -53,11 +61,17 @@ class UserSignUpResource(Resource):
         new_user = Users(
             username=_validated_data['username'].lower()
         )
-        new_user.set_password(_validated_data['password'])
-
         try:
-            _user = new_user.save()
-        except:
+            new_user.set_password(_validated_data['password'])
+        except PasswordHasherBusy:
+            return pin_errors(
+                'Too many requests, please try again shortly', 429,
+                headers={'Retry-After': '1'}
+            )
+
+        # save returns the error instead of the instance when it fails
+        _user = new_user.save()
+        if _user is not new_user:
             return pin_errors('Something went wrong', 500)
 
         # generate authorization token
@@ -103,7 +117,15 @@ class UserLoginResource(Resource):
             return pin_errors('Invalid username or password', 400)
         
         # confirm user password
-        if not _user.check_password(_validated_data['password']):
+        try:
+            _is_password_valid = _user.check_password(_validated_data['password'])
+        except PasswordHasherBusy:
+            return pin_errors(
+                'Too many requests, please try again shortly', 429,
+                headers={'Retry-After': '1'}
+            )
+
+        if not _is_password_valid:
             return pin_errors('Invalid username or password', 400)
 
         # generate authorization token
@@ -125,29 +147,131 @@ class UserResource(Resource):
     """
 
     @authorize_app_access
+    @rate_limit('user_info')
     @validate_user()
     def get(self):
         """ Get user info """
-        _user = g.user
+        cached = user_info_cache.get(g.current_user_id)
+
+        if cached is not None:
+            etag, _fetched_data = cached
+            if request.if_none_match.contains_raw(etag):
+                return pin_not_modified(etag)
+
+            return pin_success(
+                message='User info fetched successfully',
+                response_data={
+                    "user": _fetched_data
+                },
+                status_code=200,
+                headers={'ETag': etag}
+            )
+
+        # answer clients holding the current version without serializing
+        etag = make_etag(
+            'user_info', Users.info_fingerprint(g.current_user_id)
+        )
+        if request.if_none_match.contains_raw(etag):
+            return pin_not_modified(etag)
 
-        # create user schema and validate fetched data
-        user_schema = UserSchema()
+        # reload user with pins and shares eagerly loaded
+        _user = Users.get_with_pins(g.current_user_id)
 
+        # serialize fetched data with the compiled user schema
         try:
-            _fetched_data = user_schema.dump(_user)
+            _fetched_data = user_serializer.dump(_user)
         except ValidationError as err:
             return pin_errors(err.messages, 400)
 
+        user_info_cache.set(g.current_user_id, (etag, _fetched_data))
+
         # return success message
         return pin_success(
             message='User info fetched successfully',
             response_data={
                 "user": _fetched_data
             },
+            status_code=200,
+            headers={'ETag': etag}
+        )
+
+
+class UserPinListResource(Resource):
+    """ UserPinList Resource
+        GET /user_info/pins - Get a page of the user's pins (shared and created)
+    """
+
+    @authorize_app_access
+    @validate_user()
+    def get(self):
+        """ Get user pins """
+        # validate query params
+        feed_schema = PinFeedSchema()
+        _validated_data = None
+
+        try:
+            _validated_data = feed_schema.load(request.args)
+        except ValidationError as err:
+            return pin_errors(err.messages, 400)
+
+        cursor = _validated_data['cursor']
+        limit = _validated_data['limit']
+        kind = _validated_data['kind']
+
+        # fetch one extra row of each kind to know if there is a next page.
+        # pin and share ids are both time ordered PushIDs, so the two kinds
+        # merge into one feed keyed by their own ids
+        _rows = []
+
+        if kind in ('own', 'all'):
+            _rows += Pins.page_for_user(g.current_user_id, cursor, limit + 1)
+
+        if kind in ('shared', 'all'):
+            _rows += PinShares.page_to_user(g.current_user_id, cursor, limit + 1)
+
+        _rows.sort(key=lambda row: row.id, reverse=True)
+
+        _page = _rows[:limit]
+        next_cursor = _page[-1].id if len(_rows) > limit else None
+
+        # return success message
+        return pin_success(
+            message='User pins fetched successfully',
+            response_data={
+                "pins": pin_serializer.dump(_page, many=True),
+                "next_cursor": next_cursor
+            },
             status_code=200
         )
 
 
+class UserExportResource(Resource):
+    """ UserExport Resource
+        GET /user_info/export - Stream all the user's pins (shared and
+        created) as newline-delimited JSON
+    """
+
+    @authorize_app_access
+    @validate_user()
+    def get(self):
+        """ Export user pins """
+        user_id = g.current_user_id
+
+        def pins():
+            # own pins, then the shared ones, each read from a server-side
+            # cursor and dumped one at a time, so any number of pins is
+            # exported in constant memory
+            for pin in Pins.stream_for_user(user_id):
+                yield pin_export_serializer.dump(pin)
+
+            for share in PinShares.stream_to_user(user_id):
+                yield pin_export_serializer.dump(share)
+
+        return pin_success_ndjson(
+            items=pins(), status_code=200, filename='pins.ndjson'
+        )
+
+
 class UserListResource(Resource):
     """ UserList Resource
         GET /all_users - Get all users excluding current user
@@ -157,23 +281,57 @@ class UserListResource(Resource):
     @validate_user()
     def get(self):
         """ Get all users """
-        # get all users excluding current user
-        users = Users.query.filter(Users.id!=g.current_user_id)
-
-        # create user schema and validate fetched users
-        user_schema = PinUserInfoSchema(many=True)
+        # validate query params
+        feed_schema = UserFeedSchema()
+        _validated_data = None
 
         try:
-            _fetched_users = user_schema.dump(users)
+            _validated_data = feed_schema.load(request.args)
         except ValidationError as err:
             return pin_errors(err.messages, 400)
 
+        cursor = _validated_data['cursor']
+        limit = _validated_data['limit']
+
+        # answer clients holding the current version without serializing
+        etag = make_etag(
+            'all_users', cursor, limit,
+            Users.list_fingerprint(g.current_user_id)
+        )
+        if request.if_none_match.contains_raw(etag):
+            return pin_not_modified(etag)
+
+        # serialize fetched users with the compiled user info schema
+        user_schema = pin_user_info_serializer
+
+        if not cursor and not limit:
+            # stream all users excluding current user
+            users = Users.stream_excluding(g.current_user_id)
+
+            response = pin_success_stream(
+                message='Users fetched successfully',
+                key='users',
+                items=(user_schema.dump(user) for user in users),
+                status_code=200
+            )
+            response.headers['ETag'] = etag
+            return response
+
+        # get a page of users excluding current user, with one extra row to
+        # know if there is a next page
+        limit = limit or 20
+        users = Users.page_excluding(g.current_user_id, cursor, limit + 1)
+
+        _page = users[:limit]
+        next_cursor = _page[-1].id if len(users) > limit else None
+
         # return success message
         return pin_success(
             message='Users fetched successfully',
             response_data={
-                "users": _fetched_users
+                "users": user_schema.dump(_page, many=True),
+                "next_cursor": next_cursor
             },
-            status_code=200
+            status_code=200,
+            headers={'ETag': etag}
         )
-        
@@ -1,2 +1,17 @@
-from .response import pin_errors, pin_success
+from .response import (
+    pin_errors, pin_success, pin_success_stream, pin_success_ndjson,
+    make_etag, pin_not_modified
+)
 from .token import generate_authorization_token
+from .query_stats import QueryStats, query_stats
+from .metrics import Metrics, metrics
+from .asgi import WsgiToAsgi
+from .rate_limit import (
+    RateLimiter, TokenBuckets, SharedTokenBuckets, rate_limiter
+)
+from .pin_import import (
+    ImportFormatError, read_csv_pins, read_geojson_pins
+)
+from .cache import (
+    CacheBackend, TTLCache, FragmentCache, ResponseCache, deep_size
+)
@@ -0,0 +1,177 @@
+'''
+ASGI front for the WSGI app, see asgi.py.
+
+The event loop holds every open connection and reads request bodies,
+while the app itself runs on a small thread pool, sized to the db
+connection pool, so thousands of waiting clients cost a coroutine each
+rather than a thread each. Responses are sent chunk by chunk as the app
+yields them, with the app's thread waiting on each send, so streamed
+responses keep their constant memory.
+'''
+import sys
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+
+class WsgiToAsgi(object):
+    '''
+    ASGI 3 application running a WSGI application.
+
+    Args
+        wsgi_app(callable): the WSGI application
+        threads(int): threads running the WSGI application
+        spool_size(int): request body bytes kept in memory, larger bodies
+                         are spooled to a temporary file
+    '''
+
+    def __init__(self, wsgi_app, threads=10, spool_size=1024 * 1024):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.spool_size = spool_size
+        self._executor = None
+
+    def _get_executor(self):
+        # started on first use, in the process serving requests
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.threads, thread_name_prefix='asgi'
+            )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(
+                'Unsupported ASGI scope type {0}'.format(scope['type'])
+            )
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.shutdown
+                )
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = SpooledTemporaryFile(max_size=self.spool_size)
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self._get_executor(), self._run,
+                build_environ(scope, body), send, loop
+            )
+        finally:
+            body.close()
+
+    def _run(self, environ, send, loop):
+        ''' Runs the WSGI app, on a pool thread, and sends its response '''
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ]
+            return _write_unsupported
+
+        def send_start():
+            response['sent'] = True
+            send_message({
+                'type': 'http.response.start',
+                'status': response['status'],
+                'headers': response['headers']
+            })
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in result:
+                if not chunk:
+                    continue
+                if not response.get('sent'):
+                    send_start()
+                send_message({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True
+                })
+
+            if not response.get('sent'):
+                send_start()
+            send_message({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(result, 'close', None)
+            if close is not None:
+                close()
+
+
+def _write_unsupported(data):
+    raise NotImplementedError('The write() callable is not supported')
+
+
+def build_environ(scope, body):
+    ''' Returns the WSGI environ of an ASGI http scope '''
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI carries the raw path bytes as latin1
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/{0}'.format(scope.get('http_version', '1.1')),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = 'HTTP_' + name
+        if key in environ:
+            value = environ[key] + ',' + value
+        environ[key] = value
+
+    return environ
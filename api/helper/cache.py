@@ -0,0 +1,235 @@
+import abc
+import sys
+import threading
+
+from collections import OrderedDict
+from time import monotonic
+
+from werkzeug.utils import import_string
+
+
+class CacheBackend(abc.ABC):
+    """ Interface of a store that ResponseCache can keep entries in.
+        Values are plain dicts, lists and strings, so a store shared by the
+        processes on a host can encode them. A backend missing get, set,
+        delete or clear can't be instantiated.
+    """
+
+    def init_app(self, app, prefix):
+        pass
+
+    @abc.abstractmethod
+    def get(self, key, default=None):
+        pass
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl=None):
+        pass
+
+    @abc.abstractmethod
+    def delete(self, key):
+        pass
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.delete(key)
+
+    @abc.abstractmethod
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {}
+
+    def counters(self):
+        """ Returns the (hits, misses) of the cache. Read after every
+            request by Metrics, so backends should override it with their
+            plain counters rather than building their stats
+        """
+        stats = self.stats()
+        return stats.get('hits', 0), stats.get('misses', 0)
+
+
+class TTLCache(CacheBackend):
+    """ Bounded in-process cache.
+        - entries expire ttl seconds after they are set
+        - the least recently used entry is evicted once maxsize is reached
+        - hits and misses are counted
+        - safe to share between threads
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, prefix):
+        """ Read size and ttl from the app config, e.g. USER_CACHE_SIZE and
+            USER_CACHE_TTL for prefix USER_CACHE
+        """
+        self.configure(
+            maxsize=app.config.get(prefix + '_SIZE', self.maxsize),
+            ttl=app.config.get(prefix + '_TTL', self.ttl)
+        )
+
+    def configure(self, maxsize, ttl):
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            while len(self._data) > maxsize:
+                self._removed(self._data.popitem(last=False)[1][1])
+
+    def get(self, key, default=None):
+        """ Returns the cached value or default when missing or expired """
+        with self._lock:
+            entry = self._data.get(key)
+
+            if entry is not None and entry[0] > monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry is not None:
+                del self._data[key]
+                self._removed(entry[1])
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """ Caches value for ttl seconds, the cache default if not given """
+        if self.maxsize <= 0:
+            return
+
+        expires_at = monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            replaced = self._data.get(key)
+            if replaced is not None:
+                self._removed(replaced[1])
+
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            self._added(value)
+            if len(self._data) > self.maxsize:
+                self._removed(self._data.popitem(last=False)[1][1])
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self._removed(entry[1])
+
+    def clear(self):
+        with self._lock:
+            for entry in self._data.values():
+                self._removed(entry[1])
+            self._data.clear()
+
+    def _added(self, value):
+        # called under the lock when value is cached
+        pass
+
+    def _removed(self, value):
+        # called under the lock when a cached value is evicted, expires,
+        # is replaced or deleted
+        pass
+
+    def counters(self):
+        # plain int reads, without the lock
+        return self.hits, self.misses
+
+    def stats(self):
+        """ Returns the hit and miss counters and the current size """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize
+            }
+
+
+def deep_size(value):
+    """ Approximate memory in bytes held by a value of dicts, lists and
+        scalars, counting each container and its items
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += sys.getsizeof(key) + deep_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += deep_size(item)
+    return size
+
+
+class FragmentCache(TTLCache):
+    """ TTLCache of serialized fragments shared between responses, which
+        also reports their approximate memory and the hit ratio.
+        Fragments are shared, so they must not be changed once cached.
+        The memory is a running total kept as fragments come and go.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        super().__init__(maxsize, ttl)
+        self.memory = 0
+
+    def get(self, key, default=None):
+        entry = super().get(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        super().set(key, (value, deep_size(value)), ttl)
+
+    def _added(self, value):
+        self.memory += value[1]
+
+    def _removed(self, value):
+        self.memory -= value[1]
+
+    def stats(self):
+        """ Adds the hit ratio and the memory of the cached fragments """
+        stats = super().stats()
+        stats['memory'] = self.memory
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+class ResponseCache(object):
+    """ Serialized responses cached per key in a pluggable backend, a
+        TTLCache unless PREFIX_BACKEND in the app config names another
+        CacheBackend class, e.g. USER_INFO_CACHE_BACKEND.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or TTLCache()
+
+    def init_app(self, app, prefix):
+        backend = app.config.get(prefix + '_BACKEND')
+        if backend:
+            if isinstance(backend, str):
+                backend = import_string(backend)
+            self.backend = backend()
+        self.backend.init_app(app, prefix)
+
+    def get(self, key, default=None):
+        return self.backend.get(key, default)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl)
+
+    def invalidate(self, *keys):
+        """ Drops the entries of the given keys, ignoring empty ones """
+        self.backend.delete_many({key for key in keys if key})
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return self.backend.stats()
+
+    def counters(self):
+        return self.backend.counters()
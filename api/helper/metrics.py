@@ -0,0 +1,291 @@
+'''
+Request metrics in the Prometheus text format.
+
+Values are kept per process in a dict, updated under one short lock per
+request. With METRICS_DIR set, every process also mirrors its values into
+its own memory mapped file in that directory, and /metrics sums the files
+of all the processes, so any worker can answer for the whole dyno.
+'''
+import os
+import json
+import mmap
+import struct
+import threading
+
+from time import perf_counter
+
+from flask import current_app, g, request
+
+# name -> (type, help) of every metric rendered
+METRICS = {
+    'http_requests_total': (
+        'counter', 'Requests by resource, method and status code'
+    ),
+    'http_request_duration_seconds': (
+        'histogram', 'Request latency by resource and method'
+    ),
+    'db_queries_total': ('counter', 'SQL statements run by resource'),
+    'db_duration_seconds_total': (
+        'counter', 'Seconds spent running SQL statements by resource'
+    ),
+    'cache_hits_total': ('counter', 'Cache lookups that found an entry'),
+    'cache_misses_total': ('counter', 'Cache lookups that found no entry'),
+    'cache_hit_ratio': ('gauge', 'Share of cache lookups that found an entry'),
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+class MmapValues(object):
+    '''
+    Metric values of one process in a memory mapped file, which only that
+    process writes. The file holds the number of bytes used, then entries
+    of a key length, the key padded to 8 bytes and a float64 value.
+    '''
+
+    INITIAL_SIZE = 1 << 16
+
+    def __init__(self, path):
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(self.INITIAL_SIZE)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+
+        self._used = struct.unpack_from('Q', self._map, 0)[0] or 8
+        self._positions = {
+            key: position
+            for key, position, value in self._entries(self._map, self._used)
+        }
+
+    @staticmethod
+    def _entries(data, used):
+        position = 8
+        while position < used:
+            length = struct.unpack_from('I', data, position)[0]
+            key = bytes(data[position + 4:position + 4 + length]).decode()
+            position += 4 + length + (-(4 + length) % 8)
+            yield key, position, struct.unpack_from('d', data, position)[0]
+            position += 8
+
+    @classmethod
+    def read(cls, path):
+        ''' Returns the key -> value of a file written by any process '''
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        if len(data) < 8:
+            return {}
+        used = min(struct.unpack_from('Q', data, 0)[0], len(data))
+        return {
+            key: value for key, position, value in cls._entries(data, used)
+        }
+
+    def write(self, key, value):
+        position = self._positions.get(key)
+        if position is None:
+            position = self._add_key(key)
+        struct.pack_into('d', self._map, position, value)
+
+    def _add_key(self, key):
+        encoded = key.encode()
+        entry = struct.pack('I', len(encoded)) + encoded
+        entry += b'\0' * (-len(entry) % 8) + struct.pack('d', 0.0)
+
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._map.close()
+            self._file.truncate(self._capacity)
+            self._map = mmap.mmap(self._file.fileno(), self._capacity)
+
+        self._map[self._used:self._used + len(entry)] = entry
+        position = self._used + len(entry) - 8
+        self._used += len(entry)
+        # readers only look up to the used size, so grow it last
+        struct.pack_into('Q', self._map, 0, self._used)
+
+        self._positions[key] = position
+        return position
+
+
+class Metrics(object):
+    '''
+    Per resource request counts, latency histograms and db time, and the
+    hit ratios of the registered caches.
+
+    Configured from the app config:
+    - METRICS_DIR: directory shared by the worker processes, unset keeps
+      the metrics of each process apart
+    Relies on QueryStats for the request start time and db counters.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._caches = {}
+        self._directory = None
+        self._store = None
+        self._store_pid = None
+
+    def init_app(self, app):
+        self._directory = app.config.get('METRICS_DIR')
+        if self._directory:
+            os.makedirs(self._directory, exist_ok=True)
+
+        app.after_request(self.finish)
+
+    def register_cache(self, name, cache):
+        ''' Reports the hits and misses of a cache with a counters() method,
+            read after every request, so it must be cheap and lock free
+        '''
+        self._caches[name] = cache
+
+    def _get_store(self):
+        # each process, forked or not, writes its own file
+        if not self._directory:
+            return None
+        if self._store_pid != os.getpid():
+            self._store = MmapValues(os.path.join(
+                self._directory, 'metrics_{0}.db'.format(os.getpid())
+            ))
+            self._store_pid = os.getpid()
+        return self._store
+
+    def _add(self, store, name, labels, amount):
+        key = _key(name, labels)
+        value = self._values.get(key, 0.0) + amount
+        self._values[key] = value
+        if store is not None:
+            store.write(key, value)
+
+    def _set(self, store, name, labels, value):
+        key = _key(name, labels)
+        self._values[key] = value
+        if store is not None:
+            store.write(key, value)
+
+    def finish(self, response):
+        if 'request_started' not in g:
+            return response
+
+        view = current_app.view_functions.get(request.endpoint)
+        resource = getattr(getattr(view, 'view_class', None), '__name__',
+                           request.endpoint or 'NotFound')
+        duration = perf_counter() - g.request_started
+
+        labels = {'resource': resource, 'method': request.method}
+        cache_counters = {
+            name: cache.counters() for name, cache in self._caches.items()
+        }
+
+        with self._lock:
+            store = self._get_store()
+
+            self._add(store, 'http_requests_total',
+                      dict(labels, status=str(response.status_code)), 1)
+
+            for bound in LATENCY_BUCKETS:
+                if duration <= bound:
+                    self._add(store, 'http_request_duration_seconds_bucket',
+                              dict(labels, le=str(bound)), 1)
+            self._add(store, 'http_request_duration_seconds_bucket',
+                      dict(labels, le='+Inf'), 1)
+            self._add(store, 'http_request_duration_seconds_sum', labels,
+                      duration)
+            self._add(store, 'http_request_duration_seconds_count', labels, 1)
+
+            self._add(store, 'db_queries_total', {'resource': resource},
+                      g.db_queries)
+            self._add(store, 'db_duration_seconds_total',
+                      {'resource': resource}, g.db_seconds)
+
+            # the process totals of each cache, summed over processes
+            for name, (hits, misses) in cache_counters.items():
+                self._set(store, 'cache_hits_total', {'cache': name}, hits)
+                self._set(store, 'cache_misses_total', {'cache': name},
+                          misses)
+
+        return response
+
+    def collect(self):
+        ''' Returns the key -> value of every process, summed '''
+        if not self._directory:
+            with self._lock:
+                return dict(self._values)
+
+        values = {}
+        for file_name in os.listdir(self._directory):
+            if not file_name.startswith('metrics_'):
+                continue
+            path = os.path.join(self._directory, file_name)
+            for key, value in MmapValues.read(path).items():
+                values[key] = values.get(key, 0.0) + value
+        return values
+
+    def render(self):
+        ''' Returns all the metrics in the Prometheus text format '''
+        samples = {}
+        hits, misses = {}, {}
+
+        for key, value in self.collect().items():
+            name, labels = json.loads(key)
+            labels = dict(labels)
+
+            if name == 'cache_hits_total':
+                hits[labels['cache']] = value
+            elif name == 'cache_misses_total':
+                misses[labels['cache']] = value
+
+            family = name
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+                    family = name[:-len(suffix)]
+            samples.setdefault(family, []).append((name, labels, value))
+
+        for cache, cache_hits in hits.items():
+            lookups = cache_hits + misses.get(cache, 0.0)
+            samples.setdefault('cache_hit_ratio', []).append((
+                'cache_hit_ratio', {'cache': cache},
+                cache_hits / lookups if lookups else 0.0
+            ))
+
+        lines = []
+        for family, (metric_type, help_text) in METRICS.items():
+            if family not in samples:
+                continue
+            lines.append('# HELP {0} {1}'.format(family, help_text))
+            lines.append('# TYPE {0} {1}'.format(family, metric_type))
+            for name, labels, value in sorted(
+                samples[family], key=lambda sample: _sort_key(*sample)
+            ):
+                lines.append('{0}{1} {2}'.format(
+                    name, _format_labels(labels), repr(float(value))
+                ))
+        return '\n'.join(lines) + '\n'
+
+
+def _sort_key(name, labels, value):
+    # keep histogram buckets in increasing le order
+    le = labels.get('le')
+    bound = float('inf') if le == '+Inf' else float(le or 0)
+    return name, sorted((k, v) for k, v in labels.items() if k != 'le'), bound
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{0}="{1}"'.format(key, str(value).replace('\\', '\\\\')
+                           .replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in sorted(labels.items(), key=lambda item: (
+            item[0] == 'le', item[0]
+        ))
+    ) + '}'
+
+
+# process-wide metrics, set up by create_flask_app
+metrics = Metrics()
@@ -0,0 +1,217 @@
+'''
+Incremental readers of the pin import formats.
+
+Both read a binary stream, such as the request stream, a block at a time
+and yield one pin at a time, so an upload of any size is never held in
+memory. Each yields (pin, errors) pairs: the pin dict to validate, or None
+with the errors of a row that could not be read as a pin.
+
+Both check the start of the stream when called, raising ImportFormatError
+if it is not the expected format, so the request can be turned away
+before anything is imported. Later errors that stop the reading, like
+malformed JSON, are raised from the iterator.
+'''
+import io
+import csv
+import json
+import codecs
+
+
+class ImportFormatError(ValueError):
+    ''' Raised when an import stream can't be read as its format '''
+
+
+def read_csv_pins(stream):
+    '''
+    Reads a CSV with a header row naming its name, lat and lng columns,
+    in any order and case. Other columns are ignored.
+    '''
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+
+    try:
+        header = next(reader, None)
+    except (csv.Error, UnicodeDecodeError) as err:
+        raise ImportFormatError('Not a valid CSV: {0}'.format(err))
+
+    if header is None:
+        raise ImportFormatError('The CSV is empty')
+
+    columns = [column.strip().lower() for column in header]
+    if not all(column in columns for column in ('name', 'lat', 'lng')):
+        raise ImportFormatError('The CSV must have name, lat and lng columns')
+
+    return _csv_pins(
+        reader,
+        columns.index('name'), columns.index('lat'), columns.index('lng')
+    )
+
+
+def _csv_pins(reader, name, lat, lng):
+    width = max(name, lat, lng) + 1
+
+    try:
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                yield None, {'row': ['Must have name, lat and lng values.']}
+                continue
+
+            yield {
+                'name': row[name],
+                'latLng': [row[lat] or None, row[lng] or None]
+            }, None
+    except (csv.Error, UnicodeDecodeError) as err:
+        raise ImportFormatError(
+            'Not a valid CSV at line {0}: {1}'.format(reader.line_num, err)
+        )
+
+
+def read_geojson_pins(stream):
+    '''
+    Reads a GeoJSON FeatureCollection of Point features, named by their
+    name property. Members other than features are skipped.
+    '''
+    parser = _JsonStream(stream)
+
+    parser.expect('{')
+    while True:
+        if parser.peek() != '"':
+            raise ImportFormatError(
+                'A FeatureCollection must have a features array'
+            )
+
+        key = parser.value()
+        parser.expect(':')
+
+        if key == 'features':
+            parser.expect('[')
+            return _features(parser)
+
+        value = parser.value()
+        if key == 'type' and value != 'FeatureCollection':
+            raise ImportFormatError('Not a GeoJSON FeatureCollection')
+
+        if parser.peek() == ',':
+            parser.advance()
+        else:
+            raise ImportFormatError(
+                'A FeatureCollection must have a features array'
+            )
+
+
+def _features(parser):
+    if parser.peek() == ']':
+        return
+
+    while True:
+        yield _feature_pin(parser.value())
+
+        separator = parser.peek()
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ImportFormatError(
+                "Expected ',' or ']' after a feature, got {0!r}".format(
+                    separator
+                )
+            )
+        parser.advance()
+
+
+def _feature_pin(feature):
+    if not isinstance(feature, dict) or feature.get('type') != 'Feature':
+        return None, {'feature': ['Not a valid Feature.']}
+
+    geometry = feature.get('geometry') or {}
+    coordinates = geometry.get('coordinates')
+    if (geometry.get('type') != 'Point' or
+            not isinstance(coordinates, list) or len(coordinates) < 2):
+        return None, {'geometry': ['Must be a Point.']}
+
+    # GeoJSON positions are [lng, lat]
+    pin = {'latLng': [coordinates[1], coordinates[0]]}
+
+    properties = feature.get('properties') or {}
+    if 'name' in properties:
+        pin['name'] = properties['name']
+
+    return pin, None
+
+
+class _JsonStream(object):
+    '''
+    Walks a JSON document read a block at a time, decoding one value at a
+    time from a buffer refilled as needed. A value larger than
+    max_value_size is rejected rather than buffered.
+    '''
+
+    WHITESPACE = ' \t\n\r'
+
+    def __init__(self, stream, block_size=64 * 1024,
+                 max_value_size=1024 * 1024):
+        self.stream = stream
+        self.block_size = block_size
+        self.max_value_size = max_value_size
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+
+    def _fill(self):
+        data = self.stream.read(self.block_size)
+        try:
+            text = self._text.decode(data, final=not data)
+        except UnicodeDecodeError as err:
+            raise ImportFormatError('Not valid UTF-8: {0}'.format(err))
+
+        self.eof = not data
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+
+    def peek(self):
+        ''' Returns the next non-whitespace character, '' at the end '''
+        while True:
+            while (self.position < len(self.buffer) and
+                   self.buffer[self.position] in self.WHITESPACE):
+                self.position += 1
+
+            if self.position < len(self.buffer) or self.eof:
+                return self.buffer[self.position:self.position + 1]
+            self._fill()
+
+    def advance(self):
+        self.position += 1
+
+    def expect(self, character):
+        found = self.peek()
+        if found != character:
+            raise ImportFormatError(
+                'Expected {0!r}, got {1!r}'.format(character, found)
+            )
+        self.advance()
+
+    def value(self):
+        ''' Decodes the next JSON value '''
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self.buffer, self.position)
+                # a number at the end of the buffer may go on in the next
+                # block, read on to be sure it is complete
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except ValueError as err:
+                if self.eof:
+                    raise ImportFormatError('Not valid JSON: {0}'.format(err))
+
+            if len(self.buffer) - self.position > self.max_value_size:
+                raise ImportFormatError(
+                    'A JSON value is longer than {0} characters'.format(
+                        self.max_value_size
+                    )
+                )
+            self._fill()
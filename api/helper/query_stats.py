@@ -0,0 +1,105 @@
+import json
+
+from time import perf_counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault('query_started', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    started = conn.info['query_started'].pop()
+
+    if has_request_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_seconds += perf_counter() - started
+        # None once the request is reported, a streamed response may still
+        # run statements that no one would log
+        if g.db_statements is not None:
+            g.db_statements.append(statement)
+
+
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute
+    if context.connection is not None:
+        started = context.connection.info.get('query_started')
+        if started:
+            started.pop()
+
+
+class QueryStats(object):
+    """ Counts the SQL statements of each request and the time spent on
+        them, for every engine.
+
+        Configured from the app config:
+        - SERVER_TIMING: add a Server-Timing header with the db and total
+          time to every response
+        - QUERY_COUNT_THRESHOLD: log the SQL of requests issuing more
+          statements than this, 0 never logs it
+        Every request is also logged to the app logger as one JSON line.
+    """
+
+    def init_app(self, app):
+        # engine events are global, listen only once per process
+        if not event.contains(Engine, 'before_cursor_execute',
+                              _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute',
+                         _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+
+        app.before_request(self.start)
+        app.after_request(self.finish)
+
+    def start(self):
+        g.request_started = perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+        g.db_statements = []
+
+    def finish(self, response):
+        if 'request_started' not in g:
+            return response
+
+        request_ms = (perf_counter() - g.request_started) * 1000
+        db_ms = g.db_seconds * 1000
+
+        if current_app.config.get('SERVER_TIMING'):
+            response.headers.add(
+                'Server-Timing', 'db;dur={0:.2f};desc="{1} queries"'.format(
+                    db_ms, g.db_queries
+                )
+            )
+            response.headers.add(
+                'Server-Timing', 'app;dur={0:.2f}'.format(request_ms)
+            )
+
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(request_ms, 2),
+            'db_queries': g.db_queries,
+            'db_ms': round(db_ms, 2)
+        }
+        current_app.logger.info(json.dumps(fields))
+
+        threshold = current_app.config.get('QUERY_COUNT_THRESHOLD')
+        if threshold and g.db_queries > threshold:
+            current_app.logger.warning(json.dumps(dict(
+                fields, message='Too many queries', statements=g.db_statements
+            )))
+        g.db_statements = None
+
+        return response
+
+
+# process-wide request query stats, set up by create_flask_app
+query_stats = QueryStats()
@@ -0,0 +1,226 @@
+'''
+Token bucket rate limits, e.g. per user and route.
+
+A bucket holds up to burst tokens and refills at rate tokens per second.
+Each request takes a token, and a request finding its bucket empty is
+told how many seconds until the next token.
+
+Buckets are kept per process in a dict, each updated under one of a few
+striped locks, so requests of different users rarely wait for each other.
+With RATE_LIMIT_DIR set, they live in a memory mapped file of that
+directory instead, shared by the worker processes of the host, each slot
+updated under a byte range lock of the file, so limits hold across
+workers.
+'''
+import os
+import mmap
+import fcntl
+import struct
+import hashlib
+import threading
+
+from time import monotonic, time
+
+
+class TokenBuckets(object):
+    '''
+    Buckets of this process. Full buckets hold nothing worth keeping, so
+    they are dropped once there are more than maxsize buckets.
+    '''
+
+    def __init__(self, maxsize=100000, stripes=16):
+        self.maxsize = maxsize
+        self._buckets = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._prune_at = maxsize
+
+    def _lock(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+    def take(self, key, burst, rate):
+        '''
+        Takes a token from the bucket of key. Returns 0 when one was taken,
+        otherwise the seconds until the bucket has a token again.
+        '''
+        now = monotonic()
+        with self._lock(key):
+            tokens, stamp, full_at = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - stamp) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate
+
+            tokens -= 1
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+
+        if len(self._buckets) > self._prune_at:
+            self._prune()
+        return 0
+
+    def _prune(self):
+        now = monotonic()
+        for key in list(self._buckets):
+            with self._lock(key):
+                entry = self._buckets.get(key)
+                if entry is not None and entry[2] <= now:
+                    del self._buckets[key]
+
+        # buckets still in use are kept, wait for as many again to prune
+        self._prune_at = max(self.maxsize, 2 * len(self._buckets))
+
+    def clear(self):
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            self._buckets.clear()
+            self._prune_at = self.maxsize
+        finally:
+            for lock in self._locks:
+                lock.release()
+
+
+class SharedTokenBuckets(object):
+    '''
+    Buckets in a memory mapped file shared by the processes opening it.
+    The file is a table of slots of a key digest, the tokens left, when
+    they were counted and when the bucket is full again. A key has a slot
+    among the PROBES following its digest, reusing a slot whose bucket is
+    full. When all of them are in use the request is let through, rather
+    than limited with another key's bucket.
+    '''
+
+    SLOT = struct.Struct('Qddd')
+    PROBES = 8
+
+    def __init__(self, path, slots=65536):
+        self.path = path
+        self.slots = slots
+        self._locks = [threading.Lock() for _ in range(16)]
+        self._file = None
+        self._map = None
+        self._pid = None
+
+    def _open(self):
+        # each process, forked or not, maps the file itself
+        if self._pid != os.getpid():
+            size = self.slots * self.SLOT.size
+            self._file = open(self.path, 'a+b')
+            if os.fstat(self._file.fileno()).st_size < size:
+                self._file.truncate(size)
+            self._map = mmap.mmap(self._file.fileno(), size)
+            self._pid = os.getpid()
+        return self._map
+
+    @staticmethod
+    def _digest(key):
+        digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1
+
+    def take(self, key, burst, rate):
+        '''
+        Takes a token from the bucket of key. Returns 0 when one was taken,
+        otherwise the seconds until the bucket has a token again.
+        '''
+        table = self._open()
+        digest = self._digest(key)
+        first = digest % self.slots
+        probes = [(first + probe) % self.slots for probe in range(self.PROBES)]
+
+        # the key's own slot first, else the first free one. Slots are
+        # checked again under their lock, another key may take one meanwhile
+        now = time()
+        probes.sort(key=lambda index: self.SLOT.unpack_from(
+            table, index * self.SLOT.size
+        )[0] != digest)
+
+        for index in probes:
+            wait = self._take_slot(table, index, digest, burst, rate, now)
+            if wait is not None:
+                return wait
+        return 0
+
+    def _take_slot(self, table, index, digest, burst, rate, now):
+        # POSIX locks are held per process, the thread lock keeps the
+        # threads of this process apart
+        offset = index * self.SLOT.size
+        with self._locks[index % len(self._locks)]:
+            fcntl.lockf(self._file, fcntl.LOCK_EX, self.SLOT.size, offset)
+            try:
+                owner, tokens, stamp, full_at = self.SLOT.unpack_from(
+                    table, offset
+                )
+                if owner != digest:
+                    if owner and full_at > now:
+                        return None
+                    tokens, stamp = burst, now
+
+                tokens = min(burst, tokens + max(now - stamp, 0) * rate)
+                if tokens < 1:
+                    return (1 - tokens) / rate
+
+                tokens -= 1
+                self.SLOT.pack_into(
+                    table, offset,
+                    digest, tokens, now, now + (burst - tokens) / rate
+                )
+                return 0
+            finally:
+                fcntl.lockf(self._file, fcntl.LOCK_UN, self.SLOT.size, offset)
+
+    def clear(self):
+        table = self._open()
+        fcntl.lockf(self._file, fcntl.LOCK_EX)
+        try:
+            table[:] = bytes(len(table))
+        finally:
+            fcntl.lockf(self._file, fcntl.LOCK_UN)
+
+
+class RateLimiter(object):
+    '''
+    Token buckets per route name and key.
+
+    Configured from the app config:
+    - RATE_LIMITS: route name -> (burst, requests per second), routes
+      without a limit are not limited
+    - RATE_LIMIT_SIZE: most buckets a process keeps
+    - RATE_LIMIT_DIR: directory of the buckets shared by the worker
+      processes, unset each process limits on its own
+    '''
+
+    def __init__(self):
+        self.limits = {}
+        self.buckets = TokenBuckets()
+
+    def init_app(self, app):
+        self.limits = dict(app.config.get('RATE_LIMITS') or {})
+
+        directory = app.config.get('RATE_LIMIT_DIR')
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.buckets = SharedTokenBuckets(
+                os.path.join(directory, 'rate_limits.db'),
+                slots=app.config.get('RATE_LIMIT_SIZE', 100000)
+            )
+        else:
+            self.buckets = TokenBuckets(
+                maxsize=app.config.get('RATE_LIMIT_SIZE', 100000)
+            )
+
+    def take(self, name, key):
+        '''
+        Takes a token for key from the bucket of route name. Returns 0 when
+        the request may go on, otherwise the seconds to wait.
+        '''
+        limit = self.limits.get(name)
+        if not limit:
+            return 0
+
+        burst, rate = limit
+        return self.buckets.take('{0}:{1}'.format(name, key), burst, rate)
+
+    def clear(self):
+        self.buckets.clear()
+
+
+# process-wide rate limiter, configured by RateLimiter.init_app
+rate_limiter = RateLimiter()
@@ -1,15 +1,91 @@
+import json
+import hashlib
 
-def pin_errors(errors, status_code):
-    return {
+from flask import Response, stream_with_context
+
+
+def pin_errors(errors, status_code, headers=None):
+    response = {
         'status': 'fail',
         'data': { 'message': errors }
-    }, status_code
+    }
+    if headers:
+        return response, status_code, headers
+    return response, status_code
 
-def pin_success(message, response_data, status_code):
-    return dict(
+def pin_success(message, response_data, status_code, headers=None):
+    response = dict(
             status='success',
             data={
                 'message': message,
                 **response_data
             }
-        ), status_code
+        )
+    if headers:
+        return response, status_code, headers
+    return response, status_code
+
+def make_etag(*parts):
+    """ Builds a quoted ETag from the parts a response depends on """
+    return '"%s"' % hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+def pin_not_modified(etag):
+    """ 304 response for a client that already holds the current version """
+    return Response(status=304, headers={'ETag': etag})
+
+def pin_success_stream(message, key, items, status_code, chunk_size=500):
+    """ Streams a success response whose data[key] is a JSON array written
+        incrementally from an iterator of serializable items, so the whole
+        list is never held in memory
+    """
+    def generate():
+        yield '{"status": "success", "data": {"message": %s, %s: [' % (
+            json.dumps(message), json.dumps(key)
+        )
+
+        chunk = []
+        separator = ''
+        for item in items:
+            chunk.append(json.dumps(item))
+            if len(chunk) == chunk_size:
+                yield separator + ', '.join(chunk)
+                separator = ', '
+                chunk = []
+
+        if chunk:
+            yield separator + ', '.join(chunk)
+
+        yield ']}}\n'
+
+    return Response(
+        stream_with_context(generate()),
+        status=status_code,
+        mimetype='application/json'
+    )
+
+def pin_success_ndjson(items, status_code, filename=None, chunk_size=500):
+    """ Streams newline-delimited JSON, one line per serializable item of
+        an iterator, sent in chunks of chunk_size lines. Without a length
+        the response goes out with chunked transfer encoding
+    """
+    def generate():
+        chunk = []
+        for item in items:
+            chunk.append(json.dumps(item))
+            if len(chunk) == chunk_size:
+                yield '\n'.join(chunk) + '\n'
+                chunk = []
+
+        if chunk:
+            yield '\n'.join(chunk) + '\n'
+
+    headers = {}
+    if filename:
+        headers['Content-Disposition'] = 'attachment; filename="%s"' % filename
+
+    return Response(
+        stream_with_context(generate()),
+        status=status_code,
+        headers=headers,
+        mimetype='application/x-ndjson'
+    )
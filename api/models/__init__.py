@@ -4,19 +4,24 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 # import helpers
-from .helper import PushID
+from .helper import (
+    PushID, push_id_generator, geo, password_hasher, PasswordHasherBusy,
+    pool_metrics
+)
 
 # import models
 from .users import Users
 from .pins import Pins
 from .pin_shares import PinShares
+from .model_mixin import (
+    UnitOfWork, unit_of_work, current_unit_of_work, after_commit
+)
 
 def fancy_id_generator(mapper, connection, target):
     '''
     A function to generate unique identifiers on insert
     '''
-    push_id = PushID()
-    target.id = push_id.next_id()
+    target.id = push_id_generator.next_id()
 
 # associate the listener function with models, to execute during the
 # "before_insert" event
@@ -1 +1,4 @@
-from .id_generator import PushID
\ No newline at end of file
+from .id_generator import PushID, push_id_generator
+from . import geo
+from .password import PasswordHasher, PasswordHasherBusy, password_hasher
+from .pool import PoolMetrics, MeteredQueuePool, pool_metrics
@@ -0,0 +1,175 @@
+'''
+Grid cells for spatial lookups on a plain B-tree index.
+
+Latitude and longitude are each quantized to CELL_BITS bits and their bits
+interleaved (a Z-order curve, like a geohash) into one integer cell id.
+Cells at a coarser level are prefixes of the cells they contain, so any
+coarse cell maps to one contiguous range of cell ids, and a bounding box
+can be covered by a handful of `cell >= low AND cell < high` range scans.
+'''
+import math
+import numpy
+
+CELL_BITS = 26
+MAX_CELL = (1 << CELL_BITS) - 1
+
+
+def _spread_bits(value):
+    # spread the low 32 bits of value to the even bits of a 64-bit int
+    value &= 0x00000000FFFFFFFF
+    value = (value | (value << 16)) & 0x0000FFFF0000FFFF
+    value = (value | (value << 8)) & 0x00FF00FF00FF00FF
+    value = (value | (value << 4)) & 0x0F0F0F0F0F0F0F0F
+    value = (value | (value << 2)) & 0x3333333333333333
+    value = (value | (value << 1)) & 0x5555555555555555
+    return value
+
+
+def _interleave(lat_bits, lng_bits):
+    return (_spread_bits(lng_bits) << 1) | _spread_bits(lat_bits)
+
+
+def _quantize(value, low, high):
+    cell = int((value - low) / (high - low) * (MAX_CELL + 1))
+    return min(max(cell, 0), MAX_CELL)
+
+
+def quantize_lat(lat):
+    return _quantize(lat, -90.0, 90.0)
+
+
+def quantize_lng(lng):
+    return _quantize(lng, -180.0, 180.0)
+
+
+def cell_id(lat, lng):
+    ''' Returns the finest grid cell id of a coordinate '''
+    return _interleave(quantize_lat(lat), quantize_lng(lng))
+
+
+def _cover(lat_low, lat_high, lng_low, lng_high, max_cells):
+    # find the finest level whose cells over the box number at most max_cells
+    for shift in range(CELL_BITS + 1):
+        lat_cells = (lat_high >> shift) - (lat_low >> shift) + 1
+        lng_cells = (lng_high >> shift) - (lng_low >> shift) + 1
+        if lat_cells * lng_cells <= max_cells:
+            break
+
+    ranges = []
+    for lat_cell in range(lat_low >> shift, (lat_high >> shift) + 1):
+        for lng_cell in range(lng_low >> shift, (lng_high >> shift) + 1):
+            prefix = _interleave(lat_cell, lng_cell)
+            ranges.append((prefix << 2 * shift, (prefix + 1) << 2 * shift))
+    return ranges
+
+
+def cell_ranges(min_lat, min_lng, max_lat, max_lng, max_cells=16):
+    '''
+    Returns sorted, non-overlapping (low, high) cell id ranges covering a
+    bounding box. A box with min_lng > max_lng crosses the antimeridian.
+    '''
+    lat_low, lat_high = quantize_lat(min_lat), quantize_lat(max_lat)
+
+    if min_lng <= max_lng:
+        boxes = [(quantize_lng(min_lng), quantize_lng(max_lng))]
+    else:
+        boxes = [(quantize_lng(min_lng), MAX_CELL), (0, quantize_lng(max_lng))]
+
+    ranges = []
+    for lng_low, lng_high in boxes:
+        ranges += _cover(
+            lat_low, lat_high, lng_low, lng_high, max_cells // len(boxes)
+        )
+
+    # merge touching ranges so fewer index scans are needed
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(high, merged[-1][1]))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine(lat, lng, lats, lngs):
+    '''
+    Returns the great-circle distances in km from a coordinate to arrays of
+    coordinates, computed in one vectorized pass.
+    '''
+    lat, lng = math.radians(lat), math.radians(lng)
+    lats, lngs = numpy.radians(lats), numpy.radians(lngs)
+
+    a = (numpy.sin((lats - lat) / 2) ** 2 +
+         math.cos(lat) * numpy.cos(lats) * numpy.sin((lngs - lng) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * numpy.arcsin(numpy.sqrt(numpy.clip(a, 0, 1)))
+
+
+def bounding_box(lat, lng, distance_km):
+    '''
+    Returns the (min_lat, min_lng, max_lat, max_lng) box holding every
+    coordinate within distance_km of a coordinate, and whether the box
+    covers the whole globe. min_lng > max_lng when it crosses the antimeridian.
+    '''
+    angle = math.degrees(distance_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - angle, lat + angle
+
+    if min_lat <= -90 or max_lat >= 90 or angle >= 180:
+        # the circle holds a pole, so it spans every longitude
+        min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+        return (min_lat, -180.0, max_lat, 180.0), (min_lat, max_lat) == (-90, 90)
+
+    lng_angle = math.degrees(math.asin(
+        math.sin(math.radians(angle)) / math.cos(math.radians(lat))
+    ))
+    min_lng, max_lng = lng - lng_angle, lng + lng_angle
+
+    if min_lng < -180:
+        min_lng += 360
+    if max_lng > 180:
+        max_lng -= 360
+
+    return (min_lat, min_lng, max_lat, max_lng), False
+
+
+def nearest(lat, lng, k, candidates, distance_km=10.0):
+    '''
+    Finds the k coordinates nearest to lat, lng.
+
+    Args:
+        candidates: function taking a bounding box and returning a list of
+                    (key, lat, lng) in it
+        distance_km: radius of the first box searched; it grows until it
+                     is certain to hold the k nearest coordinates
+
+    Returns:
+        list of (key, distance in km), nearest first
+    '''
+    while True:
+        box, is_globe = bounding_box(lat, lng, distance_km)
+        rows = candidates(*box)
+
+        distances = haversine(
+            lat, lng,
+            numpy.fromiter((row[1] for row in rows), float, len(rows)),
+            numpy.fromiter((row[2] for row in rows), float, len(rows))
+        )
+
+        if len(rows) > k:
+            order = numpy.argpartition(distances, k - 1)[:k]
+        else:
+            order = numpy.arange(len(rows))
+        order = order[numpy.argsort(distances[order])]
+
+        # the box holds everything within distance_km, so once the kth
+        # nearest candidate is that close no pin outside can beat it
+        if is_globe or (len(order) == k and distances[order[-1]] <= distance_km):
+            return [(rows[i][0], float(distances[i])) for i in order]
+
+        if len(order) == k:
+            # search again just past the kth nearest candidate
+            distance_km = float(distances[order[-1]]) * 1.001
+        else:
+            distance_km *= 4
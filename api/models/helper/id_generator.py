@@ -1,5 +1,5 @@
-import numpy
-from random import random
+import threading
+from random import getrandbits
 from time import time
 
 
@@ -16,6 +16,9 @@ class PushID(object):
        in the same timestamp, the latter ones will sort after the former ones.
        We do this by using the previous random bits but "incrementing" them by
        1 (only in the case of a timestamp collision).
+
+    A single instance is safe to share between threads, see
+    `push_id_generator` below.
     '''
 
     # Modeled after base64 web-safe chars, but ordered by ASCII.
@@ -23,52 +26,87 @@ class PushID(object):
                   'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
                   '_abcdefghijklmnopqrstuvwxyz')
 
+    RAND_BITS = 72
+
     def __init__(self):
 
+        # Every pair of push chars, indexed by the 12-bit value they encode.
+        self.push_pairs = tuple(
+            a + b for a in self.PUSH_CHARS for b in self.PUSH_CHARS
+        )
+
         # Timestamp of last push, used to prevent local collisions if you
         # pushtwice in one ms.
         self.last_push_time = 0
 
         # We generate 72-bits of randomness which get turned into 12
         # characters and appended to the timestamp to prevent
-        # collisions with other clients.  We store the last characters
+        # collisions with other clients.  We store the last random bits
         # we generated because in the event of a collision, we'll use
-        # those same characters except "incremented" by one.
-        self.last_rand_chars = numpy.empty(12, dtype=int)
+        # those same bits except "incremented" by one.
+        self.last_rand = 0
+
+        self.lock = threading.Lock()
+
+    def _encode(self, value, pairs):
+        # encode value as `pairs` pairs of push chars, most significant first
+        pair_chars = self.push_pairs
+        chars = []
+        for i in range(pairs):
+            chars.append(pair_chars[value & 4095])
+            value >>= 12
+        return ''.join(reversed(chars))
 
     def next_id(self):
-        now = int(time() * 1000)
-        duplicate_time = (now == self.last_push_time)
-        self.last_push_time = now
-        time_stamp_chars = numpy.empty(8, dtype=str)
+        return self.next_ids(1)[0]
+
+    def next_ids(self, n):
+        '''
+        Generate n ids at once. They share one timestamp (unless the random
+        bits overflow) and hold increasing random bits, so they are unique
+        and sorted in generation order.
+        '''
+        with self.lock:
+            now = int(time() * 1000)
 
-        for i in range(7, -1, -1):
-            time_stamp_chars[i] = self.PUSH_CHARS[now % 64]
-            now = int(now / 64)
+            if now > self.last_push_time:
+                self.last_push_time = now
+                rand = getrandbits(self.RAND_BITS)
+            else:
+                # If the timestamp hasn't changed since last push (or the
+                # clock went back), use the last timestamp and random
+                # number, except incremented by 1.
+                rand = self.last_rand + 1
 
-        if now != 0:
+            ids = []
+            for i in range(n):
+                if rand >> self.RAND_BITS:
+                    # random bits overflowed, move on to the next ms with
+                    # fresh bits, leaving headroom for further increments
+                    self.last_push_time += 1
+                    rand = getrandbits(self.RAND_BITS - 1)
+                ids.append((self.last_push_time, rand))
+                rand += 1
+
+            if ids:
+                self.last_rand = ids[-1][1]
+
+        if ids and ids[-1][0] >> 48:
             raise ValueError('We should have converted the entire timestamp.')
 
-        unique_id = ''.join(time_stamp_chars)
-
-        if not duplicate_time:
-            for i in range(12):
-                # random() returns a floating point number in the
-                # range(0.0, 1.0)
-                self.last_rand_chars[i] = int(random() * 64)
-        else:
-            # If the timestamp hasn't changed since last push, use the
-            # same random number, except incremented by 1.
-            for i in range(11, -1, -1):
-                if self.last_rand_chars[i] == 63:
-                    self.last_rand_chars[i] = 0
-                else:
-                    break
-            self.last_rand_chars[i] += 1
-
-        for i in range(12):
-            unique_id += self.PUSH_CHARS[self.last_rand_chars[i]]
-
-        if len(unique_id) != 20:
-            raise ValueError('Length should be 20.')
-        return unique_id
+        # the timestamp only changes on overflow, so encode it once per run
+        time_stamp_chars = {}
+        unique_ids = []
+        for push_time, rand in ids:
+            if push_time not in time_stamp_chars:
+                time_stamp_chars[push_time] = self._encode(push_time, 4)
+            unique_ids.append(
+                time_stamp_chars[push_time] + self._encode(rand, 6)
+            )
+
+        return unique_ids
+
+
+# process-wide generator, so ids created in the same millisecond by any
+# thread stay unique and monotonic
+push_id_generator = PushID()
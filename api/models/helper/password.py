@@ -0,0 +1,94 @@
+import os
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+def _lower_priority():
+    # hashing processes yield the CPU to the request threads
+    if hasattr(os, 'nice'):
+        os.nice(10)
+
+
+class PasswordHasherBusy(Exception):
+    ''' Raised when the hashing pool already holds its maximum of jobs '''
+
+
+class PasswordHasher(object):
+    '''
+    Hashes and checks passwords on a dedicated process pool, so a burst of
+    signups or logins can't pin every request thread on PBKDF2.
+
+    Configured from the app config:
+    - PASSWORD_HASH_METHOD: werkzeug hash method, e.g. 'pbkdf2:sha256:260000'
+    - PASSWORD_HASH_WORKERS: pool processes, 0 hashes in the calling thread
+    - PASSWORD_HASH_QUEUE_DEPTH: jobs allowed to wait for a free process,
+      more raise PasswordHasherBusy
+    '''
+
+    def __init__(self, method='pbkdf2:sha256', workers=0, queue_depth=0):
+        self.method = method
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._pool = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.queue_depth = app.config.get(
+            'PASSWORD_HASH_QUEUE_DEPTH', self.queue_depth
+        )
+        self.shutdown()
+
+    def _get_pool(self):
+        # the pool is started on first use, so it is created in the process
+        # serving requests rather than one that forks it
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_lower_priority
+                )
+                self._slots = threading.BoundedSemaphore(
+                    self.workers + self.queue_depth
+                )
+            return self._pool, self._slots
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+
+        pool, slots = self._get_pool()
+
+        if not slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+
+        try:
+            future = pool.submit(function, *args)
+        except BaseException:
+            slots.release()
+            raise
+
+        future.add_done_callback(lambda future: slots.release())
+        return future.result()
+
+    def generate(self, password):
+        ''' Returns the hash of a password '''
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, password_hash, password):
+        ''' Confirms a password matches its hash '''
+        return self._run(check_password_hash, password_hash, password)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool = None
+            self._slots = None
+
+
+# process-wide hasher, configured by create_flask_app
+password_hasher = PasswordHasher()
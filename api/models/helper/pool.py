@@ -0,0 +1,104 @@
+import threading
+
+from bisect import bisect_left
+from time import perf_counter
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics(object):
+    '''
+    Counts connection checkouts from the engine's pool and how long each
+    waited for a connection, in a histogram of CHECKOUT_BUCKETS seconds.
+    '''
+
+    CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def init_app(self, app):
+        ''' Meter the pool when the engine options configure a queue pool '''
+        options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+        if 'pool_size' in options and 'poolclass' not in options:
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(
+                options, poolclass=MeteredQueuePool
+            )
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.buckets = [0] * (len(self.CHECKOUT_BUCKETS) + 1)
+
+    def observe(self, seconds):
+        ''' Records a checkout that waited seconds for its connection '''
+        bucket = bisect_left(self.CHECKOUT_BUCKETS, seconds)
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            self.buckets[bucket] += 1
+
+    def timeout(self):
+        ''' Records a checkout that gave up waiting for a connection '''
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self, pool=None):
+        '''
+        Returns the checkout counters, with cumulative histogram buckets
+        keyed by their upper bound, and the live state of a queue pool.
+        '''
+        with self._lock:
+            counts = list(self.buckets)
+            stats = {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_seconds': self.wait_seconds,
+                'max_wait_seconds': self.max_wait_seconds
+            }
+
+        total = 0
+        histogram = []
+        for bound, count in zip((*self.CHECKOUT_BUCKETS, '+Inf'), counts):
+            total += count
+            histogram.append({'le': bound, 'count': total})
+        stats['checkout_histogram'] = histogram
+
+        if isinstance(pool, QueuePool):
+            stats.update({
+                'size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': max(pool.overflow(), 0),
+                'max_overflow': pool._max_overflow,
+                'timeout': pool.timeout()
+            })
+        return stats
+
+
+# process-wide pool metrics, fed by MeteredQueuePool
+pool_metrics = PoolMetrics()
+
+
+class MeteredQueuePool(QueuePool):
+    '''
+    QueuePool timing every checkout into pool_metrics, including the time
+    spent waiting for a connection when the pool and overflow are in use.
+    '''
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            connection = super()._do_get()
+        except TimeoutError:
+            pool_metrics.timeout()
+            raise
+
+        pool_metrics.observe(perf_counter() - start)
+        return connection
@@ -1,9 +1,119 @@
 from datetime import datetime
+from flask import g, has_app_context
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import SQLAlchemyError
 
 from ..models import db
 
 
+class UnitOfWork(object):
+    """ Groups the ModelMixin writes of a request into one transaction.
+
+        Inside a unit, save, update, delete, delete_all, save_all and
+        insert_many flush their changes instead of committing them. The
+        unit commits once when it exits, or on an explicit commit(). An
+        exception, or a write that failed and rolled back, makes the unit
+        roll back on exit instead. Units opened inside a unit join it.
+
+        with unit_of_work() as unit:
+            pin.save()
+            Pins.update(other_pin, name='Other')
+            unit.after_commit(notify, pin.id)
+    """
+
+    def __init__(self):
+        self.failed = False
+        self.callbacks = []
+        self._outer = None
+
+    def __enter__(self):
+        current = current_unit_of_work()
+        if current is not None:
+            self._outer = current
+            return current
+
+        g.unit_of_work = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._outer is not None:
+            if exc_type is not None:
+                self._outer.failed = True
+            return False
+
+        try:
+            if exc_type is not None or self.failed:
+                db.session.rollback()
+            else:
+                self.commit()
+        finally:
+            g.pop('unit_of_work', None)
+        return False
+
+    def commit(self):
+        """ Commits the writes staged so far, then runs the after_commit
+            callbacks. Rolls back and raises on error.
+        """
+        try:
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            self.failed = True
+            raise
+
+        callbacks, self.callbacks = self.callbacks, []
+        for callback, args in callbacks:
+            callback(*args)
+
+    def fail(self):
+        """ Roll back the staged writes on exit instead of committing """
+        self.failed = True
+
+    def after_commit(self, callback, *args):
+        """ Calls callback(*args) once the writes are committed """
+        self.callbacks.append((callback, args))
+
+
+def unit_of_work():
+    """ Returns a UnitOfWork to use as a context manager """
+    return UnitOfWork()
+
+
+def current_unit_of_work():
+    """ The unit of work of the current app context, or None """
+    if not has_app_context():
+        return None
+    return g.get('unit_of_work')
+
+
+def after_commit(callback, *args):
+    """ Calls callback(*args) once the current unit of work commits, or
+        right away outside of one
+    """
+    unit = current_unit_of_work()
+    if unit is None:
+        callback(*args)
+    else:
+        unit.after_commit(callback, *args)
+
+
+def _commit():
+    # inside a unit of work only flush, the unit commits once at its end
+    if current_unit_of_work() is None:
+        db.session.commit()
+    else:
+        db.session.flush()
+
+
+def _rollback():
+    db.session.rollback()
+
+    unit = current_unit_of_work()
+    if unit is not None:
+        unit.fail()
+
+
 class ModelMixin(db.Model):
     __abstract__ = True
 
@@ -14,20 +124,20 @@ class ModelMixin(db.Model):
         """Saves an instance of the model to the database."""
         try:
             db.session.add(self)
-            db.session.commit()
+            _commit()
             return self
         except SQLAlchemyError as error:
-            db.session.rollback()
+            _rollback()
             return error
 
     def delete(self):
         """Delete an instance of the model from the database."""
         try:
             db.session.delete(self)
-            db.session.commit()
+            _commit()
             return True
         except SQLAlchemyError as error:
-            db.session.rollback()
+            _rollback()
             return False
 
     @classmethod
@@ -36,10 +146,10 @@ class ModelMixin(db.Model):
         try:
             is_deleted = cls.query.filter_by(**kwargs).delete()
 
-            db.session.commit()
+            _commit()
             return is_deleted
         except SQLAlchemyError as error:
-            db.session.rollback()
+            _rollback()
             return False
 
     @classmethod
@@ -51,10 +161,10 @@ class ModelMixin(db.Model):
 
             for key, value in kwargs.items():
                 setattr(instance, key, value)
-            db.session.commit()
+            _commit()
             return True
         except SQLAlchemyError as error:
-            db.session.rollback()
+            _rollback()
             return False
 
     @classmethod
@@ -137,12 +247,96 @@ class ModelMixin(db.Model):
         """Saves a list of model instances to the database."""
         try:
             db.session.bulk_save_objects(records_object)
-            db.session.commit()
+            _commit()
             return True
         except SQLAlchemyError as error:
-            db.session.rollback()
+            _rollback()
             return False
 
+    @classmethod
+    def insert_many(cls, rows, conflict_columns=None, returning=None):
+        """Inserts a list of rows with a single multi-row INSERT statement.
+
+        Args:
+            rows: list of dicts of column values
+            conflict_columns: columns of a unique constraint, rows clashing
+                              with an existing row are skipped
+            returning: columns to return for the inserted rows. Dialects
+                       without INSERT .. RETURNING select them back by the
+                       primary keys of the rows when conflict_columns is
+                       given, otherwise echo back every row given. Rows
+                       without their primary key are echoed back as well,
+                       skipped or not
+
+        Returns:
+            result -- Returns the returned rows if returning is given,
+                      otherwise the number of inserted rows. False on error
+        """
+        if not rows:
+            return [] if returning else 0
+
+        table = cls.__table__
+
+        if db.engine.dialect.name == 'postgresql':
+            statement = postgresql.insert(table)
+            if conflict_columns:
+                statement = statement.on_conflict_do_nothing(
+                    index_elements=conflict_columns
+                )
+            if returning:
+                statement = statement.returning(*returning)
+        else:
+            statement = table.insert()
+            if conflict_columns:
+                statement = statement.prefix_with('OR IGNORE', dialect='sqlite')
+
+        try:
+            result = db.session.execute(statement.values(rows))
+
+            if not returning:
+                inserted = result.rowcount
+            elif result.returns_rows:
+                inserted = result.fetchall()
+            elif conflict_columns and all(
+                    column.name in row
+                    for row in rows for column in table.primary_key):
+                inserted = cls._select_inserted(rows, returning)
+            else:
+                inserted = [
+                    tuple(row[column.name] for column in returning)
+                    for row in rows
+                ]
+            _commit()
+            return inserted
+        except SQLAlchemyError as error:
+            _rollback()
+            return False
+
+    @classmethod
+    def _select_inserted(cls, rows, returning):
+        """Selects the returning columns of the given rows still found by
+        their primary keys, in the order of rows. A row skipped by a
+        conflict holds a new key, so it isn't found.
+        """
+        table = cls.__table__
+        key_columns = list(table.primary_key)
+        keys = [
+            tuple(row[column.name] for column in key_columns) for row in rows
+        ]
+
+        if len(key_columns) == 1:
+            condition = key_columns[0].in_([key[0] for key in keys])
+        else:
+            condition = tuple_(*key_columns).in_(keys)
+
+        found = {
+            tuple(row[:len(key_columns)]): tuple(row[len(key_columns):])
+            for row in db.session.execute(
+                select([*key_columns, *returning]).where(condition)
+            )
+        }
+        return [found[key] for key in keys if key in found]
+
     @classmethod
     def query_sql(cls, query, args):
         """Executes a query directly in the db.
@@ -157,5 +351,5 @@ class ModelMixin(db.Model):
         try:
             return db.session.execute(query, args)
         except SQLAlchemyError as error:
-            db.session.rollback()
+            _rollback()
             return False
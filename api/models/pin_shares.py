@@ -1,8 +1,8 @@
 from datetime import datetime
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, joinedload, contains_eager
 
 from .model_mixin import ModelMixin
-from . import db, Users, Pins
+from . import db, Users, Pins, push_id_generator
 
 
 class PinShares(ModelMixin):
@@ -11,6 +11,14 @@ class PinShares(ModelMixin):
     """
 
     __tablename__ = 'pinshares'
+    __table_args__ = (
+        db.UniqueConstraint(
+            'pin_id', 'shared_by', 'shared_to',
+            name='uq_pinshares_pin_id_shared_by_shared_to'
+        ),
+        # backs the keyset pagination of the pins shared with a user
+        db.Index('ix_pinshares_shared_to_id', 'shared_to', 'id'),
+    )
 
     id = db.Column(db.String, primary_key=True) # primary key
 
@@ -29,4 +37,149 @@ class PinShares(ModelMixin):
     modified_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr_(self):
-        return "<PinShares %r>" % (self.pin_id)
\ No newline at end of file
+        return "<PinShares %r>" % (self.pin_id)
+
+    @classmethod
+    def page_to_user(cls, user_id, cursor=None, limit=20):
+        """ Gets a page of the shares to a user, newest first, with the
+            shared pins and their owners loaded.
+        Args
+            user_id(str): user the pins were shared with
+            cursor(str): only shares with an id before the cursor are returned
+            limit(int): maximum number of shares to return
+        Returns
+            list of pin shares
+        """
+        query = cls.query.options(
+            joinedload(cls.pin).joinedload('user')
+        ).filter(cls.shared_to == user_id)
+
+        if cursor:
+            query = query.filter(cls.id < cursor)
+
+        return query.order_by(cls.id.desc()).limit(limit).all()
+
+    @classmethod
+    def stream_to_user(cls, user_id, batch_size=1000):
+        """ Iterates over all the shares to a user, with the shared pins and
+            their owners, ordered by id and read from a server-side cursor
+            in batches.
+        Args
+            user_id(str): user the pins were shared with
+            batch_size(int): number of rows fetched per round trip
+        Returns
+            iterator of pin shares
+        """
+        return cls.query.options(
+            joinedload(cls.pin).joinedload('user')
+        ).filter(cls.shared_to == user_id).order_by(cls.id).yield_per(
+            batch_size
+        )
+
+    @classmethod
+    def within_to_user(cls, user_id, min_lat, min_lng, max_lat, max_lng,
+                       limit=500):
+        """ Gets up to limit of the shares to a user whose pins are inside a
+            bounding box, oldest first, with the shared pins and their owners
+            loaded
+        """
+        return cls.query.join(cls.pin).options(
+            contains_eager(cls.pin).joinedload('user')
+        ).filter(
+            cls.shared_to == user_id,
+            Pins.within_filter(min_lat, min_lng, max_lat, max_lng)
+        ).order_by(cls.id).limit(limit).all()
+
+    @classmethod
+    def find_for_user(cls, user_id, ids):
+        """ Gets the shares to a user among the given ids, with the shared
+            pins and their owners loaded
+        """
+        return cls.query.options(
+            joinedload(cls.pin).joinedload('user')
+        ).filter(cls.id.in_(ids), cls.shared_to == user_id).all()
+
+    @classmethod
+    def coordinates_within(cls, user_id, min_lat, min_lng, max_lat, max_lng):
+        """ Gets the (share id, lat, lng) of the pins shared to a user inside
+            a bounding box, without building pin objects
+        """
+        return db.session.query(cls.id, Pins.lat, Pins.lng).join(
+            Pins, cls.pin_id == Pins.id
+        ).filter(
+            cls.shared_to == user_id,
+            Pins.within_filter(min_lat, min_lng, max_lat, max_lng)
+        ).all()
+
+    @classmethod
+    def share_with(cls, pin_id, shared_by, user_ids):
+        """ Share a pin with many users in a single transaction.
+        Args
+            pin_id(str): pin to share
+            shared_by(str): id of the user sharing the pin
+            user_ids(list): ids of the users to share the pin with
+        Returns
+            (shared, skipped, invalid) lists of user ids, or False on error
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+
+        # validate all target users with one query
+        valid_ids = {
+            user_id for (user_id,) in db.session.query(Users.id).filter(
+                Users.id.in_(user_ids)
+            )
+        }
+
+        # find all previous shares with one query
+        shared_ids = {
+            user_id for (user_id,) in db.session.query(cls.shared_to).filter(
+                cls.pin_id == pin_id,
+                cls.shared_by == shared_by,
+                cls.shared_to.in_(valid_ids)
+            )
+        } if valid_ids else set()
+
+        invalid = [user_id for user_id in user_ids if user_id not in valid_ids]
+        new_ids = [
+            user_id for user_id in user_ids
+            if user_id in valid_ids and user_id not in shared_ids
+        ]
+
+        # insert all new shares with one statement, skipping any share
+        # created concurrently since the lookup above
+        inserted = cls.insert_many(
+            [
+                {
+                    "id": share_id,
+                    "pin_id": pin_id,
+                    "shared_by": shared_by,
+                    "shared_to": user_id
+                }
+                for share_id, user_id in zip(
+                    push_id_generator.next_ids(len(new_ids)), new_ids
+                )
+            ],
+            conflict_columns=['pin_id', 'shared_by', 'shared_to'],
+            returning=[cls.__table__.c.shared_to]
+        )
+
+        if inserted is False:
+            return False
+
+        inserted_ids = {row[0] for row in inserted}
+        shared = [user_id for user_id in new_ids if user_id in inserted_ids]
+        skipped = [
+            user_id for user_id in user_ids
+            if user_id in valid_ids and user_id not in inserted_ids
+        ]
+
+        return shared, skipped, invalid
+
+    @classmethod
+    def recipients_of(cls, pin_id):
+        """ Gets the ids of the users a pin is shared with """
+        return [
+            user_id for (user_id,) in db.session.query(
+                cls.shared_to
+            ).filter(cls.pin_id == pin_id).distinct()
+        ]
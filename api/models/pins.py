@@ -1,8 +1,9 @@
 from datetime import datetime
-from sqlalchemy.dialects import postgresql
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
 
 from .model_mixin import ModelMixin
-from . import db, Users
+from . import db, Users, geo, push_id_generator
 
 
 class Pins(ModelMixin):
@@ -11,6 +12,13 @@ class Pins(ModelMixin):
     """
 
     __tablename__ = 'pins'
+    __table_args__ = (
+        # backs the keyset pagination of a user's pins
+        db.Index('ix_pins_user_id_id', 'user_id', 'id'),
+        # back the bounding box lookups, see helper/geo.py
+        db.Index('ix_pins_cell', 'cell'),
+        db.Index('ix_pins_user_id_cell', 'user_id', 'cell'),
+    )
 
     id = db.Column(db.String, primary_key=True) # primary key
 
@@ -18,7 +26,12 @@ class Pins(ModelMixin):
     user_id = db.Column(db.String, db.ForeignKey(Users.id), nullable=False)
 
     name = db.Column(db.String, nullable=False)
-    latLng = db.Column(postgresql.ARRAY(db.Float()), nullable=False)
+
+    # coordinates in plain float columns, so any database can hold and
+    # index them, read and written through latLng
+    lat = db.Column(db.Float, nullable=False)
+    lng = db.Column(db.Float, nullable=False)
+    cell = db.Column(db.BigInteger)
 
     shared_pin = db.relationship(
             "PinShares", 
@@ -34,3 +47,129 @@ class Pins(ModelMixin):
     def __repr__(self):
         return "<Pins %r>" % (self.name)
 
+    @property
+    def latLng(self):
+        """ The [lat, lng] of the pin """
+        if self.lat is None or self.lng is None:
+            return None
+        return [self.lat, self.lng]
+
+    @latLng.setter
+    def latLng(self, latLng):
+        """ Sets lat, lng and the grid cell from [lat, lng] """
+        self.lat, self.lng = latLng
+        self.cell = geo.cell_id(self.lat, self.lng)
+
+    @classmethod
+    def within_filter(cls, min_lat, min_lng, max_lat, max_lng, user_id=None):
+        """ Builds the filter matching pins inside a bounding box.
+            Each cell range is one index range scan (on (user_id, cell) when
+            user_id is given) and the lat and lng checks drop the pins outside
+            the box at the cell edges.
+        """
+        ranges = geo.cell_ranges(min_lat, min_lng, max_lat, max_lng)
+
+        owner_filter = [cls.user_id == user_id] if user_id else []
+
+        if min_lng <= max_lng:
+            lng_filter = cls.lng.between(min_lng, max_lng)
+        else:
+            lng_filter = or_(cls.lng >= min_lng, cls.lng <= max_lng)
+
+        return and_(
+            or_(*(
+                and_(*owner_filter, cls.cell >= low, cls.cell < high)
+                for low, high in ranges
+            )),
+            cls.lat.between(min_lat, max_lat),
+            lng_filter
+        )
+
+    @classmethod
+    def within_for_user(cls, user_id, min_lat, min_lng, max_lat, max_lng,
+                        limit=500):
+        """ Gets up to limit of a user's pins inside a bounding box, oldest
+            first
+        """
+        return cls.query.filter(
+            cls.within_filter(min_lat, min_lng, max_lat, max_lng, user_id)
+        ).order_by(cls.id).limit(limit).all()
+
+    @classmethod
+    def find_for_user(cls, user_id, ids):
+        """ Gets a user's pins among the given ids """
+        return cls.query.filter(cls.id.in_(ids), cls.user_id == user_id).all()
+
+    @classmethod
+    def coordinates_within(cls, user_id, min_lat, min_lng, max_lat, max_lng):
+        """ Gets the (id, lat, lng) of a user's pins inside a bounding box,
+            without building pin objects
+        """
+        return db.session.query(cls.id, cls.lat, cls.lng).filter(
+            cls.within_filter(min_lat, min_lng, max_lat, max_lng, user_id)
+        ).all()
+
+    @classmethod
+    def page_for_user(cls, user_id, cursor=None, limit=20):
+        """ Gets a page of a user's pins, newest first.
+        Args
+            user_id(str): owner of the pins
+            cursor(str): only pins with an id before the cursor are returned
+            limit(int): maximum number of pins to return
+        Returns
+            list of pins
+        """
+        query = cls.query.filter(cls.user_id == user_id)
+
+        if cursor:
+            query = query.filter(cls.id < cursor)
+
+        return query.order_by(cls.id.desc()).limit(limit).all()
+
+    @classmethod
+    def stream_for_user(cls, user_id, batch_size=1000):
+        """ Iterates over all of a user's pins, with their owner, ordered by
+            id and read from a server-side cursor in batches. The session
+            holds loaded pins weakly, so pins already consumed are freed.
+        Args
+            user_id(str): owner of the pins
+            batch_size(int): number of rows fetched per round trip
+        Returns
+            iterator of pins
+        """
+        return cls.query.options(joinedload(cls.user)).filter(
+            cls.user_id == user_id
+        ).order_by(cls.id).yield_per(batch_size)
+
+    @classmethod
+    def insert_batch(cls, user_id, pins):
+        """ Adds many pins for a user with a single multi-row INSERT.
+            The statement bypasses the ORM, so the ids, the columns set
+            from latLng and the defaults are all filled in here.
+        Args
+            user_id(str): owner of the pins
+            pins(list): dicts with the name and latLng of each pin
+        Returns
+            list of the new pin ids, in the order of pins, or False on error
+        """
+        now = datetime.utcnow()
+        ids = push_id_generator.next_ids(len(pins))
+
+        rows = []
+        for pin_id, pin in zip(ids, pins):
+            lat, lng = pin['latLng']
+            rows.append({
+                "id": pin_id,
+                "user_id": user_id,
+                "name": pin['name'],
+                "lat": lat,
+                "lng": lng,
+                "cell": geo.cell_id(lat, lng),
+                "is_active": True,
+                "created_at": now,
+                "modified_at": now
+            })
+
+        if cls.insert_many(rows) is False:
+            return False
+        return ids
@@ -1,11 +1,10 @@
 from datetime import datetime
 from enum import unique
-from sqlalchemy.orm import backref
-
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import func
+from sqlalchemy.orm import aliased, backref, selectinload
 
 from .model_mixin import ModelMixin
-from . import db
+from . import db, password_hasher
 
 
 class Users(ModelMixin):
@@ -34,11 +33,96 @@ class Users(ModelMixin):
     def __repr__(self):
         return "<Users %r>" % (self.username)
 
+    @classmethod
+    def get_with_pins(cls, id):
+        """ Gets a user with their pins, shares, shared pins and the owners
+            of the shared pins eagerly loaded in a fixed number of queries
+        """
+        return cls.query.options(
+            selectinload(cls.my_pins),
+            selectinload(cls.shares).joinedload('pin').joinedload('user')
+        ).populate_existing().filter(cls.id == id).first()
+
+    @classmethod
+    def page_excluding(cls, user_id, cursor=None, limit=20):
+        """ Gets a page of users other than the given user, ordered by id.
+        Args
+            user_id(str): user to exclude
+            cursor(str): only users with an id after the cursor are returned
+            limit(int): maximum number of users to return
+        Returns
+            list of (id, username) rows
+        """
+        query = db.session.query(cls.id, cls.username).filter(cls.id != user_id)
+
+        if cursor:
+            query = query.filter(cls.id > cursor)
+
+        return query.order_by(cls.id).limit(limit).all()
+
+    @classmethod
+    def stream_excluding(cls, user_id, batch_size=1000):
+        """ Iterates over all users other than the given user, ordered by id,
+            reading them from a server-side cursor in batches.
+        Args
+            user_id(str): user to exclude
+            batch_size(int): number of rows fetched per round trip
+        Returns
+            iterator of (id, username) rows
+        """
+        return db.session.query(cls.id, cls.username).filter(
+            cls.id != user_id
+        ).order_by(cls.id).yield_per(batch_size)
+
+    @classmethod
+    def info_fingerprint(cls, id):
+        """ Gets a tuple that changes whenever the user's info does: their
+            own row, the count and latest change of their pins, and of the
+            shares to them, the shared pins and their sharers, in one
+            aggregate query
+        """
+        from .pins import Pins
+        from .pin_shares import PinShares
+
+        sharer = aliased(cls)
+
+        my_pins = db.session.query(
+            func.count(Pins.id), func.max(Pins.modified_at)
+        ).filter(Pins.user_id == id).subquery()
+
+        shares = db.session.query(
+            func.count(PinShares.id),
+            func.max(PinShares.modified_at),
+            func.max(Pins.modified_at),
+            func.max(sharer.modified_at)
+        ).join(Pins, PinShares.pin_id == Pins.id).join(
+            sharer, PinShares.shared_by == sharer.id
+        ).filter(
+            PinShares.shared_to == id
+        ).subquery()
+
+        return db.session.query(cls.modified_at, my_pins, shares).filter(
+            cls.id == id
+        ).first()
+
+    @classmethod
+    def list_fingerprint(cls, user_id):
+        """ Gets a tuple that changes whenever the users other than the given
+            user do: their count and latest change, in one aggregate query
+        """
+        return db.session.query(
+            func.count(cls.id), func.max(cls.modified_at)
+        ).filter(cls.id != user_id).first()
+
     def set_password(self, password):
-        """ Hash user's password """
-        self.password_hash = generate_password_hash(password)
+        """ Hash user's password
+            Raises PasswordHasherBusy when the hashing pool is saturated
+        """
+        self.password_hash = password_hasher.generate(password)
 
     def check_password(self, password):
-        """ Confirm user's password """
-        return check_password_hash(self.password_hash, password)
+        """ Confirm user's password
+            Raises PasswordHasherBusy when the hashing pool is saturated
+        """
+        return password_hasher.check(self.password_hash, password)
 
@@ -2,24 +2,39 @@ from flask_restful import Api
 
 # import controllers
 from ..controllers import (
-    SampleResource, UserSignUpResource, UserLoginResource,
-    UserResource, UserListResource, PinListResource,
-    PinResource, SharePinResource
+    SampleResource, PoolStatsResource, MetricsResource, UserSignUpResource,
+    UserLoginResource, UserResource, UserListResource, UserPinListResource,
+    UserExportResource, PinListResource, PinBatchResource, PinImportResource,
+    PinResource, SharePinResource, PinWithinResource, PinNearestResource
 )
 
 api = Api()
 
 # add routes
 api.add_resource(SampleResource, '/sample', '/sample/')
+api.add_resource(PoolStatsResource, '/internal/pool', '/internal/pool/')
+api.add_resource(MetricsResource, '/metrics', '/metrics/')
 
 api.add_resource(UserSignUpResource, '/signup', '/signup/')
 api.add_resource(UserLoginResource, '/login', '/login/')
 
 api.add_resource(UserResource, '/user_info', '/user_info/')
+api.add_resource(UserPinListResource,
+    '/user_info/pins',
+    '/user_info/pins/'
+)
+api.add_resource(UserExportResource,
+    '/user_info/export',
+    '/user_info/export/'
+)
 api.add_resource(UserListResource, '/all_users', '/all_users/')
 
 api.add_resource(PinListResource, '/pin', '/pin/')
 api.add_resource(PinResource, '/pin/<string:pin_id>', '/pin/<string:pin_id>/')
+api.add_resource(PinBatchResource, '/pins/batch', '/pins/batch/')
+api.add_resource(PinImportResource, '/pins/import', '/pins/import/')
+api.add_resource(PinWithinResource, '/pins/within', '/pins/within/')
+api.add_resource(PinNearestResource, '/pins/nearest', '/pins/nearest/')
 api.add_resource(SharePinResource,
     '/share_pin/<string:pin_id>',
     '/share_pin/<string:pin_id>/'
@@ -1,7 +1,34 @@
 from .sample_schema import SampleSchema
 from .pin_schema import (
-    PinUserInfoSchema, PinSchema, PinInfoSchema, SharePinSchema
+    PinUserInfoSchema, PinSchema, PinInfoSchema, PinImportSchema,
+    SharePinSchema, PinFeedSchema, PinWithinSchema, PinNearestSchema,
+    PinBatchSchema
 )
 from .user_schema import (
-    UserSchema
+    UserSchema, UserFeedSchema
 )
+from .compiled import CompiledSchema, compile_schema
+from ..helper import FragmentCache
+
+# dumped pins shared by every response holding them, sized by the
+# PIN_FRAGMENT_CACHE_* app config
+pin_fragment_cache = FragmentCache(maxsize=100000, ttl=3600)
+
+
+def pin_fragment_key(pin):
+    """ A pin's dump changes with the pin, its shared flag and its owner """
+    user = pin.user
+    return pin.id, pin.modified_at, pin.shared, user and user.modified_at
+
+
+# dump functions generated once from the schemas above, for the responses
+# that dump many pins
+pin_serializer = compile_schema(
+    PinSchema, fragment_cache=pin_fragment_cache, fragment_key=pin_fragment_key
+)
+pin_user_info_serializer = compile_schema(PinUserInfoSchema)
+
+# dumps every pin of an export once, which would only evict the pins the
+# fragment cache holds for the other responses
+pin_export_serializer = compile_schema(PinSchema)
+user_serializer = compile_schema(UserSchema, nested={PinSchema: pin_serializer})
@@ -0,0 +1,214 @@
+'''
+Specialized dump functions generated from marshmallow schemas.
+
+`Schema.dump` dispatches through every field's `serialize` for every
+object, which dominates the time spent dumping long pin lists. A
+CompiledSchema reads the schema's dump fields once and generates a single
+function that pulls each attribute and converts it inline, giving the same
+output as `Schema.dump`. The schema's pre_dump and post_dump hooks still run.
+
+Field types without a specialized conversion fall back to the field's own
+`serialize`, so any schema can be compiled.
+
+Given a FragmentCache, a CompiledSchema keeps each object's dumped dict
+under a key naming its version, and later dumps splice the cached dict in.
+Schemas nesting it can be compiled to go through it too.
+'''
+from marshmallow import fields, missing
+from marshmallow.decorators import PRE_DUMP, POST_DUMP
+from marshmallow.utils import is_iterable_but_not_string, ensure_text_type
+
+
+class CompiledSchema(object):
+    '''
+    Dumps like the given schema instance with a generated function.
+
+    Values are read with getattr, as the schemas are dumped from models
+    and query rows, not from dicts.
+
+    Args
+        fragment_cache(FragmentCache): caches the dump of each object
+        fragment_key(function): takes an object, after the pre_dump hooks,
+                                and returns the cache key of its dump
+        nested(dict): schema class -> CompiledSchema used to dump the
+                      Nested fields of that schema
+    '''
+
+    def __init__(self, schema, fragment_cache=None, fragment_key=None,
+                 nested=None):
+        self.schema = schema
+        self.many = schema.many
+        self._pre_dump = schema._has_processors(PRE_DUMP)
+        self._post_dump = schema._has_processors(POST_DUMP)
+        self.dump_item = _compile(schema, nested or {})
+
+        if fragment_cache is not None:
+            self.dump_item = _cached(
+                self.dump_item, fragment_cache, fragment_key
+            )
+
+    def dump(self, obj, many=None):
+        ''' Serializes obj, or each item of obj when many, as Schema.dump '''
+        schema = self.schema
+        many = self.many if many is None else bool(many)
+        if many and is_iterable_but_not_string(obj):
+            obj = list(obj)
+
+        if self._pre_dump:
+            processed_obj = schema._invoke_dump_processors(
+                PRE_DUMP, obj, many=many, original_data=obj
+            )
+        else:
+            processed_obj = obj
+
+        dump_item = self.dump_item
+        if many and processed_obj is not None:
+            result = [dump_item(item) for item in processed_obj]
+        else:
+            result = dump_item(processed_obj)
+
+        if self._post_dump:
+            result = schema._invoke_dump_processors(
+                POST_DUMP, result, many=many, original_data=obj
+            )
+
+        return result
+
+
+def compile_schema(schema, **kwargs):
+    ''' Returns a CompiledSchema of a schema class or instance '''
+    if isinstance(schema, type):
+        schema = schema()
+    return CompiledSchema(schema, **kwargs)
+
+
+def _cached(dump_item, fragment_cache, fragment_key):
+    def dump_cached_item(obj):
+        key = fragment_key(obj)
+        fragment = fragment_cache.get(key)
+        if fragment is None:
+            fragment = dump_item(obj)
+            fragment_cache.set(key, fragment)
+        return fragment
+    return dump_cached_item
+
+
+def _value_expression(field, value, namespace, nested):
+    '''
+    Returns a Python expression converting the variable named value as
+    field._serialize would, or None when the field has no specialized form.
+    '''
+    field_type = type(field)
+
+    if field_type in (fields.String, fields.Str):
+        return (
+            '({0} if {0} is None or {0}.__class__ is str '
+            'else ensure_text_type({0}))'.format(value)
+        )
+
+    if field_type is fields.Float and not field.as_string:
+        return '(None if {0} is None else float({0}))'.format(value)
+
+    if field_type in (fields.Integer, fields.Int) and not field.as_string:
+        return '(None if {0} is None else int({0}))'.format(value)
+
+    if field_type in (fields.Boolean, fields.Bool):
+        # only real booleans skip the field's truthy and falsy sets
+        name = _constant(namespace, field)
+        return (
+            '({0} if {0} is None or {0} is True or {0} is False '
+            'else {1}._serialize({0}, None, None))'.format(value, name)
+        )
+
+    if field_type is fields.DateTime and (field.format or 'iso') == 'iso':
+        return '(None if {0} is None else {0}.isoformat())'.format(value)
+
+    if field_type is fields.List:
+        item = '_item{0}'.format(len(namespace))
+        inner = _value_expression(field.inner, item, namespace, nested)
+        if inner is None:
+            return None
+        return '(None if {0} is None else [{1} for {2} in {0}])'.format(
+            value, inner, item
+        )
+
+    if field_type is fields.Nested:
+        many = bool(field.schema.many or field.many)
+
+        compiled = None
+        if field.only is None and not field.exclude:
+            compiled = nested.get(type(field.schema))
+        if compiled is None:
+            compiled = CompiledSchema(field.schema, nested=nested)
+
+        if compiled._pre_dump or compiled._post_dump:
+            name = _constant(namespace, compiled.dump)
+            return '(None if {0} is None else {1}({0}, {2}))'.format(
+                value, name, many
+            )
+
+        # without hooks the nested dump is just its item function
+        name = _constant(namespace, compiled.dump_item)
+        if many:
+            item = '_item{0}'.format(len(namespace))
+            return '(None if {0} is None else [{1}({2}) for {2} in {0}])'.format(
+                value, name, item
+            )
+        return '(None if {0} is None else {1}({0}))'.format(value, name)
+
+    return None
+
+
+def _constant(namespace, value):
+    name = '_c{0}'.format(len(namespace))
+    namespace[name] = value
+    return name
+
+
+def _compile(schema, nested):
+    '''
+    Generates `dump_item(obj)`, the equivalent of Schema._serialize for a
+    single object, unrolled over the schema's dump fields in their order.
+    '''
+    namespace = {
+        'missing': missing, 'ensure_text_type': ensure_text_type,
+        '_dict_class': schema.dict_class
+    }
+    lines = [
+        'def dump_item(obj):',
+        '    ret = {}' if schema.dict_class is dict else '    ret = _dict_class()'
+    ]
+
+    for attr_name, field in schema.dump_fields.items():
+        key = field.data_key if field.data_key is not None else attr_name
+        attribute = field.attribute or attr_name
+
+        expression = None
+        if (field._CHECK_ATTRIBUTE and field.default is missing and
+                '.' not in attribute):
+            expression = _value_expression(field, 'value', namespace, nested)
+
+        if expression is None:
+            # let the field read and convert the value itself
+            name = _constant(namespace, field)
+            lines += [
+                '    value = {0}.serialize({1!r}, obj, accessor={2})'.format(
+                    name, attr_name, _constant(namespace, schema.get_attribute)
+                ),
+                '    if value is not missing:',
+                '        ret[{0!r}] = value'.format(key),
+            ]
+            continue
+
+        lines += [
+            '    value = getattr(obj, {0!r}, missing)'.format(attribute),
+            '    if value is not missing:',
+            '        ret[{0!r}] = {1}'.format(key, expression),
+        ]
+
+    lines.append('    return ret')
+
+    exec(compile('\n'.join(lines), '<dump {0}>'.format(
+        type(schema).__name__
+    ), 'exec'), namespace)
+    return namespace['dump_item']
@@ -1,5 +1,8 @@
 from flask.json import dump
-from marshmallow import Schema, fields, validate, pre_dump
+from marshmallow import (
+    Schema, fields, validate, pre_dump, pre_load, validates_schema,
+    ValidationError, EXCLUDE
+)
 
 
 class PinUserInfoSchema(Schema):
@@ -20,17 +23,119 @@ class PinInfoSchema(Schema):
     latLng = fields.List(fields.Float(), validate=validate.Length(min=2,max=2))
 
 
+class PinImportSchema(PinInfoSchema):
+    """ Pin Import Schema
+        - to validate each pin of an import, which needs all the pin info
+    """
+    name = fields.Str(
+        required=True,
+        error_messages={'required': 'Pin name is required'},
+        validate=[
+            validate.Regexp(
+                regex=r'^(?!\s*$)', error='Not a valid pin name.'
+            )
+        ]
+    )
+
+    latLng = fields.List(
+        fields.Float(),
+        required=True,
+        validate=validate.Length(min=2,max=2)
+    )
+
+
 class SharePinSchema(Schema):
     """ Share Pin Schema 
         - to validate share pin request
     """
     user_ids = fields.List(
         fields.Str(),
-        validate=validate.Length(min=1, max=10),
+        validate=validate.Length(min=1, max=1000),
         required=True
     )
 
 
+class PinBatchSchema(Schema):
+    """ Pin Batch Schema
+        - to validate batch pin request, each pin is then loaded with
+          PinSchema
+    """
+    # 5000 pins of 10 columns stay under postgres' 65535 bind parameters
+    pins = fields.List(
+        fields.Raw(),
+        validate=validate.Length(min=1, max=5000),
+        required=True
+    )
+
+
+class PinFeedSchema(Schema):
+    """ Pin Feed Schema
+        - to validate pin feed query params
+    """
+    class Meta:
+        unknown = EXCLUDE
+
+    cursor = fields.Str(missing=None)
+
+    limit = fields.Int(missing=20, validate=validate.Range(min=1, max=100))
+
+    kind = fields.Str(
+        missing='all',
+        validate=validate.OneOf(['own', 'shared', 'all'])
+    )
+
+
+class PinWithinSchema(Schema):
+    """ Pin Within Schema
+        - to validate bounding box query params
+    """
+    class Meta:
+        unknown = EXCLUDE
+
+    # minLat,minLng,maxLat,maxLng
+    bbox = fields.List(
+        fields.Float(),
+        required=True,
+        validate=validate.Length(equal=4)
+    )
+
+    limit = fields.Int(missing=500, validate=validate.Range(min=1, max=1000))
+
+    @pre_load
+    def split_bbox(self, data, **kwargs):
+        data = dict(data)
+        if isinstance(data.get('bbox'), str):
+            data['bbox'] = data['bbox'].split(',')
+        return data
+
+    @validates_schema
+    def validate_bbox(self, data, **kwargs):
+        min_lat, min_lng, max_lat, max_lng = data['bbox']
+
+        if not (-90 <= min_lat <= max_lat <= 90):
+            raise ValidationError(
+                'Latitudes must be between -90 and 90, min first.', 'bbox'
+            )
+        if not (-180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+            raise ValidationError(
+                'Longitudes must be between -180 and 180.', 'bbox'
+            )
+
+
+class PinNearestSchema(Schema):
+    """ Pin Nearest Schema
+        - to validate nearest pins query params
+    """
+    class Meta:
+        unknown = EXCLUDE
+
+    lat = fields.Float(required=True, validate=validate.Range(min=-90, max=90))
+
+    lng = fields.Float(required=True, validate=validate.Range(min=-180, max=180))
+
+    k = fields.Int(missing=10, validate=validate.Range(min=1, max=100))
+
+
 class PinSchema(Schema):
     """ Pin Schema """
     id = fields.Str(dump_only=True)
@@ -73,12 +178,12 @@ class PinSchema(Schema):
 
     @pre_dump(pass_many=False)
     def wrap(self, data, many):
+        # a share is dumped as its pin, flagged as shared
+        pin = getattr(data, 'pin', None)
+        if pin:
+            pin.shared = True
+            return pin
+
         data.shared = False
-        try:
-            if (data.pin):
-                data = data.pin
-                data.shared = True
-        except:
-            pass
         return data
 
@@ -1,5 +1,5 @@
 from flask.json import dump
-from marshmallow import Schema, fields, validate, post_dump
+from marshmallow import Schema, fields, validate, post_dump, EXCLUDE
 
 from .pin_schema import PinSchema
 
@@ -45,3 +45,15 @@ class UserSchema(Schema):
     def wrap(self, data, many):
         data['all_pins'] = [*data['my_pins'], *data['shares']]
         return data
+
+
+class UserFeedSchema(Schema):
+    """ User Feed Schema
+        - to validate user list query params
+    """
+    class Meta:
+        unknown = EXCLUDE
+
+    cursor = fields.Str(missing=None)
+
+    limit = fields.Int(missing=None, validate=validate.Range(min=1, max=100))
@@ -0,0 +1,25 @@
+"""
+ASGI entry point serving the same app as server.py, for any ASGI server:
+    uvicorn asgi:application --workers 4
+
+The loop of each worker keeps all its clients waiting while the requests
+run on ASGI_THREADS threads, by default one per db pool connection.
+"""
+try:
+    from server import app
+    from api.helper import WsgiToAsgi
+except ImportError:
+    from .server import app
+    from .api.helper import WsgiToAsgi
+
+
+def asgi_threads(app):
+    """ Threads running requests, ASGI_THREADS or the db pool's capacity """
+    if app.config.get('ASGI_THREADS'):
+        return app.config['ASGI_THREADS']
+
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    return options.get('pool_size', 5) + options.get('max_overflow', 10)
+
+
+application = WsgiToAsgi(app, threads=asgi_threads(app))
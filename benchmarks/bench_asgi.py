@@ -0,0 +1,239 @@
+""" Sync server against the ASGI front
+
+    Serves the app on the threaded WSGI server server.py runs, then through
+    asgi.py's WsgiToAsgi behind a minimal asyncio HTTP server, and has
+    growing numbers of concurrent clients page GET /all_users on each.
+    Every SQL statement sleeps --db-latency ms to stand in for the round
+    trip to Postgres. Reports throughput, p50 and p99 latency, failed
+    requests and the most threads the server ran.
+
+    The testing database is used (DATABASE_URI_TEST), a temporary SQLite
+    file when unset, and its tables are dropped afterwards.
+
+    Run from the project root:
+        FLASK_CONFIG=testing python -m benchmarks.bench_asgi [concurrency]
+    e.g. python -m benchmarks.bench_asgi 10 100 500 --db-latency 5
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import threading
+import multiprocessing
+
+from http import HTTPStatus
+
+if not os.getenv('DATABASE_URI_TEST'):
+    # threads need their own connections, which an in-memory db can't give
+    os.environ['DATABASE_URI_TEST'] = 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'bench_asgi.db'
+    )
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.serving import make_server
+
+from server import create_flask_app
+from api.models import db, Users, password_hasher
+from api.helper import WsgiToAsgi
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def asgi_handler(application):
+    """ A minimal HTTP/1.1 connection handler, one request per connection """
+
+    async def handle(reader, writer):
+        head = await reader.readuntil(b'\r\n\r\n')
+        request_line, *header_lines = head.decode('latin1').split('\r\n')
+        method, target, version = request_line.split(' ')
+        headers = [
+            (name.strip().lower().encode('latin1'),
+             value.strip().encode('latin1'))
+            for name, value in (
+                line.split(':', 1) for line in header_lines if line
+            )
+        ]
+        length = int(dict(headers).get(b'content-length', b'0'))
+        body = await reader.readexactly(length)
+        path, _, query = target.partition('?')
+
+        received = asyncio.Event()
+
+        async def receive():
+            if not received.is_set():
+                received.set()
+                return {'type': 'http.request', 'body': body}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                lines = ['HTTP/1.1 {0} {1}'.format(
+                    message['status'], HTTPStatus(message['status']).phrase
+                )]
+                lines += [
+                    '{0}: {1}'.format(name.decode(), value.decode())
+                    for name, value in message['headers']
+                ]
+                lines += ['connection: close', '', '']
+                writer.write('\r\n'.join(lines).encode('latin1'))
+            else:
+                writer.write(message.get('body', b''))
+                await writer.drain()
+
+        await application({
+            'type': 'http',
+            'http_version': version.split('/')[1],
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'query_string': query.encode('latin1'),
+            'root_path': '',
+            'headers': headers,
+            'client': writer.get_extra_info('peername'),
+            'server': writer.get_extra_info('sockname')
+        }, receive, send)
+        writer.close()
+
+    return handle
+
+
+async def load(port, token, concurrency, duration):
+    """ concurrency clients requesting a page of users back to back """
+    request = (
+        'GET /all_users?limit=20 HTTP/1.1\r\n'
+        'host: 127.0.0.1\r\n'
+        'authorization: {0}\r\n'
+        'connection: close\r\n\r\n'.format(token)
+    ).encode('latin1')
+    stop_at = time.perf_counter() + duration
+    latencies = []
+    failures = [0]
+
+    async def client():
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port
+                )
+                writer.write(request)
+                response = await reader.read()
+                writer.close()
+            except OSError:
+                failures[0] += 1
+                continue
+            if response[9:12] == b'200':
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures[0] += 1
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, failures[0]
+
+
+def run_load(port, token, concurrency, duration, results):
+    results.put(asyncio.run(load(port, token, concurrency, duration)))
+
+
+def measure(port, token, concurrency, duration):
+    """ Runs the clients in their own process, sampling server threads """
+    results = multiprocessing.Queue()
+    clients = multiprocessing.Process(
+        target=run_load, args=(port, token, concurrency, duration, results)
+    )
+
+    peak_threads = threading.active_count()
+    clients.start()
+    while clients.is_alive() and results.empty():
+        peak_threads = max(peak_threads, threading.active_count())
+        time.sleep(0.01)
+    latencies, failures = results.get()
+    clients.join()
+
+    return {
+        'rps': len(latencies) / duration,
+        'p50': percentile(latencies, 0.5) * 1000 if latencies else 0,
+        'p99': percentile(latencies, 0.99) * 1000 if latencies else 0,
+        'failed': failures,
+        'threads': peak_threads
+    }
+
+
+def main(concurrencies, db_latency, threads, duration=3):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = create_flask_app('testing')
+    app.logger.setLevel(logging.ERROR)
+
+    if db_latency:
+        @event.listens_for(Engine, 'before_cursor_execute')
+        def round_trip(*args):
+            time.sleep(db_latency / 1000)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for i in range(50):
+            Users(username='bench{0}'.format(i), password_hash='-').save()
+        user = Users(username='bench', password_hash='-')
+        user.set_password('bench')
+        user.save()
+
+    token = json.loads(app.test_client().post(
+        'login', data=json.dumps({'username': 'bench', 'password': 'bench'}),
+        content_type='application/json'
+    ).data)['data']['token']
+
+    sync_server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=sync_server.serve_forever, daemon=True).start()
+
+    application = WsgiToAsgi(app, threads=threads)
+    asgi_loop = asyncio.new_event_loop()
+    threading.Thread(target=asgi_loop.run_forever, daemon=True).start()
+    asgi_server = asyncio.run_coroutine_threadsafe(asyncio.start_server(
+        asgi_handler(application), '127.0.0.1', 0, backlog=4096
+    ), asgi_loop).result()
+    asgi_port = asgi_server.sockets[0].getsockname()[1]
+
+    print('{0:>8} {1:>7} {2:>10} {3:>10} {4:>10} {5:>8} {6:>8}'.format(
+        'clients', 'server', 'req/s', 'p50 (ms)', 'p99 (ms)', 'failed',
+        'threads'
+    ))
+    try:
+        for concurrency in concurrencies:
+            for name, port in (('sync', sync_server.server_port),
+                               ('asgi', asgi_port)):
+                result = measure(port, token, concurrency, duration)
+                print('{0:>8,} {1:>7} {2:>10.1f} {3:>10.1f} {4:>10.1f} '
+                      '{5:>8,} {6:>8,}'.format(
+                          concurrency, name, result['rps'], result['p50'],
+                          result['p99'], result['failed'], result['threads']
+                      ))
+    finally:
+        sync_server.shutdown()
+        asgi_loop.call_soon_threadsafe(asgi_server.close)
+        application.shutdown()
+        password_hasher.shutdown()
+        with app.app_context():
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    db_latency = 5.0
+    threads = 10
+    if '--db-latency' in args:
+        index = args.index('--db-latency')
+        db_latency = float(args[index + 1])
+        del args[index:index + 2]
+    if '--threads' in args:
+        index = args.index('--threads')
+        threads = int(args[index + 1])
+        del args[index:index + 2]
+    main([int(arg) for arg in args] or [10, 100, 500], db_latency, threads)
@@ -0,0 +1,92 @@
+""" authorize_app_access overhead
+
+    Times a no-op view wrapped in the previous decorator (error responses
+    built up front, signature not verified) and in the current one with
+    the token cache cold and warm.
+
+    Run from the project root:
+        FLASK_CONFIG=testing python -m benchmarks.bench_auth
+"""
+import timeit
+
+from functools import wraps
+
+from flask import request, jsonify, g
+from flask_jwt import jwt
+
+from server import create_flask_app
+from api.auth import authorize_app_access, token_cache
+from api.helper import generate_authorization_token
+
+
+def legacy_authorize_app_access(f):
+    """ authorize_app_access as it was before the token cache """
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        user_token = request.headers.get('authorization')
+
+        unauthorized_response = jsonify({
+            "status": "fail",
+            "data": {
+                "message": "Unauthorized. The authorization token supplied"
+                        " is invalid"
+            }
+        })
+        unauthorized_response.status_code = 401
+        expired_response = jsonify({
+            "status": "fail",
+            "data": {
+                "message": "The authorization token supplied is expired"
+            }
+        })
+        expired_response.status_code = 401
+
+        try:
+            payload = jwt.decode(user_token, 'secret',
+                                 options={"verify_signature": False})
+        except jwt.ExpiredSignatureError:
+            return expired_response
+        except jwt.InvalidTokenError:
+            return unauthorized_response
+
+        g.current_user_id = payload["id"]
+        g.token_info = payload
+
+        return f(*args, **kwargs)
+
+    return decorated
+
+
+def view():
+    return None
+
+
+def main(number=20000):
+    app = create_flask_app('testing')
+    token = generate_authorization_token('bench-user-id')
+
+    legacy = legacy_authorize_app_access(view)
+    current = authorize_app_access(view)
+
+    def cold():
+        token_cache.clear()
+        current()
+
+    benchmarks = [
+        ('no decorator', view),
+        ('legacy decorator', legacy),
+        ('current decorator, cold token cache', cold),
+        ('current decorator, warm token cache', current),
+    ]
+
+    with app.test_request_context(headers={'authorization': token}):
+        for name, run in benchmarks:
+            seconds = min(timeit.repeat(run, number=number, repeat=3))
+            print('{0:<40} {1:>10.2f} us/call'.format(
+                name, seconds / number * 1000000
+            ))
+
+
+if __name__ == '__main__':
+    main()
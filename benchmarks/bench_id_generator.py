@@ -0,0 +1,82 @@
+""" PushID generation throughput
+
+    Compares the previous per-insert PushID (numpy, a new instance per id)
+    with the shared generator, one id at a time and in batches.
+
+    Run from the project root:
+        python -m benchmarks.bench_id_generator
+"""
+import numpy
+import timeit
+
+from random import random
+from time import time
+
+from api.models.helper import PushID
+
+
+class LegacyPushID(object):
+    """ PushID as it was before the shared generator """
+
+    PUSH_CHARS = PushID.PUSH_CHARS
+
+    def __init__(self):
+        self.last_push_time = 0
+        self.last_rand_chars = numpy.empty(12, dtype=int)
+
+    def next_id(self):
+        now = int(time() * 1000)
+        duplicate_time = (now == self.last_push_time)
+        self.last_push_time = now
+        time_stamp_chars = numpy.empty(8, dtype=str)
+
+        for i in range(7, -1, -1):
+            time_stamp_chars[i] = self.PUSH_CHARS[now % 64]
+            now = int(now / 64)
+
+        unique_id = ''.join(time_stamp_chars)
+
+        if not duplicate_time:
+            for i in range(12):
+                self.last_rand_chars[i] = int(random() * 64)
+        else:
+            for i in range(11, -1, -1):
+                if self.last_rand_chars[i] == 63:
+                    self.last_rand_chars[i] = 0
+                else:
+                    break
+            self.last_rand_chars[i] += 1
+
+        for i in range(12):
+            unique_id += self.PUSH_CHARS[self.last_rand_chars[i]]
+
+        return unique_id
+
+
+def report(name, count, seconds):
+    print('{0:<40} {1:>12,.0f} ids/s'.format(name, count / seconds))
+
+
+def main(count=20000, batch_size=1000, repeat=5):
+    legacy_push_id = LegacyPushID()
+    push_id = PushID()
+
+    benchmarks = [
+        ('legacy, new instance per id',
+         lambda: [LegacyPushID().next_id() for i in range(count)]),
+        ('legacy, shared instance',
+         lambda: [legacy_push_id.next_id() for i in range(count)]),
+        ('shared generator, next_id',
+         lambda: [push_id.next_id() for i in range(count)]),
+        ('shared generator, next_ids({0})'.format(batch_size),
+         lambda: [push_id.next_ids(batch_size)
+                  for i in range(count // batch_size)]),
+    ]
+
+    for name, run in benchmarks:
+        seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+        report(name, count, seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+""" Pin import throughput and memory
+
+    Posts generated CSV and GeoJSON uploads of growing sizes to
+    POST /pins/import on the testing database (DATABASE_URI_TEST). The
+    uploads are generated as they are read, so the only copy of the data
+    in memory is the one the import holds. Reports the rows imported per
+    second and how much the process's peak RSS grew over the import. The
+    tables are dropped afterwards.
+
+    Run from the project root:
+        FLASK_CONFIG=testing python -m benchmarks.bench_pins_import [MB]
+    e.g. python -m benchmarks.bench_pins_import 10 50
+"""
+import io
+import sys
+import json
+import time
+import random
+import logging
+import resource
+
+from werkzeug.test import EnvironBuilder
+
+from server import create_flask_app
+from api.models import db, Users, Pins
+
+
+def csv_rows(count, seed=0):
+    rand = random.Random(seed)
+    yield b'name,lat,lng\n'
+    for i in range(count):
+        yield 'Pin {0},{1:.6f},{2:.6f}\n'.format(
+            i, rand.uniform(-85, 85), rand.uniform(-180, 180)
+        ).encode()
+
+
+def geojson_rows(count, seed=0):
+    rand = random.Random(seed)
+    yield b'{"type": "FeatureCollection", "features": [\n'
+    for i in range(count):
+        yield '{0}{{"type": "Feature", "properties": {{"name": "Pin {1}"}}, ' \
+              '"geometry": {{"type": "Point", "coordinates": ' \
+              '[{2:.6f}, {3:.6f}]}}}}\n'.format(
+                  ',' if i else '', i,
+                  rand.uniform(-180, 180), rand.uniform(-85, 85)
+              ).encode()
+    yield b']}\n'
+
+
+class GeneratedStream(io.RawIOBase):
+    """ A readable stream over the chunks of a generator """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            self.pending = next(self.chunks, None)
+            if self.pending is None:
+                self.pending = b''
+                return 0
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+def rows_for_size(rows, megabytes):
+    """ Number of rows making an upload of about megabytes """
+    sample = sum(len(chunk) for chunk in rows(1000))
+    return int(megabytes * 1024 * 1024 / (sample / 1000))
+
+
+def main(sizes):
+    app = create_flask_app('testing')
+    app.logger.setLevel(logging.ERROR)
+    # as in production, debug and testing would record every statement
+    # and its parameters for as long as the app context lives
+    app.debug = False
+    app.config['SQLALCHEMY_RECORD_QUERIES'] = False
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        user = Users(username='bench', password_hash='-')
+        user.set_password('bench')
+        user.save()
+
+        client = app.test_client()
+        token = json.loads(client.post(
+            'login',
+            data=json.dumps({'username': 'bench', 'password': 'bench'}),
+            content_type='application/json'
+        ).data)['data']['token']
+
+        print('{0:>8} {1:>12} {2:>10} {3:>10} {4:>14}'.format(
+            'format', 'upload (MB)', 'rows', 'rows/s', 'RSS growth (MB)'
+        ))
+        try:
+            for megabytes in sizes:
+                for name, rows, content_type in (
+                        ('csv', csv_rows, 'text/csv'),
+                        ('geojson', geojson_rows, 'application/geo+json')):
+                    count = rows_for_size(rows, megabytes)
+                    length = sum(len(chunk) for chunk in rows(count))
+                    Pins.query.delete()
+                    db.session.commit()
+
+                    rss_before = resource.getrusage(
+                        resource.RUSAGE_SELF
+                    ).ru_maxrss
+                    start = time.perf_counter()
+
+                    # the test client seeks its input stream to find its
+                    # length, so the app is called with the upload as is
+                    environ = EnvironBuilder(
+                        path='/pins/import', method='POST',
+                        headers={'authorization': token},
+                        content_type=content_type
+                    ).get_environ()
+                    environ['wsgi.input'] = io.BufferedReader(
+                        GeneratedStream(rows(count))
+                    )
+                    environ['CONTENT_LENGTH'] = str(length)
+
+                    lines = app(environ, lambda status, headers: None)
+                    last = None
+                    for line in lines:
+                        last = line
+                    lines.close()
+
+                    elapsed = time.perf_counter() - start
+                    rss_after = resource.getrusage(
+                        resource.RUSAGE_SELF
+                    ).ru_maxrss
+                    summary = json.loads(last)['data']
+
+                    print('{0:>8} {1:>12.1f} {2:>10,} {3:>10,.0f} '
+                          '{4:>14.1f}'.format(
+                              name, length / 1024 / 1024,
+                              summary['imported'],
+                              summary['imported'] / elapsed,
+                              (rss_after - rss_before) / 1024
+                          ))
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main([float(arg) for arg in sys.argv[1:]] or [10, 50])
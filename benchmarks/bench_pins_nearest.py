@@ -0,0 +1,82 @@
+""" Nearest pins latency
+
+    Fills the testing database (DATABASE_URI_TEST, in-memory SQLite when
+    unset) with growing numbers of randomly placed pins and times k nearest
+    lookups, using the cell index prefilter with the vectorized haversine
+    against loading every pin and sorting them in Python. The database is
+    printed with the results and the tables are dropped afterwards.
+
+    Run from the project root:
+        FLASK_CONFIG=testing python -m benchmarks.bench_pins_nearest [sizes]
+"""
+import sys
+import math
+import random
+import timeit
+
+from server import create_flask_app
+from api.models import db, Users, Pins, geo
+
+from .bench_pins_within import add_pins
+
+
+def nearest_in_python(user_id, lat, lng, k):
+    """ Nearest pins by looping over every pin object """
+    def distance(pin):
+        lat1, lng1 = math.radians(lat), math.radians(lng)
+        lat2, lng2 = math.radians(pin.lat), math.radians(pin.lng)
+        a = (math.sin((lat2 - lat1) / 2) ** 2 +
+             math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+        return 2 * geo.EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1)))
+
+    return sorted(Pins.find_all(user_id=user_id), key=distance)[:k]
+
+
+def main(sizes, queries=20, k=10):
+    app = create_flask_app('testing')
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        user = Users(username='bench', password_hash='-')
+        user.save()
+
+        rand = random.Random(0)
+        total = 0
+
+        # the numbers depend on the database, name it with the results
+        print('database: {0!r}'.format(db.engine.url))
+        print('{0:>10} {1:>14} {2:>14}'.format('pins', 'nearest (ms)', 'python (ms)'))
+        for size in sizes:
+            add_pins(user.id, size - total, rand)
+            total = size
+
+            points = [
+                (rand.uniform(-80, 80), rand.uniform(-175, 175))
+                for i in range(queries)
+            ]
+
+            def candidates(*bbox):
+                return Pins.coordinates_within(user.id, *bbox)
+
+            nearest = timeit.timeit(
+                lambda: [geo.nearest(lat, lng, k, candidates)
+                         for lat, lng in points],
+                number=1
+            )
+            python = timeit.timeit(
+                lambda: nearest_in_python(user.id, *points[0], k),
+                number=1
+            )
+            print('{0:>10,} {1:>14.3f} {2:>14.3f}'.format(
+                size, nearest / queries * 1000, python * 1000
+            ))
+            db.session.expunge_all()
+
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,91 @@
+""" Bounding box lookup latency
+
+    Fills the testing database (DATABASE_URI_TEST, in-memory SQLite when
+    unset) with growing numbers of randomly placed pins and times viewport
+    sized bounding box queries, using the grid cell index against a plain
+    lat/lng scan. The database is printed with the results and the tables
+    are dropped afterwards.
+
+    Run from the project root:
+        FLASK_CONFIG=testing python -m benchmarks.bench_pins_within [sizes]
+    e.g. python -m benchmarks.bench_pins_within 10000 100000 1000000
+"""
+import sys
+import random
+import timeit
+
+from server import create_flask_app
+from api.models import db, Users, Pins, geo, push_id_generator
+
+
+def add_pins(user_id, count, rand, batch_size=10000):
+    """ Insert count random pins with multi-row inserts """
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        rows = []
+        for pin_id in push_id_generator.next_ids(size):
+            lat, lng = rand.uniform(-85, 85), rand.uniform(-180, 180)
+            rows.append({
+                'id': pin_id,
+                'user_id': user_id,
+                'name': 'Pin',
+                'lat': lat,
+                'lng': lng,
+                'cell': geo.cell_id(lat, lng)
+            })
+        Pins.insert_many(rows)
+
+
+def scan_within(user_id, min_lat, min_lng, max_lat, max_lng):
+    """ Bounding box query without the cell ranges """
+    return Pins.query.filter(
+        Pins.user_id == user_id,
+        Pins.lat.between(min_lat, max_lat),
+        Pins.lng.between(min_lng, max_lng)
+    ).all()
+
+
+def main(sizes, queries=50):
+    app = create_flask_app('testing')
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        user = Users(username='bench', password_hash='-')
+        user.save()
+
+        rand = random.Random(0)
+        total = 0
+
+        # the numbers depend on the database, name it with the results
+        print('database: {0!r}'.format(db.engine.url))
+        print('{0:>10} {1:>14} {2:>14}'.format('pins', 'cells (ms)', 'scan (ms)'))
+        for size in sizes:
+            add_pins(user.id, size - total, rand)
+            total = size
+
+            # city sized viewports
+            boxes = []
+            for i in range(queries):
+                lat, lng = rand.uniform(-80, 80), rand.uniform(-175, 175)
+                boxes.append((lat, lng, lat + 0.5, lng + 0.5))
+
+            cells = timeit.timeit(
+                lambda: [Pins.within_for_user(user.id, *box) for box in boxes],
+                number=1
+            )
+            scan = timeit.timeit(
+                lambda: [scan_within(user.id, *box) for box in boxes],
+                number=1
+            )
+            print('{0:>10,} {1:>14.3f} {2:>14.3f}'.format(
+                size, cells / queries * 1000, scan / queries * 1000
+            ))
+
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,68 @@
+""" Rate limiter throughput
+
+    Has growing numbers of threads take tokens for 1000 users from the
+    in-process buckets with one lock and with the striped locks they use,
+    and from the buckets shared through a memory mapped file. Reports
+    takes per second and the mean time of a take.
+
+    Run from the project root:
+        python -m benchmarks.bench_rate_limit [threads]
+    e.g. python -m benchmarks.bench_rate_limit 1 8 32
+"""
+import os
+import sys
+import shutil
+import tempfile
+import threading
+
+from time import perf_counter
+
+from api.helper.rate_limit import TokenBuckets, SharedTokenBuckets
+
+
+def measure(buckets, threads, takes=20000):
+    """ threads taking takes tokens each, spread over 1000 users """
+    keys = ['user_info:user{0}'.format(i) for i in range(1000)]
+    start_line = threading.Barrier(threads + 1)
+
+    def take():
+        start_line.wait()
+        for i in range(takes):
+            buckets.take(keys[i % len(keys)], 100, 10.0)
+
+    workers = [threading.Thread(target=take) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    start_line.wait()
+    start = perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = perf_counter() - start
+
+    total = threads * takes
+    return total / elapsed, elapsed / total * 1e6
+
+
+def main(thread_counts):
+    directory = tempfile.mkdtemp()
+    print('{0:>8} {1:>16} {2:>12} {3:>10}'.format(
+        'threads', 'buckets', 'takes/s', 'us/take'
+    ))
+    try:
+        for threads in thread_counts:
+            for name, buckets in (
+                    ('one lock', TokenBuckets(stripes=1)),
+                    ('striped', TokenBuckets()),
+                    ('shared file', SharedTokenBuckets(
+                        os.path.join(directory, 'rate_limits.db')
+                    ))):
+                rate, mean = measure(buckets, threads)
+                print('{0:>8} {1:>16} {2:>12,.0f} {3:>10.2f}'.format(
+                    threads, name, rate, mean
+                ))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1, 8, 32])
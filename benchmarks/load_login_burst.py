@@ -0,0 +1,142 @@
+""" Login burst load test
+
+    Serves the app on a local threaded server backed by the testing
+    database (DATABASE_URI_TEST, a temporary SQLite file when unset), then
+    measures GET /all_users latency
+    while bursts of logins hash passwords at the production cost. This
+    is run once hashing inline in the request threads and once on the
+    hashing pool, so the p99 of the cheap route can be compared. The
+    database is printed with the results and the tables are dropped
+    afterwards.
+
+    Run from the project root:
+        FLASK_CONFIG=testing python -m benchmarks.load_login_burst
+"""
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+
+import requests
+
+from concurrent.futures import ThreadPoolExecutor
+
+if not os.getenv('DATABASE_URI_TEST'):
+    # threads need their own connections, which an in-memory db can't give
+    os.environ['DATABASE_URI_TEST'] = 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'load_login_burst.db'
+    )
+
+from werkzeug.serving import make_server
+
+from config import Config
+from server import create_flask_app
+from api.models import db, Users, password_hasher
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run(base_url, token, login_threads, duration):
+    """ Measure /all_users while login_threads keep logging in """
+    stop = threading.Event()
+    login_statuses = []
+
+    def login():
+        while not stop.is_set():
+            response = requests.post(
+                base_url + '/login',
+                data=json.dumps({'username': 'bench', 'password': 'password'}),
+                headers={'content-type': 'application/json'}
+            )
+            login_statuses.append(response.status_code)
+
+    latencies = []
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(login_threads, 1)) as executor:
+        for i in range(login_threads):
+            executor.submit(login)
+
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            start = time.monotonic()
+            response = requests.get(
+                base_url + '/all_users',
+                params={'limit': 10},
+                headers={'authorization': token}
+            )
+            if response.status_code == 200:
+                latencies.append((time.monotonic() - start) * 1000)
+            else:
+                failures += 1
+
+        stop.set()
+
+    return latencies, failures, login_statuses
+
+
+def main(login_threads=16, duration=10, port=5099):
+    app = create_flask_app('testing')
+    app.logger.setLevel(logging.ERROR)
+    app.config['PASSWORD_HASH_METHOD'] = Config.PASSWORD_HASH_METHOD
+
+    with app.app_context():
+        password_hasher.init_app(app)
+        db.drop_all()
+        db.create_all()
+
+        user = Users(username='bench')
+        user.set_password('password')
+        user.save()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = 'http://127.0.0.1:{0}'.format(port)
+
+    token = requests.post(
+        base_url + '/login',
+        data=json.dumps({'username': 'bench', 'password': 'password'}),
+        headers={'content-type': 'application/json'}
+    ).json()['data']['token']
+
+    modes = [
+        ('no logins', 0, 0),
+        ('logins hashed inline', 0, login_threads),
+        ('logins hashed on pool', Config.PASSWORD_HASH_WORKERS, login_threads),
+    ]
+
+    # the numbers depend on the database, name it with the results
+    print('database: {0!r}'.format(db.get_engine(app).url))
+    print('{0:<24} {1:>10} {2:>10} {3:>8} {4:>8} {5:>8}'.format(
+        'mode', 'p50 (ms)', 'p99 (ms)', 'failed', 'logins', '429s'))
+    try:
+        for name, workers, threads in modes:
+            app.config['PASSWORD_HASH_WORKERS'] = workers
+            password_hasher.init_app(app)
+
+            latencies, failures, login_statuses = run(
+                base_url, token, threads, duration
+            )
+            print('{0:<24} {1:>10.2f} {2:>10.2f} {3:>8} {4:>8} {5:>8}'.format(
+                name,
+                percentile(latencies, 0.5),
+                percentile(latencies, 0.99),
+                failures,
+                login_statuses.count(200),
+                login_statuses.count(429)
+            ))
+    finally:
+        server.shutdown()
+        password_hasher.shutdown()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
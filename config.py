@@ -14,19 +14,106 @@ class Config(object):
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI')
 
+    # connection pool per process: persistent connections, extra ones
+    # opened under load, seconds to wait for a free connection, seconds a
+    # connection is kept and a liveness check on checkout. Size it so every
+    # dyno's pool_size + max_overflow fits the Postgres connection limit
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True
+    }
+
+    # token required by the internal endpoints, which are off when unset
+    INTERNAL_TOKEN = os.getenv('INTERNAL_TOKEN')
+
+    # per request SQL stats: Server-Timing headers, and the statement count
+    # over which a request's SQL is logged (0 never logs it)
+    SERVER_TIMING = False
+    QUERY_COUNT_THRESHOLD = int(os.getenv('QUERY_COUNT_THRESHOLD', 20))
+
+    # threads running requests under asgi.py, 0 runs one per connection
+    # of the db pool as more could only wait for a connection
+    ASGI_THREADS = int(os.getenv('ASGI_THREADS', 0))
+
+    # directory the worker processes share their /metrics values through,
+    # best on tmpfs. Unset, each process only reports its own
+    METRICS_DIR = os.getenv('METRICS_DIR')
+
+    # validate_user lookup cache: max entries and seconds an entry lives
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_TTL = 30
+
+    # verified token cache: max entries, each lives until its token expires
+    TOKEN_CACHE_SIZE = 10000
+
+    # /user_info response cache: max users, seconds an entry lives at most
+    # and the CacheBackend class holding it (a TTLCache when unset)
+    USER_INFO_CACHE_SIZE = 10000
+    USER_INFO_CACHE_TTL = 300
+    USER_INFO_CACHE_BACKEND = None
+
+    # dumped pin cache shared by all responses: max pins and seconds a pin
+    # is kept, its key changes whenever the pin does
+    PIN_FRAGMENT_CACHE_SIZE = 100000
+    PIN_FRAGMENT_CACHE_TTL = 3600
+
+    # pins validated, inserted and committed together by /pins/import, a
+    # progress line is sent after each chunk. 1000 pins of 10 columns
+    # stay well under postgres' 65535 bind parameters
+    PIN_IMPORT_CHUNK_SIZE = 1000
+
+    # token bucket rate limits per user of the routes that take
+    # rate_limit(name): name -> (burst of requests, requests per second),
+    # and the most buckets kept. A 429 with Retry-After turns away the
+    # requests over it
+    RATE_LIMITS = {
+        'user_info': (20, 5.0),
+        'share_pin': (10, 1.0)
+    }
+    RATE_LIMIT_SIZE = 100000
+
+    # directory the worker processes share their rate limit buckets
+    # through, best on tmpfs. Unset, each process limits on its own
+    RATE_LIMIT_DIR = os.getenv('RATE_LIMIT_DIR')
+
+    # password hashing: werkzeug hash method and cost, processes hashing
+    # off the request threads (0 hashes inline) and how many hashes may
+    # wait for a process before requests are turned away with a 429
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:260000'
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', 8))
+
 
 class DevelopmentConfiguration(Config):
     """ Development Configuration """
     DEBUG = True
+    SERVER_TIMING = True
     SQLALCHEMY_TRACK_MODIFICATIONS = True
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI')
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 2,
+        'max_overflow': 2,
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True
+    }
 
 class TestingConfiguration(Config):
     """ Testing Configuration """
     DEBUG = True
+    SERVER_TIMING = True
     SQLALCHEMY_TRACK_MODIFICATIONS = True
     TESTING = True
-    SQLALCHEMY_DATABASE_URI  = os.getenv('DATABASE_URI_TEST')
+    # an in-memory SQLite database unless a test database is given
+    SQLALCHEMY_DATABASE_URI  = os.getenv('DATABASE_URI_TEST') or 'sqlite://'
+    # the driver's default pool, which also suits SQLite
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    INTERNAL_TOKEN = 'internal-test-token'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
 
 
 app_configuration = {
@@ -0,0 +1,93 @@
+"""empty message
+
+Revision ID: 8d4f0a6b2c91
+Revises: 5c2e8b41d7f3
+Create Date: 2021-09-04 11:20:37.931482
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4f0a6b2c91'
+down_revision = '5c2e8b41d7f3'
+branch_labels = None
+depends_on = None
+
+# pins backfilled per statement, walking the table in id order
+BATCH_SIZE = 1000
+
+# the cell ids of api.models.helper.geo as of this revision, copied so a
+# later change to the grid doesn't change what this migration writes
+CELL_BITS = 26
+MAX_CELL = (1 << CELL_BITS) - 1
+
+
+def _spread_bits(value):
+    value &= 0x00000000FFFFFFFF
+    value = (value | (value << 16)) & 0x0000FFFF0000FFFF
+    value = (value | (value << 8)) & 0x00FF00FF00FF00FF
+    value = (value | (value << 4)) & 0x0F0F0F0F0F0F0F0F
+    value = (value | (value << 2)) & 0x3333333333333333
+    value = (value | (value << 1)) & 0x5555555555555555
+    return value
+
+
+def _quantize(value, low, high):
+    cell = int((value - low) / (high - low) * (MAX_CELL + 1))
+    return min(max(cell, 0), MAX_CELL)
+
+
+def cell_id(lat, lng):
+    return (
+        (_spread_bits(_quantize(lng, -180.0, 180.0)) << 1) |
+        _spread_bits(_quantize(lat, -90.0, 90.0))
+    )
+
+
+def upgrade():
+    op.add_column('pins', sa.Column('lat', sa.Float(), nullable=True))
+    op.add_column('pins', sa.Column('lng', sa.Float(), nullable=True))
+    op.add_column('pins', sa.Column('cell', sa.BigInteger(), nullable=True))
+
+    # backfill the new columns from latLng
+    connection = op.get_bind()
+    connection.execute(
+        'UPDATE pins SET lat = "latLng"[1], lng = "latLng"[2]'
+    )
+
+    # cells are computed here, a batch of pins at a time after the last id
+    # of the previous batch, so the table is never loaded at once
+    select_batch = sa.text(
+        'SELECT id, lat, lng FROM pins WHERE id > :last_id '
+        'ORDER BY id LIMIT :limit'
+    )
+    update_cell = sa.text('UPDATE pins SET cell = :cell WHERE id = :id')
+
+    last_id = ''
+    while True:
+        pins = connection.execute(
+            select_batch, last_id=last_id, limit=BATCH_SIZE
+        ).fetchall()
+        if not pins:
+            break
+
+        cells = [
+            {'id': pin.id, 'cell': cell_id(pin.lat, pin.lng)}
+            for pin in pins if pin.lat is not None and pin.lng is not None
+        ]
+        if cells:
+            connection.execute(update_cell, cells)
+        last_id = pins[-1].id
+
+    op.create_index('ix_pins_cell', 'pins', ['cell'], unique=False)
+    op.create_index('ix_pins_user_id_cell', 'pins', ['user_id', 'cell'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_pins_user_id_cell', table_name='pins')
+    op.drop_index('ix_pins_cell', table_name='pins')
+    op.drop_column('pins', 'cell')
+    op.drop_column('pins', 'lng')
+    op.drop_column('pins', 'lat')
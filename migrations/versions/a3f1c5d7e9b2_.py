@@ -0,0 +1,38 @@
+"""empty message
+
+Revision ID: a3f1c5d7e9b2
+Revises: cf65446eeeab
+Create Date: 2021-08-14 10:02:41.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c5d7e9b2'
+down_revision = 'cf65446eeeab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # remove duplicate shares before adding the unique constraint
+    op.execute(
+        'DELETE FROM pinshares a USING pinshares b '
+        'WHERE a.pin_id = b.pin_id AND a.shared_by = b.shared_by '
+        'AND a.shared_to = b.shared_to AND a.id > b.id'
+    )
+    op.create_unique_constraint(
+        'uq_pinshares_pin_id_shared_by_shared_to',
+        'pinshares',
+        ['pin_id', 'shared_by', 'shared_to']
+    )
+
+
+def downgrade():
+    op.drop_constraint(
+        'uq_pinshares_pin_id_shared_by_shared_to',
+        'pinshares',
+        type_='unique'
+    )
@@ -0,0 +1,36 @@
+"""empty message
+
+Revision ID: b47e2d9c1a60
+Revises: 8d4f0a6b2c91
+Create Date: 2021-09-18 10:02:51.274903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b47e2d9c1a60'
+down_revision = '8d4f0a6b2c91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # lat and lng become the only copy of the coordinates
+    op.execute(
+        'UPDATE pins SET lat = "latLng"[1], lng = "latLng"[2] '
+        'WHERE lat IS NULL OR lng IS NULL'
+    )
+    op.alter_column('pins', 'lat', existing_type=sa.Float(), nullable=False)
+    op.alter_column('pins', 'lng', existing_type=sa.Float(), nullable=False)
+    op.drop_column('pins', 'latLng')
+
+
+def downgrade():
+    op.add_column('pins', sa.Column('latLng', postgresql.ARRAY(sa.Float()), nullable=True))
+    op.execute('UPDATE pins SET "latLng" = ARRAY[lat, lng]')
+    op.alter_column('pins', 'latLng', existing_type=postgresql.ARRAY(sa.Float()), nullable=False)
+    op.alter_column('pins', 'lng', existing_type=sa.Float(), nullable=True)
+    op.alter_column('pins', 'lat', existing_type=sa.Float(), nullable=True)
@@ -14,13 +14,21 @@ load_dotenv(dotenv_path=env_path)
 try:
     from config import app_configuration
 
-    from api.models import db
+    from api.models import db, password_hasher, pool_metrics
     from api.routes import api
+    from api.auth import user_cache, token_cache
+    from api.controllers import user_info_cache
+    from api.helper import query_stats, metrics, rate_limiter
+    from api.schema import pin_fragment_cache
 except:
     from .config import app_configuration
 
-    from .api.models import db
+    from .api.models import db, password_hasher, pool_metrics
     from .api.routes import api
+    from .api.auth import user_cache, token_cache
+    from .api.controllers import user_info_cache
+    from .api.helper import query_stats, metrics, rate_limiter
+    from .api.schema import pin_fragment_cache
 
 # function that creates the flask app, initializes the db and sets the routes
 def create_flask_app(environment):
@@ -35,9 +43,31 @@ def create_flask_app(environment):
     app.config.from_object(app_configuration[environment])
     app.config['BUNDLE_ERRORS'] = True
 
-    # initialize SQLAlchemy
+    # initialize SQLAlchemy, metering the connection pool
+    pool_metrics.init_app(app)
     db.init_app(app)
 
+    # count the SQL statements and db time of each request, and collect
+    # them with the request and cache metrics served on /metrics
+    query_stats.init_app(app)
+    metrics.init_app(app)
+    metrics.register_cache('user', user_cache)
+    metrics.register_cache('token', token_cache)
+    metrics.register_cache('user_info', user_info_cache)
+    metrics.register_cache('pin_fragment', pin_fragment_cache)
+
+    # size the user lookup, token, user info and pin fragment caches
+    user_cache.init_app(app, 'USER_CACHE')
+    token_cache.init_app(app, 'TOKEN_CACHE')
+    user_info_cache.init_app(app, 'USER_INFO_CACHE')
+    pin_fragment_cache.init_app(app, 'PIN_FRAGMENT_CACHE')
+
+    # per user rate limits of the routes, shared with RATE_LIMIT_DIR
+    rate_limiter.init_app(app)
+
+    # configure the password hashing pool
+    password_hasher.init_app(app)
+
     # initialize migration commands
     migrate = Migrate(app, db)
 
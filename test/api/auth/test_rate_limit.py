@@ -0,0 +1,69 @@
+import json
+
+from test.base import BaseTestCase
+from api.helper import rate_limiter
+
+
+class RateLimitTestCase(BaseTestCase):
+    """ Test rate_limit """
+
+    def setUp(self):
+        super().setUp()
+
+        self.app.config['RATE_LIMITS'] = {
+            'user_info': (2, 0.001),
+            'share_pin': (1, 0.5)
+        }
+        rate_limiter.init_app(self.app)
+
+        self.create_default_data()
+
+    def get_user_info(self, token):
+        return self.client.get(
+            'user_info',
+            headers={'authorization': token},
+            content_type='application/json'
+        )
+
+    def test_limited_per_user(self):
+        """ Requests over a user's burst get a 429 with Retry-After """
+        self.login('user1', 'password1')
+        user1_token = self.authorization_token
+
+        for _ in range(2):
+            self.assert200(self.get_user_info(user1_token))
+
+        response = self.get_user_info(user1_token)
+        response_data = json.loads(response.data)
+
+        self.assertStatus(response, 429)
+        self.assertEqual(response.headers['Retry-After'], '1000')
+        self.assertEqual(response_data['data']['message'],
+            'Too many requests, please try again shortly')
+
+        # other users have their own limit
+        self.login('user2', 'password2')
+        self.assert200(self.get_user_info(self.authorization_token))
+
+    def test_limited_per_route(self):
+        """ Each route takes from its own limit """
+        self.login('user1', 'password1')
+
+        response = self.client.post(
+            'share_pin/fakeid',
+            headers={'authorization': self.authorization_token},
+            data=json.dumps({'user_ids': ['fakeid']}),
+            content_type='application/json'
+        )
+        self.assert400(response)
+
+        response = self.client.post(
+            'share_pin/fakeid',
+            headers={'authorization': self.authorization_token},
+            data=json.dumps({'user_ids': ['fakeid']}),
+            content_type='application/json'
+        )
+        self.assertStatus(response, 429)
+        self.assertEqual(response.headers['Retry-After'], '2')
+
+        self.assert200(self.get_user_info(self.authorization_token))
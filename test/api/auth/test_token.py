@@ -0,0 +1,82 @@
+import os
+import json
+import datetime
+
+from flask_jwt import jwt
+
+from test.base import BaseTestCase
+from api.auth import token_cache
+
+
+class AuthorizeAppAccessTestCase(BaseTestCase):
+    """ Test authorize_app_access """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data()
+
+        token_cache.clear()
+
+    def encode(self, key=None, **payload):
+        """ Encode a token for user1 """
+        self.login('user1', 'password1')
+        user_id = jwt.decode(self.authorization_token, verify=False)['id']
+
+        return jwt.encode(
+            dict({
+                "id": user_id,
+                "exp": datetime.datetime.utcnow() + datetime.timedelta(days=1)
+            }, **payload),
+            key or os.getenv('TOKEN_KEY'),
+            algorithm='HS256'
+        ).decode('utf-8')
+
+    def get_user_info(self, token):
+        response = self.client.get(
+            'user_info',
+            headers={'authorization': token},
+            content_type='application/json'
+        )
+        return response, json.loads(response.data)
+
+    def test_no_token(self):
+        """ Requests without a token are rejected """
+        response = self.client.get('user_info')
+        response_data = json.loads(response.data)
+
+        self.assertEqual(response_data['data']['message'],
+            'Bad request. Header does not contain Authorization token')
+        self.assert401(response)
+
+    def test_forged_token(self):
+        """ Tokens signed with another key are rejected """
+        response, response_data = self.get_user_info(
+            self.encode(key='not-the-token-key')
+        )
+
+        self.assertEqual(response_data['data']['message'],
+            'Unauthorized. The authorization token supplied is invalid')
+        self.assert401(response)
+
+    def test_expired_token(self):
+        """ Expired tokens are rejected """
+        response, response_data = self.get_user_info(self.encode(
+            exp=datetime.datetime.utcnow() - datetime.timedelta(minutes=1)
+        ))
+
+        self.assertEqual(response_data['data']['message'],
+            'The authorization token supplied is expired')
+        self.assert401(response)
+
+    def test_verified_token_cached(self):
+        """ A verified token is served from the cache on later requests """
+        token = self.encode()
+
+        response, response_data = self.get_user_info(token)
+        self.assert200(response)
+        hits = token_cache.stats()['hits']
+
+        response, response_data = self.get_user_info(token)
+        self.assert200(response)
+        self.assertEqual(token_cache.stats()['hits'], hits + 1)
@@ -0,0 +1,92 @@
+import json
+
+from test.base import BaseTestCase
+from api.auth import user_cache
+from api.models import Users, Pins, unit_of_work
+
+
+class ValidateUserCacheTestCase(BaseTestCase):
+    """ Test validate_user lookup cache """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data()
+
+        self.login('user1', 'password1')
+        self.user1 = Users.find_first(**{'username': 'user1'})
+
+        user_cache.clear()
+
+    def get_users(self):
+        """ Hit an endpoint guarded by validate_user """
+        response = self.client.get(
+            'all_users',
+            headers={'authorization': self.authorization_token},
+            query_string={'limit': 10}
+        )
+        return response, json.loads(response.data)
+
+    def test_cached_user_skips_lookup(self):
+        """ A cached user is validated without querying the users table """
+        self.get_users()
+        hits = user_cache.stats()['hits']
+
+        with self.count_queries() as statements:
+            response, response_data = self.get_users()
+
+        self.assert200(response)
+        self.assertEqual(user_cache.stats()['hits'], hits + 1)
+        self.assertEqual(len(statements), 2) # the users fingerprint and page
+
+    def test_updated_user_is_evicted(self):
+        """ Deactivating a user through the model invalidates the cache """
+        response, response_data = self.get_users()
+        self.assert200(response)
+
+        Users.update(self.user1, is_active=False)
+
+        response, response_data = self.get_users()
+
+        self.assertEqual(response_data['data']['message'],
+            'This account is not active, please activate.')
+        self.assert400(response)
+
+    def test_deleted_user_is_evicted(self):
+        """ Deleting a user through the model invalidates the cache """
+        self.get_users()
+
+        Pins.delete_all(user_id=self.user1.id)
+        self.assertTrue(self.user1.delete())
+
+        response, response_data = self.get_users()
+
+        self.assertEqual(response_data['data']['message'],
+            'User does not exist')
+        self.assert400(response)
+
+    def test_evicted_after_commit(self):
+        """ A user re-cached before their update commits is still evicted """
+        self.get_users()
+
+        with unit_of_work():
+            Users.update(self.user1, is_active=False)
+
+            # a request reading the user before the commit caches them again
+            user_cache.set(self.user1.id, (True, True, 'user1'))
+            self.assertIsNotNone(user_cache.get(self.user1.id))
+
+        self.assertIsNone(user_cache.get(self.user1.id))
+
+    def test_rolled_back_update_keeps_user(self):
+        """ An update rolled back leaves the cached user in place """
+        self.get_users()
+
+        with unit_of_work() as unit:
+            Users.update(self.user1, is_active=False)
+            unit.fail()
+
+        self.assertIsNotNone(user_cache.get(self.user1.id))
+
+        Users.update(self.user1, username='user1b')
+        self.assertIsNone(user_cache.get(self.user1.id))
@@ -0,0 +1,99 @@
+import json
+
+from unittest import mock
+
+from test.base import BaseTestCase
+from api.schema import pin_fragment_cache
+
+
+class PoolStatsTestCase(BaseTestCase):
+    """ Test Pool Stats """
+
+    def test_pool_stats_invalid_token(self):
+        """ Test /internal/pool
+            - Get pool stats without the internal token
+        """
+        response = self.client.get(
+            'internal/pool',
+            headers={'authorization': 'faketoken'}
+        )
+        response_data = json.loads(response.data)
+
+        self.assertEqual(response_data['status'], 'fail')
+        self.assert401(response)
+
+    def test_pool_stats_successful(self):
+        """ Test /internal/pool
+            - Get pool stats with the internal token
+        """
+        response = self.client.get(
+            'internal/pool',
+            headers={'authorization': self.app.config['INTERNAL_TOKEN']}
+        )
+        response_data = json.loads(response.data)
+
+        self.assertEqual(response_data['data']['message'],
+            'Pool stats fetched successfully')
+        self.assertIn('checkout_histogram', response_data['data']['pool'])
+        self.assert200(response)
+
+
+class MetricsTestCase(BaseTestCase):
+    """ Test Metrics """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data()
+
+    def test_metrics_invalid_token(self):
+        """ Test /metrics
+            - Get metrics without the internal token
+        """
+        response = self.client.get('metrics')
+
+        self.assert401(response)
+
+    def test_metrics_successful(self):
+        """ Test /metrics
+            - Requests are counted per resource and cache hit ratios given
+        """
+        self.login('user1', 'password1')
+        self.client.get(
+            'user_info',
+            headers={'authorization': self.authorization_token}
+        )
+
+        response = self.client.get(
+            'metrics',
+            headers={
+                'authorization': 'Bearer ' + self.app.config['INTERNAL_TOKEN']
+            }
+        )
+        body = response.data.decode()
+
+        self.assert200(response)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertIn('http_requests_total{method="GET",'
+                      'resource="UserResource",status="200"}', body)
+        self.assertIn('http_request_duration_seconds_count{method="POST",'
+                      'resource="UserLoginResource"}', body)
+        self.assertIn('db_queries_total{resource="UserResource"}', body)
+        self.assertIn('cache_hit_ratio{cache="user_info"}', body)
+
+    def test_requests_skip_cache_stats(self):
+        """ Test /sample
+            - Requests read the plain cache counters, not the cache stats
+        """
+        with mock.patch.object(pin_fragment_cache, 'stats',
+                               side_effect=AssertionError('stats read')):
+            pin_fragment_cache.get('missing')
+            self.assert200(self.client.get('sample'))
+
+        response = self.client.get(
+            'metrics',
+            headers={'authorization': self.app.config['INTERNAL_TOKEN']}
+        )
+
+        self.assertIn('cache_misses_total{cache="pin_fragment"}',
+                      response.data.decode())
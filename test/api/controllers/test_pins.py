@@ -1,16 +1,18 @@
 import json
 import pytest
 
+from unittest import mock
+from sqlalchemy.exc import SQLAlchemyError
+
 from test.base import BaseTestCase
-from api.models import db, Users, Pins, PinShares
+from api.models import db, Users, Pins, PinShares, geo
 
 
 class PinListTestCase(BaseTestCase):
     """ Test Add Pin """
 
     def setUp(self):
-        db.drop_all()
-        db.create_all()
+        super().setUp()
 
         self.create_default_data() # create default data
 
@@ -105,13 +107,259 @@ class PinListTestCase(BaseTestCase):
         self.assertEqual(response_data['status'], 'success')
         self.assertEqual(response.status_code, 201) 
 
+    def test_add_pin_write_failed(self):
+        """ Test /pin
+            - A failed write is rolled back and reported
+        """
+        with mock.patch.object(
+            db.session, 'flush', side_effect=SQLAlchemyError()
+        ):
+            response = self.client.post(
+                'pin',
+                headers={'authorization': self.user1_token},
+                data=json.dumps({"name": "newPin", "latLng": [2, 3]}),
+                content_type='application/json'
+            )
+        response_data = json.loads(response.data)
+
+        self.assertEqual(response_data['data']['message'],
+            'Something went wrong')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(Pins.count(user_id=self.user1.id), 2)
+
+
+class PinBatchTestCase(BaseTestCase):
+    """ Test Add Pins In Batch """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data() # create default data
+
+        self.login('user1', 'password1') # login user1
+        self.user1_token = self.authorization_token # user1's token
+
+        self.user1 = Users.find_first(**{'username': 'user1'}) # user1's info
+
+    def add_pins(self, pins):
+        response = self.client.post(
+            'pins/batch',
+            headers={'authorization': self.user1_token},
+            data=json.dumps({"pins": pins}),
+            content_type='application/json'
+        )
+        return response, json.loads(response.data)
+
+    def test_add_pins_empty(self):
+        """ Test /pins/batch
+            - Add an empty batch of pins
+        """
+        response, response_data = self.add_pins([])
+
+        self.assertEqual(response_data['data']['message'],
+            {'pins': ['Length must be between 1 and 5000.']})
+        self.assert400(response)
+
+    def test_add_pins_all_invalid(self):
+        """ Test /pins/batch
+            - Add a batch of invalid pins
+        """
+        response, response_data = self.add_pins([{"name": "noLatLng"}, 1])
+
+        self.assertEqual(response_data['data']['message'], {
+            '0': {'latLng': ['Missing data for required field.']},
+            '1': {'_schema': ['Invalid input type.']}
+        })
+        self.assert400(response)
+        self.assertEqual(Pins.count(user_id=self.user1.id), 2)
+
+    def test_add_pins_successful(self):
+        """ Test /pins/batch
+            - Add a batch of pins, some of them invalid
+        """
+        pins = [
+            {"name": "Pin {0}".format(i), "latLng": [i / 100, -i / 100]}
+            for i in range(1000)
+        ]
+        pins[10] = {"name": "", "latLng": [1, 2]}
+        pins[20] = {"name": "badLatLng", "latLng": [1]}
+
+        response, response_data = self.add_pins(pins)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response_data['data']['message'],
+            'Pins added successfully')
+        self.assertEqual(
+            sorted(response_data['data']['errors']), ['10', '20']
+        )
+
+        added = response_data['data']['pins']
+        self.assertEqual(len(added), 998)
+        self.assertNotIn(10, [pin['index'] for pin in added])
+
+        pin = Pins.get_by_id(added[-1]['id'])
+        self.assertEqual(pin.name, 'Pin 999')
+        self.assertEqual(pin.user_id, self.user1.id)
+        self.assertEqual((pin.lat, pin.lng), (9.99, -9.99))
+        self.assertEqual(pin.cell, geo.cell_id(9.99, -9.99))
+        self.assertTrue(pin.is_active)
+        self.assertIsNotNone(pin.modified_at)
+        self.assertEqual(Pins.count(user_id=self.user1.id), 1000)
+
+
+class PinImportTestCase(BaseTestCase):
+    """ Test Import Pins """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data() # create default data
+
+        self.login('user1', 'password1') # login user1
+        self.user1 = Users.find_first(**{'username': 'user1'}) # user1's info
+
+        self.app.config['PIN_IMPORT_CHUNK_SIZE'] = 100
+
+    def import_pins(self, data, content_type):
+        """ Import pins, returning the response and its progress lines """
+        response = self.client.post(
+            'pins/import',
+            headers={'authorization': self.authorization_token},
+            data=data,
+            content_type=content_type
+        )
+        if response.mimetype != 'application/x-ndjson':
+            return response, json.loads(response.data)
+        return response, [
+            json.loads(line) for line in response.data.decode().splitlines()
+        ]
+
+    def test_import_invalid_content_type(self):
+        """ Test /pins/import
+            - Import pins from an unsupported format
+        """
+        response, response_data = self.import_pins('<kml/>', 'application/xml')
+
+        self.assertEqual(response_data['status'], 'fail')
+        self.assert400(response)
+
+    def test_import_invalid_csv(self):
+        """ Test /pins/import
+            - Import a CSV without a lat column
+        """
+        response, response_data = self.import_pins(
+            'name,lng\nPin,1\n', 'text/csv'
+        )
+
+        self.assertEqual(response_data['data']['message'],
+            'The CSV must have name, lat and lng columns')
+        self.assert400(response)
+        self.assertEqual(Pins.count(user_id=self.user1.id), 2)
+
+    def test_import_csv_successful(self):
+        """ Test /pins/import
+            - Import a CSV, some of its rows invalid
+        """
+        rows = ['name,lat,lng'] + [
+            'Pin {0},{1},{2}'.format(i, i / 100, -i / 100) for i in range(250)
+        ]
+        rows[11] = ',1,2'
+        rows[151] = 'badLat,north,2'
+
+        response, lines = self.import_pins('\n'.join(rows), 'text/csv')
+
+        self.assert200(response)
+        self.assertEqual([line['status'] for line in lines],
+            ['progress', 'progress', 'progress', 'success'])
+        self.assertEqual(
+            [line['data']['rows'] for line in lines], [100, 200, 250, 250]
+        )
+        self.assertEqual(lines[0]['data']['errors'], {
+            '10': {'name': ['Not a valid pin name.']}
+        })
+        self.assertEqual(lines[1]['data']['errors'], {
+            '150': {'latLng': {'0': ['Not a valid number.']}}
+        })
+        self.assertEqual(lines[-1]['data'], {
+            'message': 'Pins imported successfully',
+            'rows': 250, 'imported': 248, 'failed': 2
+        })
+
+        self.assertEqual(Pins.count(user_id=self.user1.id), 2 + 248)
+        pin = Pins.find_first(name='Pin 249')
+        self.assertEqual(pin.user_id, self.user1.id)
+        self.assertEqual(pin.latLng, [2.49, -2.49])
+        self.assertEqual(pin.cell, geo.cell_id(2.49, -2.49))
+
+    def test_import_geojson_successful(self):
+        """ Test /pins/import
+            - Import a GeoJSON FeatureCollection, some features not points
+        """
+        features = [
+            {
+                'type': 'Feature',
+                'properties': {'name': 'Pin {0}'.format(i)},
+                'geometry': {'type': 'Point', 'coordinates': [-i / 10, i / 10]}
+            }
+            for i in range(120)
+        ]
+        features[5]['geometry'] = {'type': 'Polygon', 'coordinates': []}
+
+        response, lines = self.import_pins(
+            json.dumps({'type': 'FeatureCollection', 'features': features}),
+            'application/geo+json'
+        )
+
+        self.assert200(response)
+        self.assertEqual(lines[0]['data']['errors'],
+            {'5': {'geometry': ['Must be a Point.']}})
+        self.assertEqual(lines[-1]['status'], 'success')
+        self.assertEqual(lines[-1]['data']['imported'], 119)
+
+        pin = Pins.find_first(name='Pin 7')
+        self.assertEqual(pin.latLng, [0.7, -0.7])
+
+    def test_import_malformed_midway(self):
+        """ Test /pins/import
+            - Import a CSV turning malformed after its first chunks
+        """
+        # longer than the blocks the body is decoded in
+        rows = ['name,lat,lng'] + [
+            'Pin {0},1,2'.format(i) for i in range(2000)
+        ]
+        data = '\n'.join(rows).encode() + b'\nBad,\xff\xfe,2\n'
+
+        response, lines = self.import_pins(data, 'text/csv')
+
+        self.assert200(response)
+        self.assertEqual(lines[0]['status'], 'progress')
+        self.assertEqual(lines[-1]['status'], 'fail')
+
+        # the chunks before the error stay imported
+        imported = lines[-1]['data']['imported']
+        self.assertGreater(imported, 0)
+        self.assertEqual(Pins.count(user_id=self.user1.id), 2 + imported)
+
+    def test_import_write_failed(self):
+        """ Test /pins/import
+            - A failed insert stops the import
+        """
+        with mock.patch.object(Pins, 'insert_batch', return_value=False):
+            response, lines = self.import_pins(
+                'name,lat,lng\nPin,1,2\n', 'text/csv'
+            )
+
+        self.assertEqual(lines, [{'status': 'fail', 'data': {
+            'message': 'Something went wrong',
+            'rows': 0, 'imported': 0, 'failed': 0
+        }}])
+
 
 class PinTestCase(BaseTestCase):
     """ Test Update Pin """
 
     def setUp(self):
-        db.drop_all()
-        db.create_all()
+        super().setUp()
 
         self.create_default_data() # create default data
 
@@ -216,8 +464,7 @@ class SharePinTestCase(BaseTestCase):
     """ Test Share Pin """
 
     def setUp(self):
-        db.drop_all()
-        db.create_all()
+        super().setUp()
 
         self.create_default_data() # create default data
 
@@ -332,5 +579,204 @@ class SharePinTestCase(BaseTestCase):
         self.assertEqual(response_data['data']['message'],
             'Pin shared successfully')
         self.assertEqual(response_data['status'], 'success')
+        self.assertEqual(response_data['data']['shared'], [self.user2.id])
+        self.assertEqual(response_data['data']['skipped'], [])
+        self.assertEqual(response_data['data']['invalid'], [])
         self.assertTrue(new_share)
         self.assert200(response)
+
+    def test_share_pin_skipped_and_invalid(self):
+        """ Test /share_pin/:pin_id
+            - Share Pin with already shared, duplicate and unknown user_ids
+        """
+        user3 = Users.find_first(**{'username': 'user3'})
+
+        self.client.post(
+            'share_pin/{0}'.format(self.user1_pins[0].id),
+            headers={'authorization': self.user1_token},
+            data=json.dumps({"user_ids": [self.user2.id]}),
+            content_type='application/json'
+        )
+
+        response = self.client.post(
+            'share_pin/{0}'.format(self.user1_pins[0].id),
+            headers={'authorization': self.user1_token},
+            data=json.dumps({
+                "user_ids": [self.user2.id, 'fakeid', user3.id, user3.id]
+            }),
+            content_type='application/json'
+        )
+        response_data = json.loads(response.data)
+
+        self.assertEqual(response_data['data']['shared'], [user3.id])
+        self.assertEqual(response_data['data']['skipped'], [self.user2.id])
+        self.assertEqual(response_data['data']['invalid'], ['fakeid'])
+        self.assertEqual(
+            PinShares.count(**{'pin_id': self.user1_pins[0].id}), 2
+        )
+        self.assert200(response)
+
+
+class PinWithinTestCase(BaseTestCase):
+    """ Test Pins Within Bounding Box """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data() # create default data
+
+        self.login('user1', 'password1') # login user1
+        self.user1_token = self.authorization_token # user1's token
+
+        self.user1 = Users.find_first(**{'username': 'user1'}) # user1's info
+        self.user2 = Users.find_first(**{'username': 'user2'}) # user2's info
+
+        self.user2_pins = Pins.find_all(**{'user_id': self.user2.id}) # user2's pins
+
+        # share user2's pin with user1
+        PinShares(
+            pin_id=self.user2_pins[0].id,
+            shared_by=self.user2.id,
+            shared_to=self.user1.id
+        ).save()
+
+    def get_pins_within(self, bbox, **params):
+        """ Get user1's pins within a bounding box """
+        response = self.client.get(
+            'pins/within',
+            headers={'authorization': self.user1_token},
+            query_string=dict(params, bbox=bbox)
+        )
+        return response, json.loads(response.data)
+
+    def test_pins_within_invalid_bbox(self):
+        """ Test /pins/within
+            - Get pins with an invalid bounding box
+        """
+        response, response_data = self.get_pins_within('1,2,3')
+
+        self.assertEqual(response_data['data']['message'],
+            {'bbox': ['Length must be 4.']})
+        self.assertEqual(response_data['status'], 'fail')
+        self.assert400(response)
+
+        response, response_data = self.get_pins_within('10,0,5,10')
+
+        self.assertEqual(response_data['data']['message'],
+            {'bbox': ['Latitudes must be between -90 and 90, min first.']})
+        self.assert400(response)
+
+    def test_pins_within_successful(self):
+        """ Test /pins/within
+            - Get own and shared pins inside a bounding box
+        """
+        response, response_data = self.get_pins_within('0,0,4,5')
+        pins = response_data['data']['pins']
+
+        self.assertEqual(response_data['data']['message'],
+            'Pins fetched successfully')
+        self.assertEqual(
+            sorted((pin['name'], pin['shared']) for pin in pins),
+            [('Pin 1', False), ('Pin 2', True)]
+        )
+        self.assert200(response)
+
+    def test_pins_within_limit(self):
+        """ Test /pins/within
+            - The limit holds for own and shared pins together, oldest first
+        """
+        response, response_data = self.get_pins_within('0,0,4,5', limit=1)
+
+        self.assertEqual(
+            [(pin['name'], pin['shared'])
+             for pin in response_data['data']['pins']],
+            [('Pin 1', False)]
+        )
+        self.assert200(response)
+
+    def test_pins_within_updated_pin(self):
+        """ Test /pins/within
+            - Updated coordinates move a pin in and out of the box
+        """
+        pin = Pins.find_first(**{'name': 'Pin 1.1'})
+        Pins.update(pin, latLng=[2.0, 3.0])
+
+        response, response_data = self.get_pins_within('1.5,2.5,2.5,3.5')
+
+        self.assertEqual(
+            [pin['name'] for pin in response_data['data']['pins']],
+            ['Pin 1.1']
+        )
+        self.assert200(response)
+
+
+class PinNearestTestCase(BaseTestCase):
+    """ Test Nearest Pins """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data() # create default data
+
+        self.login('user1', 'password1') # login user1
+        self.user1_token = self.authorization_token # user1's token
+
+        self.user1 = Users.find_first(**{'username': 'user1'}) # user1's info
+        self.user2 = Users.find_first(**{'username': 'user2'}) # user2's info
+
+        self.user2_pins = Pins.find_all(**{'user_id': self.user2.id}) # user2's pins
+
+        # share user2's pin with user1
+        PinShares(
+            pin_id=self.user2_pins[0].id,
+            shared_by=self.user2.id,
+            shared_to=self.user1.id
+        ).save()
+
+    def get_nearest_pins(self, **params):
+        """ Get user1's nearest pins """
+        response = self.client.get(
+            'pins/nearest',
+            headers={'authorization': self.user1_token},
+            query_string=params
+        )
+        return response, json.loads(response.data)
+
+    def test_nearest_pins_invalid_coordinates(self):
+        """ Test /pins/nearest
+            - Get nearest pins with an invalid latitude
+        """
+        response, response_data = self.get_nearest_pins(lat=91, lng=0)
+
+        self.assertEqual(response_data['data']['message'],
+            {'lat': ['Must be greater than or equal to -90 and less than or equal to 90.']})
+        self.assertEqual(response_data['status'], 'fail')
+        self.assert400(response)
+
+    def test_nearest_pins_successful(self):
+        """ Test /pins/nearest
+            - Get own and shared pins ordered by distance
+        """
+        response, response_data = self.get_nearest_pins(lat=6.9, lng=7.9, k=3)
+        pins = response_data['data']['pins']
+
+        self.assertEqual(response_data['data']['message'],
+            'Pins fetched successfully')
+        self.assertEqual(
+            [(pin['name'], pin['shared']) for pin in pins],
+            [('Pin 1.1', False), ('Pin 2', True), ('Pin 1', False)]
+        )
+        self.assertLess(pins[0]['distance'], 20)
+        self.assertEqual(pins, sorted(pins, key=lambda pin: pin['distance']))
+        self.assert200(response)
+
+    def test_nearest_pins_k(self):
+        """ Test /pins/nearest
+            - Get only the k nearest pins, from across the antimeridian
+        """
+        response, response_data = self.get_nearest_pins(lat=1, lng=-179, k=1)
+
+        self.assertEqual(
+            [pin['name'] for pin in response_data['data']['pins']], ['Pin 1.1']
+        )
+        self.assert200(response)
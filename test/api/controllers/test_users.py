@@ -1,16 +1,21 @@
 import json
 import pytest
 
+from unittest import mock
+
 from test.base import BaseTestCase
-from api.models import db
+from api.auth import user_cache
+from api.controllers import user_info_cache
+from api.models import (
+    db, Users, Pins, PinShares, password_hasher, PasswordHasherBusy
+)
 
 
 class UserrSignUpTestCase(BaseTestCase):
     """ Test User SignUp """
 
     def setUp(self):
-        db.drop_all()
-        db.create_all()
+        super().setUp()
 
         self.create_default_data() # create default data
     
@@ -90,8 +95,7 @@ class UserLoginTestCase(BaseTestCase):
     """ Test User Login """
 
     def setUp(self):
-        db.drop_all()
-        db.create_all()
+        super().setUp()
 
         self.create_default_data()
     
@@ -166,6 +170,23 @@ class UserLoginTestCase(BaseTestCase):
         self.assertEqual(response_data['status'], 'success')
         self.assert200(response)
 
+    def test_user_login_hashing_busy(self):
+        """ Test /login
+            - Login while the password hashing pool is saturated
+        """
+        user = {'username': 'user1', 'password': 'password1'}
+
+        with mock.patch.object(
+            password_hasher, 'check', side_effect=PasswordHasherBusy
+        ):
+            response = self.client.post('login', data=json.dumps(user), content_type='application/json')
+        response_data = json.loads(response.data)
+
+        self.assertEqual(response_data['data']['message'],
+            'Too many requests, please try again shortly')
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(response.status_code, 429)
+
     def test_user_login_name_case_insenstive(self):
         """ Test /login
             - Login user successful
@@ -187,8 +208,7 @@ class UserInfoTestCase(BaseTestCase):
     """ Test User Info """
 
     def setUp(self):
-        db.drop_all()
-        db.create_all()
+        super().setUp()
 
         self.create_default_data()
     
@@ -228,13 +248,348 @@ class UserInfoTestCase(BaseTestCase):
         self.assertEqual(response_data['data']['user']['shares'], [])
         self.assert200(response)
 
+    def get_user_info_query_count(self, token):
+        """ Count the queries issued by /user_info on a fresh session """
+        db.session.remove()
+        user_cache.clear()
+        user_info_cache.clear()
+
+        with self.count_queries() as statements:
+            response = self.client.get(
+                'user_info',
+                headers={'authorization': token},
+                content_type='application/json'
+            )
+        self.assert200(response)
+
+        return len(statements), json.loads(response.data)['data']['user']
+
+    def add_pins_and_shares(self, count):
+        """ Add pins to user1 and share pins of other users with user1 """
+        user1 = Users.find_first(**{'username': 'user1'})
+
+        for username in ('user2', 'user3'):
+            owner = Users.find_first(**{'username': username})
+            for i in range(count):
+                Pins(user_id=user1.id, name='Own', latLng=[1.0, 1.0]).save()
+                pin = Pins(user_id=owner.id, name='Shared', latLng=[2.0, 2.0])
+                pin.save()
+                PinShares(
+                    pin_id=pin.id, shared_by=owner.id, shared_to=user1.id
+                ).save()
+
+    def test_fetch_user_info_constant_queries(self):
+        """ Test /user_info
+            - Query count does not grow with the number of pins and shares
+        """
+        self.login('user1', 'password1')
+
+        self.add_pins_and_shares(1)
+        small_count, small_user = self.get_user_info_query_count(
+            self.authorization_token
+        )
+
+        self.add_pins_and_shares(10)
+        large_count, large_user = self.get_user_info_query_count(
+            self.authorization_token
+        )
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(large_user['my_pins']), 24)
+        self.assertEqual(len(large_user['shares']), 22)
+        self.assertTrue(all(pin['shared'] for pin in large_user['shares']))
+        self.assertTrue(all(pin['user'] for pin in large_user['shares']))
+
+    def test_fetch_user_info_not_modified(self):
+        """ Test /user_info
+            - A matching If-None-Match gets an empty 304 until a pin changes
+        """
+        self.login('user1', 'password1')
+        headers = {'authorization': self.authorization_token}
+
+        response = self.client.get('user_info', headers=headers)
+        self.assert200(response)
+        etag = response.headers['ETag']
+
+        response = self.client.get(
+            'user_info', headers={**headers, 'If-None-Match': etag}
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+
+        self.add_pins_and_shares(1)
+        user_info_cache.clear()
+
+        response = self.client.get(
+            'user_info', headers={**headers, 'If-None-Match': etag}
+        )
+        self.assert200(response)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def get_user_info(self, username, password):
+        """ Get /user_info as a user, returning the user and query count """
+        self.login(username, password)
+
+        with self.count_queries() as statements:
+            response = self.client.get(
+                'user_info',
+                headers={'authorization': self.authorization_token}
+            )
+        self.assert200(response)
+
+        return json.loads(response.data)['data']['user'], len(statements)
+
+    def test_fetch_user_info_cached(self):
+        """ Test /user_info
+            - Repeated reads are served from the cache without queries
+        """
+        user, _ = self.get_user_info('user1', 'password1')
+        cached_user, query_count = self.get_user_info('user1', 'password1')
+
+        self.assertEqual(cached_user, user)
+        self.assertEqual(query_count, 0)
+
+    def test_fetch_user_info_invalidated_by_writes(self):
+        """ Test /user_info
+            - Adding, updating and sharing a pin drops the cached info of
+              the owner and recipients
+        """
+        user2 = Users.find_first(**{'username': 'user2'})
+        self.get_user_info('user2', 'password2')
+
+        user, _ = self.get_user_info('user1', 'password1')
+        headers = {'authorization': self.authorization_token}
+
+        response = self.client.post(
+            'pin', headers=headers, content_type='application/json',
+            data=json.dumps({'name': 'New', 'latLng': [1.0, 1.0]})
+        )
+        self.assertEqual(response.status_code, 201)
+        pin_id = json.loads(response.data)['data']['pin']['id']
+
+        user, _ = self.get_user_info('user1', 'password1')
+        self.assertIn('New', [pin['name'] for pin in user['my_pins']])
+
+        response = self.client.post(
+            'share_pin/' + pin_id, headers=headers,
+            content_type='application/json',
+            data=json.dumps({'user_ids': [user2.id]})
+        )
+        self.assert200(response)
+
+        shared_user, _ = self.get_user_info('user2', 'password2')
+        self.assertEqual([pin['name'] for pin in shared_user['shares']], ['New'])
+
+        self.login('user1', 'password1')
+        response = self.client.put(
+            'pin/' + pin_id, headers={'authorization': self.authorization_token},
+            content_type='application/json',
+            data=json.dumps({'name': 'Renamed'})
+        )
+        self.assert200(response)
+
+        user, _ = self.get_user_info('user1', 'password1')
+        self.assertIn('Renamed', [pin['name'] for pin in user['my_pins']])
+        shared_user, _ = self.get_user_info('user2', 'password2')
+        self.assertEqual(
+            [pin['name'] for pin in shared_user['shares']], ['Renamed']
+        )
+
+
+class UserPinListTestCase(BaseTestCase):
+    """ Test User Pins Feed """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data()
+
+        self.login('user1', 'password1')
+
+        self.user1 = Users.find_first(**{'username': 'user1'})
+        self.user2 = Users.find_first(**{'username': 'user2'})
+
+        # share user2's pin with user1
+        self.user2_pin = Pins.find_first(**{'user_id': self.user2.id})
+        PinShares(
+            pin_id=self.user2_pin.id,
+            shared_by=self.user2.id,
+            shared_to=self.user1.id
+        ).save()
+
+    def get_pins(self, **params):
+        """ Get a page of user1's pins """
+        response = self.client.get(
+            'user_info/pins',
+            headers={'authorization': self.authorization_token},
+            query_string=params
+        )
+        return response, json.loads(response.data)
+
+    def test_get_pins_invalid_kind(self):
+        """ Test /user_info/pins
+            - Get pins with an invalid kind
+        """
+        response, response_data = self.get_pins(kind='others')
+
+        self.assertEqual(response_data['data']['message'],
+            {'kind': ['Must be one of: own, shared, all.']})
+        self.assertEqual(response_data['status'], 'fail')
+        self.assert400(response)
+
+    def test_get_pins_pages(self):
+        """ Test /user_info/pins
+            - Walk all of user1's pins one page at a time
+        """
+        pins = []
+        cursor = None
+
+        while True:
+            params = {'limit': 1}
+            if cursor:
+                params['cursor'] = cursor
+
+            response, response_data = self.get_pins(**params)
+            self.assert200(response)
+            self.assertEqual(response_data['data']['message'],
+                'User pins fetched successfully')
+
+            pins += response_data['data']['pins']
+            cursor = response_data['data']['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len(pins), 3)
+        self.assertEqual([pin['shared'] for pin in pins].count(True), 1)
+
+    def test_get_pins_by_kind(self):
+        """ Test /user_info/pins
+            - Get only own or only shared pins
+        """
+        response, response_data = self.get_pins(kind='own')
+
+        self.assert200(response)
+        self.assertEqual(len(response_data['data']['pins']), 2)
+        self.assertFalse(any(
+            pin['shared'] for pin in response_data['data']['pins']
+        ))
+        self.assertIsNone(response_data['data']['next_cursor'])
+
+        response, response_data = self.get_pins(kind='shared')
+
+        self.assert200(response)
+        self.assertEqual(
+            [pin['id'] for pin in response_data['data']['pins']],
+            [self.user2_pin.id]
+        )
+        self.assertEqual(
+            response_data['data']['pins'][0]['user']['username'], 'user2'
+        )
+
+
+class UserExportTestCase(BaseTestCase):
+    """ Test User Pins Export """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data()
+
+        self.login('user1', 'password1')
+
+        self.user1 = Users.find_first(**{'username': 'user1'})
+        self.user2 = Users.find_first(**{'username': 'user2'})
+
+        # share user2's pin with user1
+        self.user2_pin = Pins.find_first(**{'user_id': self.user2.id})
+        PinShares(
+            pin_id=self.user2_pin.id,
+            shared_by=self.user2.id,
+            shared_to=self.user1.id
+        ).save()
+
+    def export(self, token=None):
+        return self.client.get(
+            'user_info/export',
+            headers={'authorization': token or self.authorization_token}
+        )
+
+    def test_export_invalid_token(self):
+        """ Test /user_info/export
+            - Export pins with invalid token
+        """
+        response = self.export(token='faketoken')
+        response_data = json.loads(response.data)
+
+        self.assertEqual(response_data['data']['message'],
+            'Unauthorized. The authorization token supplied is invalid')
+        self.assert401(response)
+
+    def test_export_successful(self):
+        """ Test /user_info/export
+            - Export own pins, then shared pins, one JSON pin per line
+        """
+        response = self.export()
+
+        self.assert200(response)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+
+        lines = response.data.decode().splitlines()
+        pins = [json.loads(line) for line in lines]
+
+        self.assertEqual(len(pins), 3)
+        self.assertEqual([pin['shared'] for pin in pins], [False, False, True])
+        self.assertEqual(pins[2]['id'], self.user2_pin.id)
+        self.assertEqual(pins[2]['user']['username'], 'user2')
+        self.assertEqual(
+            set(pin['id'] for pin in pins[:2]),
+            set(pin.id for pin in Pins.query.filter_by(user_id=self.user1.id))
+        )
+
+        # every line matches the pin as the feed returns it
+        feed = json.loads(self.client.get(
+            'user_info/pins',
+            headers={'authorization': self.authorization_token}
+        ).data)['data']['pins']
+        self.assertEqual(
+            sorted(pins, key=lambda pin: pin['id']),
+            sorted(feed, key=lambda pin: pin['id'])
+        )
+
+    def test_export_streamed(self):
+        """ Test /user_info/export
+            - Many pins are sent in several chunks
+        """
+        Pins.insert_batch(self.user1.id, [
+            {'name': 'Pin {0}'.format(i), 'latLng': [1.0, 1.0]}
+            for i in range(1200)
+        ])
+
+        response = self.client.get(
+            'user_info/export',
+            headers={'authorization': self.authorization_token},
+            buffered=False
+        )
+
+        self.assertTrue(response.is_streamed)
+        self.assertNotIn('Content-Length', response.headers)
+
+        chunks = list(response.response)
+        response.close()
+
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(
+            sum(chunk.count(b'\n') for chunk in chunks), 1200 + 3
+        )
+
 
 class UserListTestCase(BaseTestCase):
     """ Test All Users """
 
     def setUp(self):
-        db.drop_all()
-        db.create_all()
+        super().setUp()
 
         self.create_default_data()
     
@@ -272,3 +627,78 @@ class UserListTestCase(BaseTestCase):
         self.assertTrue(response_data['data']['users'])
         self.assertEqual(len(response_data['data']['users']), 2)
         self.assert200(response)
+
+    def test_fetch_users_pages(self):
+        """ Test /all_users
+            - Get all users one page at a time
+        """
+        self.login('user1', 'password1')
+
+        users = []
+        params = {'limit': 1}
+
+        while True:
+            response = self.client.get(
+                'all_users',
+                headers={'authorization': self.authorization_token},
+                query_string=params
+            )
+            response_data = json.loads(response.data)
+            self.assert200(response)
+
+            users += response_data['data']['users']
+            params['cursor'] = response_data['data']['next_cursor']
+            if not params['cursor']:
+                break
+
+        self.assertEqual(
+            sorted(user['username'] for user in users), ['user2', 'user3']
+        )
+
+    def test_fetch_users_not_modified(self):
+        """ Test /all_users
+            - A matching If-None-Match gets an empty 304 until a user joins
+        """
+        self.login('user1', 'password1')
+        headers = {'authorization': self.authorization_token}
+
+        for params in ({}, {'limit': 1}):
+            response = self.client.get(
+                'all_users', headers=headers, query_string=params
+            )
+            self.assert200(response)
+            etag = response.headers['ETag']
+
+            response = self.client.get(
+                'all_users', headers={**headers, 'If-None-Match': etag},
+                query_string=params
+            )
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+
+        user4 = Users(username='user4')
+        user4.set_password('password4')
+        user4.save()
+
+        response = self.client.get(
+            'all_users', headers={**headers, 'If-None-Match': etag},
+            query_string={'limit': 1}
+        )
+        self.assert200(response)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_fetch_users_invalid_limit(self):
+        """ Test /all_users
+            - Get users with an out of range limit
+        """
+        self.login('user1', 'password1')
+        response = self.client.get(
+            'all_users',
+            headers={'authorization': self.authorization_token},
+            query_string={'limit': 0}
+        )
+        response_data = json.loads(response.data)
+
+        self.assertEqual(response_data['data']['message'],
+            {'limit': ['Must be greater than or equal to 1 and less than or equal to 100.']})
+        self.assert400(response)
@@ -0,0 +1,162 @@
+import json
+import asyncio
+
+from io import BytesIO
+
+from test.base import BaseTestCase
+from api.helper import WsgiToAsgi
+from api.helper.asgi import build_environ
+
+
+class WsgiToAsgiTestCase(BaseTestCase):
+    """ Test serving the app through its ASGI front """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data()
+
+        self.application = WsgiToAsgi(self.app, threads=2)
+
+    def tearDown(self):
+        self.application.shutdown()
+        super().tearDown()
+
+    def call(self, method, path, chunks=(b'',), headers=()):
+        """ Runs one request, returns the messages the app sent """
+        incoming = [
+            {
+                'type': 'http.request',
+                'body': chunk,
+                'more_body': index < len(chunks) - 1
+            }
+            for index, chunk in enumerate(chunks)
+        ]
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'query_string': b'',
+            'root_path': '',
+            'headers': [
+                (name.encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ],
+            'client': ('127.0.0.1', 50000),
+            'server': ('localhost', 5000)
+        }
+        asyncio.run(self.application(scope, receive, send))
+        return sent
+
+    def response(self, sent):
+        """ Returns the status, headers and body of the sent messages """
+        start, body = sent[0], sent[1:]
+        self.assertEqual(start['type'], 'http.response.start')
+        self.assertTrue(all(
+            message['type'] == 'http.response.body' for message in body
+        ))
+        self.assertFalse(body[-1].get('more_body', False))
+        return (
+            start['status'],
+            dict((name.decode(), value.decode())
+                 for name, value in start['headers']),
+            b''.join(message['body'] for message in body)
+        )
+
+    def login(self):
+        credentials = json.dumps(
+            {'username': 'user1', 'password': 'password1'}
+        ).encode()
+        sent = self.call(
+            'POST', '/login',
+            # the body arrives in two messages
+            chunks=(credentials[:10], credentials[10:]),
+            headers=[('content-type', 'application/json'),
+                     ('content-length', str(len(credentials)))]
+        )
+        return self.response(sent)
+
+    def test_same_response_as_wsgi(self):
+        """ A request gets the envelope the WSGI app returns """
+        status, headers, body = self.login()
+
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['content-type'], 'application/json')
+        response_data = json.loads(body)
+        self.assertEqual(response_data['status'], 'success')
+        self.assertTrue(response_data['data']['token'])
+
+    def test_streamed_response(self):
+        """ A streamed response is sent as the app yields its chunks """
+        token = json.loads(self.login()[2])['data']['token']
+
+        sent = self.call(
+            'GET', '/all_users', headers=[('authorization', token)]
+        )
+        status, headers, body = self.response(sent)
+
+        self.assertEqual(status, 200)
+        self.assertGreater(len(sent), 2)
+        self.assertEqual(
+            json.loads(body),
+            json.loads(self.client.get(
+                'all_users', headers={'authorization': token}
+            ).data)
+        )
+
+    def test_not_found(self):
+        """ Unknown routes get the app's own 404 envelope """
+        status, headers, body = self.response(self.call('GET', '/nowhere'))
+
+        self.assertEqual(status, 404)
+        self.assertEqual(json.loads(body)['data']['error'], 'Not found')
+
+    def test_lifespan(self):
+        """ Startup and shutdown are acknowledged """
+        incoming = [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}
+        ]
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(self.application({'type': 'lifespan'}, receive, send))
+
+        self.assertEqual(sent, [
+            'lifespan.startup.complete', 'lifespan.shutdown.complete'
+        ])
+
+    def test_build_environ(self):
+        """ Headers map to their WSGI keys, repeated ones are joined """
+        environ = build_environ({
+            'method': 'GET',
+            'path': '/pins/café',
+            'query_string': b'k=2',
+            'headers': [
+                (b'content-type', b'text/csv'),
+                (b'x-forwarded-for', b'10.0.0.1'),
+                (b'x-forwarded-for', b'10.0.0.2')
+            ]
+        }, BytesIO())
+
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/csv')
+        self.assertEqual(environ['HTTP_X_FORWARDED_FOR'], '10.0.0.1,10.0.0.2')
+        self.assertEqual(environ['QUERY_STRING'], 'k=2')
+        self.assertEqual(
+            environ['PATH_INFO'].encode('latin1').decode('utf8'),
+            '/pins/café'
+        )
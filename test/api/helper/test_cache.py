@@ -0,0 +1,164 @@
+from unittest import TestCase, mock
+
+from api.helper import (
+    TTLCache, CacheBackend, ResponseCache, FragmentCache, deep_size
+)
+
+
+class TTLCacheTestCase(TestCase):
+    """ Test TTLCache """
+
+    def test_get_and_set(self):
+        """ Cached values are returned and hits and misses counted """
+        cache = TTLCache(maxsize=2, ttl=10)
+
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 1)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats(),
+            {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 2})
+
+    def test_least_recently_used_evicted(self):
+        """ The least recently used entry makes room for new ones """
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_expired_entries_missed(self):
+        """ Entries are dropped once their ttl has passed """
+        cache = TTLCache(maxsize=2, ttl=10)
+
+        with mock.patch('api.helper.cache.monotonic', return_value=100):
+            cache.set('a', 1)
+            cache.set('b', 2, ttl=60)
+        with mock.patch('api.helper.cache.monotonic', return_value=111):
+            self.assertIsNone(cache.get('a'))
+            self.assertEqual(cache.get('b'), 2)
+
+    def test_delete_and_clear(self):
+        """ Entries can be dropped one by one or all at once """
+        cache = TTLCache()
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        cache.delete('a')
+        self.assertIsNone(cache.get('a'))
+
+        cache.clear()
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+class DictBackend(CacheBackend):
+    """ Minimal backend standing in for a shared store """
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value, ttl=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def clear(self):
+        self.data.clear()
+
+
+class GetOnlyBackend(CacheBackend):
+    """ Backend missing set, delete and clear """
+
+    def get(self, key, default=None):
+        return default
+
+
+class ResponseCacheTestCase(TestCase):
+    """ Test ResponseCache """
+
+    def test_backend_from_config(self):
+        """ The backend class is read from the app config """
+        app = mock.Mock(config={
+            'INFO_CACHE_BACKEND': 'test.api.helper.test_cache.DictBackend'
+        })
+        cache = ResponseCache()
+        cache.init_app(app, 'INFO_CACHE')
+        cache.set('a', {'b': 1})
+
+        self.assertIsInstance(cache.backend, DictBackend)
+        self.assertEqual(cache.backend.data, {'a': {'b': 1}})
+
+    def test_incomplete_backend_from_config(self):
+        """ A backend class missing part of the interface fails at init_app """
+        app = mock.Mock(config={
+            'INFO_CACHE_BACKEND': 'test.api.helper.test_cache.GetOnlyBackend'
+        })
+        cache = ResponseCache()
+
+        with self.assertRaises(TypeError):
+            cache.init_app(app, 'INFO_CACHE')
+
+    def test_invalidate(self):
+        """ Only the given keys are dropped """
+        cache = ResponseCache(TTLCache(maxsize=10, ttl=10))
+        for key in 'abc':
+            cache.set(key, key)
+
+        cache.invalidate('a', 'b', None)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 'c')
+
+
+class FragmentCacheTestCase(TestCase):
+    """ Test FragmentCache """
+
+    def test_stats(self):
+        """ The hit ratio and memory of the cached fragments are reported """
+        cache = FragmentCache(maxsize=10, ttl=10)
+        fragment = {'id': 'a', 'latLng': [1.0, 2.0]}
+
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', fragment)
+
+        self.assertIs(cache.get('a'), fragment)
+        stats = cache.stats()
+        self.assertEqual(stats['hit_ratio'], 0.5)
+        self.assertEqual(stats['memory'], deep_size(fragment))
+
+        cache.delete('a')
+        self.assertEqual(cache.stats()['memory'], 0)
+
+    def test_memory_running_total(self):
+        """ Memory follows fragments replaced, evicted, expired and cleared """
+        cache = FragmentCache(maxsize=2, ttl=10)
+        small, large = {'id': 'a'}, {'id': 'b', 'name': 'x' * 100}
+
+        cache.set('a', small)
+        cache.set('a', large)
+        self.assertEqual(cache.stats()['memory'], deep_size(large))
+
+        cache.set('b', small)
+        cache.set('c', small)
+        self.assertEqual(cache.stats()['memory'], 2 * deep_size(small))
+
+        cache.set('d', large, ttl=-1)
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(cache.stats()['memory'], deep_size(small))
+
+        cache.configure(maxsize=0, ttl=10)
+        self.assertEqual(cache.stats()['memory'], 0)
+
+        cache.configure(maxsize=2, ttl=10)
+        cache.set('a', large)
+        cache.clear()
+        self.assertEqual(cache.stats()['memory'], 0)
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase, mock
+
+from api.helper.metrics import Metrics, MmapValues, _key
+
+
+class MmapValuesTestCase(TestCase):
+    """ Test the memory mapped metric values """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'metrics_1.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write_and_read(self):
+        """ Values written by a process are read back, past a resize """
+        values = MmapValues(self.path)
+        expected = {}
+        for i in range(3000):
+            key = _key('requests', {'resource': 'Resource{0}'.format(i)})
+            values.write(key, float(i))
+            expected[key] = float(i)
+        values.write(_key('requests', {'resource': 'Resource1'}), 10.0)
+        expected[_key('requests', {'resource': 'Resource1'})] = 10.0
+
+        self.assertGreater(os.path.getsize(self.path), MmapValues.INITIAL_SIZE)
+        self.assertEqual(MmapValues.read(self.path), expected)
+
+        # a process reopening its file keeps writing to the same entries
+        reopened = MmapValues(self.path)
+        reopened.write(_key('requests', {'resource': 'Resource2'}), 20.0)
+        expected[_key('requests', {'resource': 'Resource2'})] = 20.0
+        self.assertEqual(MmapValues.read(self.path), expected)
+
+
+class MetricsTestCase(TestCase):
+    """ Test metrics shared by the worker processes """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.metrics = Metrics()
+        self.metrics.init_app(mock.Mock(config={
+            'METRICS_DIR': self.directory
+        }))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, pid, name, labels, value):
+        MmapValues(
+            os.path.join(self.directory, 'metrics_{0}.db'.format(pid))
+        ).write(_key(name, labels), value)
+
+    def test_processes_summed(self):
+        """ The values of every process file are summed and rendered """
+        labels = {'resource': 'UserResource', 'method': 'GET'}
+        for pid in (1, 2):
+            self.write(pid, 'http_requests_total', dict(labels, status='200'), 2)
+            self.write(pid, 'http_request_duration_seconds_bucket',
+                       dict(labels, le='0.1'), 1)
+            self.write(pid, 'http_request_duration_seconds_bucket',
+                       dict(labels, le='+Inf'), 2)
+            self.write(pid, 'cache_hits_total', {'cache': 'user'}, 3)
+            self.write(pid, 'cache_misses_total', {'cache': 'user'}, 1)
+
+        lines = self.metrics.render().splitlines()
+
+        self.assertIn('# TYPE http_requests_total counter', lines)
+        self.assertIn('http_requests_total{method="GET",'
+                      'resource="UserResource",status="200"} 4.0', lines)
+        self.assertLess(
+            lines.index('http_request_duration_seconds_bucket{method="GET",'
+                        'resource="UserResource",le="0.1"} 2.0'),
+            lines.index('http_request_duration_seconds_bucket{method="GET",'
+                        'resource="UserResource",le="+Inf"} 4.0')
+        )
+        self.assertIn('cache_hit_ratio{cache="user"} 0.75', lines)
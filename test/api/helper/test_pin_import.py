@@ -0,0 +1,106 @@
+import json
+
+from io import BytesIO
+from unittest import TestCase
+
+from api.helper import ImportFormatError, read_csv_pins, read_geojson_pins
+
+
+class TrickleStream(BytesIO):
+    """ A stream handing out at most a few bytes per read """
+
+    def read(self, size=-1):
+        return super().read(3)
+
+
+class ReadCsvPinsTestCase(TestCase):
+    """ Test reading pins from a CSV """
+
+    def test_read_pins(self):
+        """ Columns are found by name, short rows and blank lines handled """
+        data = (
+            '\ufeffLat,extra,Name,LNG\r\n'
+            '1.5,x,"Café, corner",2.5\r\n'
+            '\r\n'
+            '3.5,y\r\n'
+            ',z,No lat,4.5\r\n'
+        ).encode('utf-8')
+
+        rows = list(read_csv_pins(TrickleStream(data)))
+
+        self.assertEqual(rows, [
+            ({'name': 'Café, corner', 'latLng': ['1.5', '2.5']}, None),
+            (None, {'row': ['Must have name, lat and lng values.']}),
+            ({'name': 'No lat', 'latLng': [None, '4.5']}, None)
+        ])
+
+    def test_missing_columns(self):
+        """ A CSV without a name, lat or lng column is turned away """
+        with self.assertRaises(ImportFormatError):
+            read_csv_pins(BytesIO(b'name,lat\nPin,1\n'))
+
+        with self.assertRaises(ImportFormatError):
+            read_csv_pins(BytesIO(b''))
+
+
+class ReadGeoJsonPinsTestCase(TestCase):
+    """ Test reading pins from a GeoJSON FeatureCollection """
+
+    def point(self, name, lng, lat):
+        return {
+            'type': 'Feature',
+            'properties': {'name': name},
+            'geometry': {'type': 'Point', 'coordinates': [lng, lat]}
+        }
+
+    def test_read_pins(self):
+        """ Features are read across reads, other members are skipped """
+        collection = {
+            'type': 'FeatureCollection',
+            'bbox': [-180, -90, 180, 90],
+            'crs': {'type': 'name', 'properties': {'name': 'EPSG:4326'}},
+            'features': [
+                self.point('Café', 2.5, 1.5),
+                {'type': 'Feature', 'properties': {},
+                 'geometry': {'type': 'LineString', 'coordinates': []}},
+                self.point('Far', -120.125, 45.0625),
+                {'type': 'Feature',
+                 'geometry': {'type': 'Point', 'coordinates': [1, 2]}}
+            ]
+        }
+        data = json.dumps(collection, ensure_ascii=False, indent=2)
+
+        rows = list(read_geojson_pins(TrickleStream(data.encode('utf-8'))))
+
+        self.assertEqual(rows, [
+            ({'name': 'Café', 'latLng': [1.5, 2.5]}, None),
+            (None, {'geometry': ['Must be a Point.']}),
+            ({'name': 'Far', 'latLng': [45.0625, -120.125]}, None),
+            ({'latLng': [2, 1]}, None)
+        ])
+
+    def test_empty_collection(self):
+        """ A collection without features reads no pins """
+        rows = read_geojson_pins(BytesIO(b'{"features": [ ]}'))
+
+        self.assertEqual(list(rows), [])
+
+    def test_not_a_collection(self):
+        """ Anything but a FeatureCollection is turned away """
+        for data in (b'[]', b'{"type": "Feature"}', b'{"type": "Point",',
+                     b'{"features": 1}', b''):
+            with self.assertRaises(ImportFormatError):
+                read_geojson_pins(BytesIO(data))
+
+    def test_malformed_feature(self):
+        """ Malformed JSON stops the reading after the features before it """
+        data = json.dumps({
+            'type': 'FeatureCollection',
+            'features': [self.point('Good', 1, 2)]
+        })[:-2] + ', {"type": "Feature", "geometry": }]}'
+
+        rows = read_geojson_pins(BytesIO(data.encode('utf-8')))
+
+        self.assertEqual(next(rows), ({'name': 'Good', 'latLng': [2, 1]}, None))
+        with self.assertRaises(ImportFormatError):
+            next(rows)
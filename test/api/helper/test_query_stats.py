@@ -0,0 +1,68 @@
+import json
+
+from test.base import BaseTestCase
+from api.models import db
+from api.controllers import user_info_cache
+
+
+class QueryStatsTestCase(BaseTestCase):
+    """ Test per request query stats """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data()
+
+        self.login('user1', 'password1')
+        user_info_cache.clear()
+
+    def get_user_info(self):
+        return self.client.get(
+            'user_info',
+            headers={'authorization': self.authorization_token}
+        )
+
+    def test_server_timing(self):
+        """ The statement count and db time are sent in Server-Timing """
+        with self.count_queries() as statements:
+            response = self.get_user_info()
+
+        self.assert200(response)
+        timings = response.headers.getlist('Server-Timing')
+        self.assertEqual(len(timings), 2)
+        self.assertIn('"{0} queries"'.format(len(statements)), timings[0])
+        self.assertTrue(timings[0].startswith('db;dur='))
+        self.assertTrue(timings[1].startswith('app;dur='))
+
+    def test_server_timing_disabled(self):
+        """ No Server-Timing is sent when it is turned off """
+        self.app.config['SERVER_TIMING'] = False
+
+        response = self.get_user_info()
+
+        self.assertNotIn('Server-Timing', response.headers)
+
+    def test_request_logged(self):
+        """ Every request is logged with its query count and db time """
+        with self.assertLogs(self.app.logger, 'INFO') as logs:
+            self.get_user_info()
+
+        fields = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(fields['path'], '/user_info')
+        self.assertEqual(fields['status'], 200)
+        self.assertGreater(fields['db_queries'], 0)
+        self.assertIn('db_ms', fields)
+
+    def test_query_threshold_logs_sql(self):
+        """ The SQL of a request over the threshold is logged """
+        self.app.config['QUERY_COUNT_THRESHOLD'] = 1
+
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            self.get_user_info()
+
+        fields = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(fields['message'], 'Too many queries')
+        self.assertEqual(len(fields['statements']), fields['db_queries'])
+        self.assertTrue(
+            any('FROM pins' in statement for statement in fields['statements'])
+        )
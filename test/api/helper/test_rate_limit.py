@@ -0,0 +1,180 @@
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+
+from unittest import TestCase, mock
+
+from api.helper.rate_limit import (
+    RateLimiter, TokenBuckets, SharedTokenBuckets
+)
+
+
+class TokenBucketsTestCase(TestCase):
+    """ Test the token buckets of a process """
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('api.helper.rate_limit.monotonic',
+                             lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def buckets(self):
+        return TokenBuckets()
+
+    def test_burst_then_refill(self):
+        """ A burst goes through, then requests wait for the refill """
+        buckets = self.buckets()
+
+        self.assertEqual([buckets.take('a', 3, 2.0) for _ in range(3)],
+                         [0, 0, 0])
+        self.assertAlmostEqual(buckets.take('a', 3, 2.0), 0.5)
+
+        # other keys have buckets of their own
+        self.assertEqual(buckets.take('b', 3, 2.0), 0)
+
+        self.now += 0.25
+        self.assertAlmostEqual(buckets.take('a', 3, 2.0), 0.25)
+
+        self.now += 0.25
+        self.assertEqual(buckets.take('a', 3, 2.0), 0)
+        self.assertGreater(buckets.take('a', 3, 2.0), 0)
+
+        # idle buckets refill up to the burst only
+        self.now += 60
+        self.assertEqual([buckets.take('a', 3, 2.0) for _ in range(4)][-1],
+                         0.5)
+
+    def test_threads_share_a_bucket(self):
+        """ Threads taking from one bucket never take more than it holds """
+        buckets = self.buckets()
+        taken = []
+
+        def take():
+            for _ in range(100):
+                taken.append(buckets.take('a', 250, 0.001) == 0)
+
+        threads = [threading.Thread(target=take) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(taken.count(True), 250)
+
+    def test_full_buckets_pruned(self):
+        """ Past maxsize, buckets back to full are dropped """
+        buckets = TokenBuckets(maxsize=10)
+        for i in range(10):
+            buckets.take(i, 1, 1.0)
+
+        self.now += 1
+        buckets.take('a', 1, 1.0)
+        buckets.take('b', 1, 1.0)
+
+        self.assertEqual(len(buckets._buckets), 2)
+
+
+class SharedTokenBucketsTestCase(TokenBucketsTestCase):
+    """ Test the token buckets shared by processes through a file """
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('api.helper.rate_limit.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'rate_limits.db')
+
+    def buckets(self, slots=1024):
+        return SharedTokenBuckets(self.path, slots=slots)
+
+    def test_processes_share_a_bucket(self):
+        """ Buckets opened on the same file take from the same tokens """
+        first, second = self.buckets(), self.buckets()
+
+        self.assertEqual(first.take('a', 2, 1.0), 0)
+        self.assertEqual(second.take('a', 2, 1.0), 0)
+        self.assertAlmostEqual(first.take('a', 2, 1.0), 1.0)
+        self.assertAlmostEqual(second.take('a', 2, 1.0), 1.0)
+
+        first.clear()
+        self.assertEqual(second.take('a', 2, 1.0), 0)
+        self.assertEqual(os.path.getsize(self.path),
+                         1024 * SharedTokenBuckets.SLOT.size)
+
+    def test_forked_processes_share_a_bucket(self):
+        """ Forked processes never take more than the bucket holds """
+        buckets = self.buckets()
+        buckets.take('b', 1, 1.0)
+        taken = multiprocessing.get_context('fork').Queue()
+
+        def take():
+            taken.put(sum(
+                buckets.take('a', 250, 0.001) == 0 for _ in range(100)
+            ))
+
+        processes = [
+            multiprocessing.get_context('fork').Process(target=take)
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        self.assertEqual(sum(taken.get() for _ in processes), 250)
+
+    def test_full_buckets_pruned(self):
+        """ A full bucket's slot goes to another key, else keys go unlimited """
+        buckets = self.buckets(slots=SharedTokenBuckets.PROBES)
+        for i in range(SharedTokenBuckets.PROBES):
+            self.assertEqual(buckets.take(i, 1, 1.0), 0)
+
+        # every slot is in use, so a new key is let through
+        self.assertEqual(buckets.take('a', 1, 1.0), 0)
+        self.assertEqual(buckets.take('a', 1, 1.0), 0)
+        self.assertAlmostEqual(buckets.take(0, 1, 1.0), 1.0)
+
+        self.now += 1
+        self.assertEqual(buckets.take('a', 1, 1.0), 0)
+        self.assertAlmostEqual(buckets.take('a', 1, 1.0), 1.0)
+
+
+class RateLimiterTestCase(TestCase):
+    """ Test rate limits per route """
+
+    def test_limits(self):
+        """ Only configured routes are limited, each key on its own """
+        limiter = RateLimiter()
+        limiter.init_app(mock.Mock(config={
+            'RATE_LIMITS': {'user_info': (1, 0.001)}
+        }))
+
+        self.assertEqual(limiter.take('user_info', 'user1'), 0)
+        self.assertGreater(limiter.take('user_info', 'user1'), 0)
+        self.assertEqual(limiter.take('user_info', 'user2'), 0)
+        self.assertEqual(limiter.take('share_pin', 'user1'), 0)
+        self.assertEqual(limiter.take('share_pin', 'user1'), 0)
+
+    def test_shared_directory(self):
+        """ RATE_LIMIT_DIR keeps the buckets in a file of that directory """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        limiter = RateLimiter()
+        limiter.init_app(mock.Mock(config={
+            'RATE_LIMITS': {'user_info': (1, 0.001)},
+            'RATE_LIMIT_DIR': directory,
+            'RATE_LIMIT_SIZE': 1024
+        }))
+
+        self.assertIsInstance(limiter.buckets, SharedTokenBuckets)
+        self.assertEqual(limiter.take('user_info', 'user1'), 0)
+        self.assertTrue(
+            os.path.exists(os.path.join(directory, 'rate_limits.db'))
+        )
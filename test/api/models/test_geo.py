@@ -0,0 +1,94 @@
+import random
+
+from unittest import TestCase
+
+from api.models.helper import geo
+
+
+class GeoCellTestCase(TestCase):
+    """ Test grid cells """
+
+    def assert_covered(self, min_lat, min_lng, max_lat, max_lng, points):
+        ranges = geo.cell_ranges(min_lat, min_lng, max_lat, max_lng)
+
+        self.assertLessEqual(len(ranges), 16)
+        for lat, lng in points:
+            cell = geo.cell_id(lat, lng)
+            self.assertTrue(
+                any(low <= cell < high for low, high in ranges),
+                (lat, lng)
+            )
+
+    def test_cell_ranges_cover_box(self):
+        """ Every point inside a box falls in one of its cell ranges """
+        rand = random.Random(0)
+
+        for i in range(200):
+            min_lat, max_lat = sorted(rand.uniform(-90, 90) for j in range(2))
+            min_lng, max_lng = sorted(rand.uniform(-180, 180) for j in range(2))
+            points = [
+                (rand.uniform(min_lat, max_lat), rand.uniform(min_lng, max_lng))
+                for j in range(20)
+            ]
+            points += [(min_lat, min_lng), (max_lat, max_lng)]
+
+            self.assert_covered(min_lat, min_lng, max_lat, max_lng, points)
+
+    def test_cell_ranges_cross_antimeridian(self):
+        """ Boxes with min_lng > max_lng wrap around the antimeridian """
+        self.assert_covered(
+            -10, 170, 10, -170,
+            [(0, 175), (0, -175), (10, 180), (-10, -180)]
+        )
+
+    def test_cell_ranges_small_box(self):
+        """ A small box only covers a small part of the cells """
+        low, high = geo.cell_ranges(1.0, 2.0, 1.001, 2.001)[0]
+
+        self.assertLess(high - low, 1 << 20)
+
+
+class GeoNearestTestCase(TestCase):
+    """ Test nearest coordinates search """
+
+    def test_nearest_matches_brute_force(self):
+        """ The expanding search finds the same pins as sorting them all """
+        rand = random.Random(1)
+        points = [
+            (i, rand.uniform(-90, 90), rand.uniform(-180, 180))
+            for i in range(2000)
+        ]
+
+        def candidates(min_lat, min_lng, max_lat, max_lng):
+            ranges = geo.cell_ranges(min_lat, min_lng, max_lat, max_lng)
+            return [
+                point for point in points
+                if any(low <= geo.cell_id(point[1], point[2]) < high
+                       for low, high in ranges)
+            ]
+
+        for lat, lng in [(0, 0), (89, 10), (-45, 179.9), (10, -179.9)]:
+            distances = geo.haversine(
+                lat, lng,
+                [point[1] for point in points],
+                [point[2] for point in points]
+            )
+            expected = sorted(range(len(points)), key=lambda i: distances[i])
+
+            found = geo.nearest(lat, lng, 5, candidates)
+
+            self.assertEqual([key for key, distance in found], expected[:5])
+
+    def test_nearest_fewer_than_k(self):
+        """ Every candidate is returned when there are fewer than k """
+        found = geo.nearest(0, 0, 5, lambda *bbox: [('a', 1.0, 1.0)])
+
+        self.assertEqual([key for key, distance in found], ['a'])
+
+    def test_haversine(self):
+        """ Distances are great-circle distances in km """
+        distances = geo.haversine(0, 0, [0, 0, 90], [0, 180, 0])
+
+        self.assertAlmostEqual(distances[0], 0)
+        self.assertAlmostEqual(distances[1], 20015.1, places=0)
+        self.assertAlmostEqual(distances[2], 10007.5, places=0)
@@ -0,0 +1,70 @@
+import threading
+
+from unittest import TestCase, mock
+
+from api.models.helper import PushID
+
+
+class PushIDTestCase(TestCase):
+    """ Test PushID generator """
+
+    def test_next_id_format(self):
+        """ Ids are 20 push chars, starting with the encoded timestamp """
+        push_id = PushID()
+
+        with mock.patch('api.models.helper.id_generator.time', return_value=0):
+            unique_id = push_id.next_id()
+
+        self.assertEqual(len(unique_id), 20)
+        self.assertEqual(unique_id[:8], '--------')
+        self.assertTrue(all(char in PushID.PUSH_CHARS for char in unique_id))
+
+    def test_next_ids_monotonic_in_same_millisecond(self):
+        """ Ids created in the same millisecond keep increasing """
+        push_id = PushID()
+
+        with mock.patch('api.models.helper.id_generator.time', return_value=1):
+            ids = [push_id.next_id() for i in range(100)]
+            ids += push_id.next_ids(1000)
+
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_next_ids_monotonic_when_clock_goes_back(self):
+        """ Ids keep increasing if the clock moves backwards """
+        push_id = PushID()
+
+        with mock.patch('api.models.helper.id_generator.time', return_value=2):
+            first = push_id.next_id()
+        with mock.patch('api.models.helper.id_generator.time', return_value=1):
+            second = push_id.next_id()
+
+        self.assertLess(first, second)
+
+    def test_next_ids_random_bits_overflow(self):
+        """ Ids move on to the next millisecond when the random bits run out """
+        push_id = PushID()
+
+        with mock.patch('api.models.helper.id_generator.time', return_value=1):
+            push_id.next_id()
+            push_id.last_rand = (1 << PushID.RAND_BITS) - 2
+            ids = push_id.next_ids(3)
+
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertNotEqual(ids[0][:8], ids[2][:8])
+
+    def test_next_ids_threads(self):
+        """ Ids generated from many threads are unique """
+        push_id = PushID()
+        ids = []
+
+        def generate():
+            ids.extend(push_id.next_ids(500))
+            ids.extend(push_id.next_id() for i in range(500))
+
+        threads = [threading.Thread(target=generate) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(ids)), 8000)
@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+from api.models.helper import PasswordHasher, PasswordHasherBusy
+
+
+class PasswordHasherTestCase(TestCase):
+    """ Test PasswordHasher """
+
+    def test_hash_inline(self):
+        """ Without workers passwords are hashed in the calling thread """
+        hasher = PasswordHasher(method='pbkdf2:sha256:1000')
+        password_hash = hasher.generate('password')
+
+        self.assertTrue(password_hash.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(hasher.check(password_hash, 'password'))
+        self.assertFalse(hasher.check(password_hash, 'wrong'))
+
+    def test_hash_on_pool(self):
+        """ With workers passwords are hashed on the process pool """
+        hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1)
+        try:
+            password_hash = hasher.generate('password')
+
+            self.assertTrue(hasher.check(password_hash, 'password'))
+            self.assertIsNotNone(hasher._pool)
+        finally:
+            hasher.shutdown()
+
+    def test_saturated_pool_busy(self):
+        """ Hashes beyond the workers and queue depth are turned away """
+        hasher = PasswordHasher(workers=1, queue_depth=1)
+        try:
+            pool, slots = hasher._get_pool()
+            slots.acquire()
+            slots.acquire()
+
+            with self.assertRaises(PasswordHasherBusy):
+                hasher.generate('password')
+        finally:
+            hasher.shutdown()
@@ -0,0 +1,41 @@
+from unittest import mock
+
+from test.base import BaseTestCase
+from api.models import Users, Pins, PinShares
+
+
+class PinSharesShareWithTestCase(BaseTestCase):
+    """ Test sharing a pin with many users at once """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data()
+
+        self.user1 = Users.find_first(**{'username': 'user1'})
+        self.user2 = Users.find_first(**{'username': 'user2'})
+        self.user3 = Users.find_first(**{'username': 'user3'})
+
+        self.pin = Pins.find_first(**{'user_id': self.user1.id})
+
+    def test_concurrent_share_skipped(self):
+        """ A share created after the lookup is reported as skipped """
+        insert_many = PinShares.insert_many
+
+        def share_concurrently(*args, **kwargs):
+            PinShares(
+                pin_id=self.pin.id,
+                shared_by=self.user1.id,
+                shared_to=self.user2.id
+            ).save()
+            return insert_many(*args, **kwargs)
+
+        with mock.patch.object(PinShares, 'insert_many', share_concurrently):
+            shared, skipped, invalid = PinShares.share_with(
+                self.pin.id, self.user1.id, [self.user2.id, self.user3.id]
+            )
+
+        self.assertEqual(shared, [self.user3.id])
+        self.assertEqual(skipped, [self.user2.id])
+        self.assertEqual(invalid, [])
+        self.assertEqual(PinShares.count(**{'pin_id': self.pin.id}), 2)
@@ -0,0 +1,47 @@
+from test.base import BaseTestCase
+from api.models import db, Users, Pins, geo
+
+
+class PinCoordinatesTestCase(BaseTestCase):
+    """ Test the latLng of a pin over its lat and lng columns """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data()
+
+        self.user1 = Users.find_first(**{'username': 'user1'})
+
+    def test_create_sets_columns(self):
+        """ A new pin's latLng fills lat, lng and its grid cell """
+        pin = Pins(user_id=self.user1.id, name='Pin', latLng=[10.5, -20.25])
+        pin.save()
+
+        db.session.expire_all()
+        pin = Pins.get_by_id(pin.id)
+
+        self.assertEqual(pin.latLng, [10.5, -20.25])
+        self.assertEqual((pin.lat, pin.lng), (10.5, -20.25))
+        self.assertEqual(pin.cell, geo.cell_id(10.5, -20.25))
+
+    def test_update_sets_columns(self):
+        """ Updating latLng moves the pin to its new cell """
+        pin = Pins.query.first()
+        Pins.update(pin, latLng=[-45.0, 120.0])
+
+        db.session.expire_all()
+        pin = Pins.get_by_id(pin.id)
+
+        self.assertEqual(pin.latLng, [-45.0, 120.0])
+        self.assertEqual(pin.cell, geo.cell_id(-45.0, 120.0))
+
+    def test_insert_batch_sets_columns(self):
+        """ Batch inserted pins read back the latLng they were given """
+        ids = Pins.insert_batch(self.user1.id, [
+            {'name': 'A', 'latLng': [1.5, 2.5]},
+            {'name': 'B', 'latLng': [-3.5, 4.5]}
+        ])
+
+        pins = {pin.id: pin for pin in Pins.find_for_user(self.user1.id, ids)}
+        self.assertEqual(pins[ids[0]].latLng, [1.5, 2.5])
+        self.assertEqual(pins[ids[1]].latLng, [-3.5, 4.5])
@@ -0,0 +1,57 @@
+import os
+import tempfile
+
+from unittest import TestCase
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError
+
+from api.models.helper import MeteredQueuePool, pool_metrics
+
+
+class MeteredQueuePoolTestCase(TestCase):
+    """ Test the metered connection pool """
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+
+        self.engine = create_engine(
+            'sqlite:///' + self.path, poolclass=MeteredQueuePool,
+            pool_size=1, max_overflow=1, pool_timeout=0.05
+        )
+        pool_metrics.reset()
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.path)
+
+    def test_checkouts_counted(self):
+        """ Checkouts, their waits and the live pool state are reported """
+        first = self.engine.connect()
+        second = self.engine.connect()
+
+        stats = pool_metrics.stats(self.engine.pool)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['checked_out'], 2)
+        self.assertEqual(stats['overflow'], 1)
+        self.assertEqual(stats['checkout_histogram'][-1],
+            {'le': '+Inf', 'count': 2})
+
+        first.close()
+        second.close()
+        self.assertEqual(pool_metrics.stats(self.engine.pool)['checked_out'], 0)
+
+    def test_timeouts_counted(self):
+        """ A checkout giving up on a full pool is counted """
+        connections = [self.engine.connect(), self.engine.connect()]
+
+        with self.assertRaises(TimeoutError):
+            self.engine.connect()
+
+        stats = pool_metrics.stats(self.engine.pool)
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+
+        for connection in connections:
+            connection.close()
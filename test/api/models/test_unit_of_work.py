@@ -0,0 +1,84 @@
+from unittest import mock
+
+from test.base import BaseTestCase
+from api.models import db, Users, Pins, unit_of_work, after_commit
+
+
+class UnitOfWorkTestCase(BaseTestCase):
+    """ Test the request unit of work """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data()
+
+        self.user1 = Users.find_first(**{'username': 'user1'})
+        self.pin_count = Pins.count()
+
+    def add_pins(self, count):
+        for i in range(count):
+            Pins(user_id=self.user1.id, name='Pin', latLng=[1.0, 1.0]).save()
+
+    def test_commits_once(self):
+        """ Writes in a unit are committed together when it exits """
+        callback = mock.Mock()
+
+        with mock.patch.object(
+            db.session, 'commit', wraps=db.session.commit
+        ) as commit:
+            with unit_of_work():
+                self.add_pins(3)
+                Pins.update(Pins.query.first(), name='Renamed')
+                after_commit(callback, 'pins')
+
+                self.assertEqual(commit.call_count, 0)
+                callback.assert_not_called()
+
+        self.assertEqual(commit.call_count, 1)
+        callback.assert_called_once_with('pins')
+        self.assertEqual(Pins.count(), self.pin_count + 3)
+
+    def test_rolls_back_on_error(self):
+        """ An exception in a unit rolls back every write in it """
+        callback = mock.Mock()
+
+        with self.assertRaises(ValueError):
+            with unit_of_work():
+                self.add_pins(2)
+                after_commit(callback)
+                raise ValueError()
+
+        callback.assert_not_called()
+        self.assertEqual(Pins.count(), self.pin_count)
+
+    def test_rolls_back_failed_write(self):
+        """ A failed write makes the whole unit roll back """
+        with unit_of_work() as unit:
+            self.add_pins(2)
+            Pins(name='No owner', latLng=[1.0, 1.0]).save()
+
+            self.assertTrue(unit.failed)
+
+        self.assertEqual(Pins.count(), self.pin_count)
+
+    def test_nested_units_join(self):
+        """ A unit opened inside another commits with the outer one """
+        with unit_of_work() as outer:
+            with unit_of_work() as inner:
+                self.add_pins(1)
+
+            self.assertIs(inner, outer)
+            db.session.rollback()
+
+        self.assertEqual(Pins.count(), self.pin_count)
+
+    def test_explicit_commit(self):
+        """ commit() keeps the writes staged so far """
+        with self.assertRaises(ValueError):
+            with unit_of_work() as unit:
+                self.add_pins(1)
+                unit.commit()
+                self.add_pins(1)
+                raise ValueError()
+
+        self.assertEqual(Pins.count(), self.pin_count + 1)
@@ -0,0 +1,120 @@
+import json
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import TestCase
+
+from marshmallow import Schema, fields
+
+from test.base import BaseTestCase
+from api.models import Users, Pins, PinShares
+from api.schema import (
+    PinSchema, UserSchema, PinUserInfoSchema, compile_schema,
+    pin_serializer, user_serializer, pin_user_info_serializer,
+    pin_fragment_cache
+)
+
+
+class CompiledSchemaTestCase(BaseTestCase):
+    """ Test compiled schemas against the schemas they are built from """
+
+    def setUp(self):
+        super().setUp()
+
+        self.create_default_data()
+
+        user1 = Users.find_first(**{'username': 'user1'})
+        user2 = Users.find_first(**{'username': 'user2'})
+        for pin in Pins.find_all(user_id=user2.id):
+            PinShares(
+                pin_id=pin.id, shared_by=user2.id, shared_to=user1.id
+            ).save()
+
+        self.user1 = user1
+
+    def assert_same_dump(self, schema, compiled, obj, many=False):
+        self.assertEqual(
+            json.dumps(compiled.dump(obj, many=many)),
+            json.dumps(schema.dump(obj, many=many))
+        )
+
+    def test_user_dump(self):
+        """ A user with pins and shares dumps byte for byte the same """
+        user = Users.get_with_pins(self.user1.id)
+
+        self.assertTrue(user.shares)
+        self.assert_same_dump(UserSchema(), user_serializer, user)
+
+    def test_pin_dump(self):
+        """ Pins and shares dump byte for byte the same, alone or many """
+        rows = [*Pins.query.all(), *PinShares.query.all()]
+
+        self.assert_same_dump(PinSchema(), pin_serializer, rows, many=True)
+        for row in rows:
+            self.assert_same_dump(PinSchema(), pin_serializer, row)
+
+    def test_user_info_dump(self):
+        """ User rows dump byte for byte the same """
+        rows = Users.page_excluding(self.user1.id, None, 10)
+
+        self.assert_same_dump(
+            PinUserInfoSchema(), pin_user_info_serializer, rows, many=True
+        )
+
+    def test_pin_fragments_reused(self):
+        """ A pin is dumped once until it changes, in any response """
+        share = PinShares.query.first()
+        hits = pin_fragment_cache.stats()['hits']
+
+        fragment = pin_serializer.dump(share)
+        user = user_serializer.dump(Users.get_with_pins(self.user1.id))
+
+        self.assertIs(user['shares'][0], fragment)
+        self.assertEqual(pin_fragment_cache.stats()['hits'], hits + 1)
+
+        Pins.update(share.pin, name='Renamed')
+
+        updated = pin_serializer.dump(share)
+        self.assertIsNot(updated, fragment)
+        self.assertEqual(updated['name'], 'Renamed')
+        self.assertTrue(updated['shared'])
+
+
+class CompiledFieldsTestCase(TestCase):
+    """ Test compiled field conversions """
+
+    class ValuesSchema(Schema):
+        text = fields.Str()
+        number = fields.Float()
+        count = fields.Int(as_string=True)
+        flag = fields.Boolean()
+        when = fields.DateTime()
+        day = fields.DateTime(format='%Y-%m-%d')
+        points = fields.List(fields.Float())
+        renamed = fields.Str(data_key='other', attribute='label')
+        nested = fields.Nested(PinUserInfoSchema)
+
+    def test_values(self):
+        """ Conversions, None, missing attributes and fallbacks match """
+        schema = self.ValuesSchema()
+        compiled = compile_schema(self.ValuesSchema)
+
+        objects = [
+            SimpleNamespace(
+                text=b'bytes', label='label', number=1, count=2, flag=1,
+                when=datetime(2020, 1, 2, 3, 4, 5), day=datetime(2020, 1, 2),
+                points=[1, None, 2.5],
+                nested=SimpleNamespace(id=3, username='user')
+            ),
+            SimpleNamespace(
+                text=None, number=None, count=None, flag='no', when=None,
+                day=None, points=None, nested=None
+            ),
+            SimpleNamespace(flag=True),
+            SimpleNamespace()
+        ]
+
+        for obj in objects:
+            self.assertEqual(
+                json.dumps(compiled.dump(obj)), json.dumps(schema.dump(obj))
+            )
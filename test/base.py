@@ -1,7 +1,9 @@
 import os
 import json
 
+from contextlib import contextmanager
 from flask_testing import TestCase
+from sqlalchemy import event
 from server import create_flask_app
 
 from api.models import (
@@ -12,6 +14,54 @@ from .default_test_data.default_data import (
     create_default_users, create_default_pins
 )
 
+# one connection holding the test database for the whole run, see
+# database_connection
+_connection = None
+
+
+def _sqlite_connect(dbapi_connection, connection_record):
+    # pysqlite issues its own BEGIN and breaks SAVEPOINT, begin explicitly
+    dbapi_connection.isolation_level = None
+
+
+def _sqlite_begin(connection):
+    connection.execute('BEGIN')
+
+
+def _restart_savepoint(session, transaction):
+    # the code under test committed or rolled back the test's savepoint
+    if transaction.nested and not transaction.parent.nested:
+        session.expire_all()
+        session.begin_nested()
+        # open it now rather than in the middle of a counted request
+        session.connection()
+
+
+def database_connection(app):
+    """ Returns the connection every test runs in.
+        The schema is created once, on the first call, and db.session is
+        bound to the connection for the rest of the run, whichever app
+        the test creates. An in-memory
+        SQLite database lives as long as the connection.
+    """
+    global _connection
+
+    if _connection is None:
+        engine = db.get_engine(app)
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', _sqlite_connect)
+            event.listen(engine, 'begin', _sqlite_begin)
+
+        _connection = engine.connect()
+        db.metadata.create_all(bind=_connection)
+
+        # without binds the session would map each table to the engine of
+        # the test's own app
+        db.session.remove()
+        db.session.configure(bind=_connection, binds={})
+
+    return _connection
+
 
 class BaseTestCase(TestCase):
     """ Testing Setup """
@@ -29,14 +79,22 @@ class BaseTestCase(TestCase):
         return self.app
 
     def setUp(self):
-        """ Drop Database Table and Re-Create """
-        db.drop_all()
-        db.create_all()
+        """ Run the test in a transaction, and its writes in a savepoint
+            that is restarted whenever the code under test commits
+        """
+        self.connection = database_connection(self.app)
+        self.transaction = self.connection.begin()
+
+        db.session.remove()
+        db.session.begin_nested()
+        db.session.connection()
+        event.listen(db.session, 'after_transaction_end', _restart_savepoint)
 
     def tearDown(self):
-        """ Drop Database Tables """
+        """ Roll back everything the test wrote """
+        event.remove(db.session, 'after_transaction_end', _restart_savepoint)
         db.session.remove()
-        db.drop_all()
+        self.transaction.rollback()
         self.app_context.pop()
 
     def login(self, username, password):
@@ -51,6 +109,23 @@ class BaseTestCase(TestCase):
         response_data = json.loads(response.data)
         self.authorization_token = response_data["data"]["token"]
 
+    @contextmanager
+    def count_queries(self):
+        """ Collect the SQL statements executed within the block """
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = self.connection.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(
+                engine, 'before_cursor_execute', before_cursor_execute
+            )
+
     def create_default_data(self):
         """ Create default data """
         create_default_users()
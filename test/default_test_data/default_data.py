@@ -1,18 +1,19 @@
 from datetime import datetime
+from functools import lru_cache
 
 from api.models import (
-    Users, Pins
+    Users, Pins, password_hasher
 )
 
-def create_default_users():
-    user1 = Users(username="user1")
-    user1.set_password('password1')
-
-    user2 = Users(username="user2")
-    user2.set_password('password2')
+@lru_cache(maxsize=None)
+def password_hash(password):
+    """ Hashes each default password once for the whole test run """
+    return password_hasher.generate(password)
 
-    user3 = Users(username="user3")
-    user3.set_password('password3')
+def create_default_users():
+    user1 = Users(username="user1", password_hash=password_hash('password1'))
+    user2 = Users(username="user2", password_hash=password_hash('password2'))
+    user3 = Users(username="user3", password_hash=password_hash('password3'))
 
     user1.save()
     user2.save()